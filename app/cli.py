@@ -0,0 +1,160 @@
+import sys
+import time
+import logging
+import argparse
+import builtins
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
+
+from app.constants import STARTUP_PROFILE_TOP_IMPORTS, UPLOAD_MODES, UPLOAD_MODE_TWO_STEP
+from app.services.tracing import tracer
+
+# Only lightweight modules are imported above, so that --help and usage
+# errors return without loading pandas, pdfplumber, google-genai or the
+# matcher's numerical libraries; the services are imported after parsing.
+if TYPE_CHECKING:
+    from app.services.llm_service import LLMService
+
+
+class StartupProfiler:
+    """
+    Times the startup phases of an entry point and the modules first imported during them.
+
+    Imports are timed by wrapping builtins.__import__ while enabled. Each
+    module's time includes the modules it imports in turn, as with
+    python -X importtime.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.imports: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._original_import = None
+
+    def enable(self) -> None:
+        """Start timing first-time imports."""
+        if self._original_import is not None:
+            return
+        original_import = self._original_import = builtins.__import__
+        profiler = self
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            key = None
+            if not level:
+                if name not in sys.modules:
+                    key = name
+                else:
+                    # "from google import genai" loads a submodule of a package already imported
+                    key = next((f"{name}.{item}" for item in fromlist or () if f"{name}.{item}" not in sys.modules), None)
+            if key is None:
+                return original_import(name, globals, locals, fromlist, level)
+            start = time.perf_counter()
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                with profiler._lock:
+                    profiler.imports.setdefault(key, time.perf_counter() - start)
+
+        builtins.__import__ = timed_import
+
+    def disable(self) -> None:
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a startup phase, e.g. "imports" or "llm_service"."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self) -> str:
+        """Render the phase timings and the slowest imports."""
+        lines = [f"Startup: {time.perf_counter() - self.start:.3f}s since the entry point started"]
+        lines += [f"  phase  {name:45} {seconds:.3f}s" for name, seconds in self.phases]
+        slowest = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)[:STARTUP_PROFILE_TOP_IMPORTS]
+        lines += [f"  import {name:45} {seconds:.3f}s" for name, seconds in slowest]
+        return "\n".join(lines)
+
+    def log_report(self) -> None:
+        """Stop timing imports and log the report."""
+        self.disable()
+        logging.info(self.report())
+
+
+def add_import_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the LLM, upload and tracing options shared by main.py and batch_import.py."""
+    parser.add_argument("--no-llm-cache", action="store_true", help="Bypass the LLM response cache entirely")
+    parser.add_argument("--multi-week", action="store_true", help="Extract several weeks per LLM call, batched by token budget")
+    parser.add_argument("--stream-llm", action="store_true", help="Stream each week's LLM response and match and upload every day as soon as it has been generated")
+    parser.add_argument("--refresh-llm-cache", action="store_true", help="Ignore cached LLM responses and overwrite them with fresh ones")
+    parser.add_argument("--llm-rpm", type=int, help="Gemini requests-per-minute budget (default: unlimited)")
+    parser.add_argument("--llm-tpm", type=int, help="Gemini tokens-per-minute budget (default: unlimited)")
+    parser.add_argument("--llm-max-concurrency", type=int, default=1, help="Upper bound on concurrent Gemini calls; concurrency grows up to it while calls succeed (default: 1, suitable for the free tier)")
+    parser.add_argument("--async-upload", action="store_true", help="Upload through the asyncio engine with one rate limiter shared by all weeks")
+    parser.add_argument("--resume", action="store_true", help="Resume an interrupted import of the same file, skipping collections and workouts already created")
+    parser.add_argument("--upload-mode", choices=UPLOAD_MODES, default=UPLOAD_MODE_TWO_STEP, help="How workouts are created in Lyfta: two requests each (two-step), one request each (single), or one request with a two-step fallback when the server does not confirm the content (auto)")
+    parser.add_argument("--llm-backend", choices=["gemini", "replay"], default="gemini", help="Where week extractions come from: the Gemini API, or recorded responses replayed offline (default: gemini)")
+    parser.add_argument("--replay-dir", metavar="DIR", help="Directory of recorded result-{week}.json responses for --llm-backend replay")
+    parser.add_argument("--replay-latency", type=float, default=0.0, help="Seconds of simulated latency per replayed LLM call")
+    parser.add_argument("--replay-seconds-per-token", type=float, default=0.0, help="Seconds of simulated latency per replayed output token")
+    parser.add_argument("--pdf-workers", type=int, help="Processes rendering the pages of large PDFs (default: CPU count; 1 renders in-process)")
+    parser.add_argument("--pdf-skip-text", action="store_true", help="Leave the page text out of extracted PDFs, keeping only their tables")
+    parser.add_argument("--pdf-skip-tables", action="store_true", help="Leave the tables out of extracted PDFs, keeping only their page text")
+    parser.add_argument("--profile-startup", action="store_true", help="Log how long each startup phase and the slowest module imports took")
+    parser.add_argument("--trace-output", metavar="FILE", help="Write every recorded stage span, a per-stage summary and counters to FILE as JSON")
+    parser.add_argument("--metrics-output", metavar="FILE", help="Write per-stage timings and counters to FILE in the Prometheus text format")
+    parser.add_argument("--save-intermediate", metavar="DIR", help="Write each week's LLM output to DIR/result-{week}.json for debugging")
+
+
+def validate_import_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Exit with a usage error for inconsistent options."""
+    if args.llm_backend == "replay" and not args.replay_dir:
+        parser.error("--llm-backend replay requires --replay-dir")
+    if args.stream_llm and args.multi_week:
+        parser.error("--stream-llm extracts one week per call and cannot be combined with --multi-week")
+    if args.pdf_skip_text and args.pdf_skip_tables:
+        parser.error("--pdf-skip-text and --pdf-skip-tables leave nothing to extract")
+
+
+def build_llm_service(args: argparse.Namespace) -> "LLMService":
+    """Build the LLMService configured by the options of add_import_arguments."""
+    from app.services.document_extractor import DocumentExtractor
+    from app.services.llm_backends import GeminiBackend, ReplayBackend
+    from app.services.llm_cache import LLMResponseCache
+    from app.services.llm_scheduler import LLMScheduler
+    from app.services.llm_service import LLMService
+
+    if args.llm_backend == "replay":
+        llm_backend = ReplayBackend(args.replay_dir, latency=args.replay_latency, seconds_per_output_token=args.replay_seconds_per_token)
+    else:
+        llm_backend = GeminiBackend()
+    return LLMService(
+        document_extractor=DocumentExtractor(
+            pdf_workers=args.pdf_workers,
+            extract_text=not args.pdf_skip_text,
+            extract_tables=not args.pdf_skip_tables,
+        ),
+        backend=llm_backend,
+        response_cache=None if args.no_llm_cache else LLMResponseCache(),
+        refresh_cache=args.refresh_llm_cache,
+        scheduler=LLMScheduler(
+            requests_per_minute=args.llm_rpm,
+            tokens_per_minute=args.llm_tpm,
+            max_concurrency=args.llm_max_concurrency,
+        ),
+    )
+
+
+def export_traces(args: argparse.Namespace) -> None:
+    """Log the per-stage summary and write the trace and metrics files that were asked for."""
+    tracer.log_summary()
+    if args.trace_output:
+        tracer.export_json(args.trace_output)
+    if args.metrics_output:
+        tracer.export_prometheus(args.metrics_output)
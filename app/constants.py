@@ -1,3 +1,5 @@
+import os
+
 
 WORKOUT_DURATION_PROMPT = """
     How many weeks long is the workout program?
@@ -65,3 +67,62 @@ exercise_dict = {
 }
 
 EXERCISE_DB_PATH = "exercises_web.json"
+# Fuzzy score (0-100) from which a name is treated as an alias in exercise_dict
+ALIAS_MATCH_THRESHOLD = 95
+
+EXTRACTION_CACHE_DIR = os.path.join(".cache", "extraction")
+# PDFs with fewer pages are rendered in-process, where a process pool costs more than it saves
+PDF_PARALLEL_MIN_PAGES = 8
+PDF_CHUNKS_PER_WORKER = 2
+# Extracted documents kept in memory; repeats beyond that come from the on-disk cache
+DOCUMENT_MEMO_SIZE = 16
+LLM_CACHE_PATH = os.path.join(".cache", "llm_responses.sqlite3")
+LLM_CACHE_MAX_BYTES = 64 * 1024 * 1024
+GEMINI_MAX_OUTPUT_TOKENS = 65536
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# Embedding backend of the exercise matcher: "sentence-transformers" (PyTorch) or
+# "onnx", an int8-quantized export written by python -m app.services.embedding_backends
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "sentence-transformers")
+ONNX_EMBEDDING_DIR = os.environ.get("ONNX_EMBEDDING_DIR", os.path.join("models", f"{EMBEDDING_MODEL_NAME}-onnx-int8"))
+EMBEDDING_BATCH_SIZE = 64
+# Directory created next to the exercise database for the persisted FAISS index
+EXERCISE_INDEX_DIR_NAME = ".exercise_index"
+# FAISS index searched for semantic matches: "flat" (exact), "hnsw" or "ivf".
+# The approximate types only pay off for catalogs of tens of thousands of exercises.
+EXERCISE_INDEX_TYPE = os.environ.get("EXERCISE_INDEX_TYPE", "flat")
+# Extra exercise catalogs searched alongside the database, as name=path pairs
+# separated by commas, e.g. "custom=my_exercises.json"
+EXERCISE_CATALOGS = os.environ.get("EXERCISE_CATALOGS", "")
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+# IVF indexes get about IVF_LISTS_PER_SQRT * sqrt(n) lists, each trained on at
+# least IVF_MIN_POINTS_PER_LIST exercises; smaller catalogs fall back to flat
+IVF_LISTS_PER_SQRT = 4
+IVF_MIN_POINTS_PER_LIST = 39
+IVF_NPROBE = 32
+MATCH_CACHE_PATH = os.path.join(".cache", "match_cache.json")
+# Point at a local stand-in such as app.services.lyfta_mock_server for offline testing
+LYFTA_BASE_URL = os.environ.get("LYFTA_BASE_URL", "https://my.lyfta.app/api").rstrip("/")
+LYFTA_CONNECT_TIMEOUT = 10
+LYFTA_READ_TIMEOUT = 60
+LYFTA_POOL_SIZE = 10
+LYFTA_MAX_RETRIES = 4
+LYFTA_BACKOFF_BASE = 1.0
+# Workouts of one week uploaded concurrently on the synchronous upload path
+LYFTA_WORKOUT_CONCURRENCY = 4
+# Workout upload modes: the original skeleton-then-content pair of requests,
+# a single request carrying the full workout, or a single request that falls
+# back to the pair whenever the server does not confirm it stored the content.
+UPLOAD_MODE_TWO_STEP = "two-step"
+UPLOAD_MODE_SINGLE = "single"
+UPLOAD_MODE_AUTO = "auto"
+UPLOAD_MODES = (UPLOAD_MODE_TWO_STEP, UPLOAD_MODE_SINGLE, UPLOAD_MODE_AUTO)
+UPLOAD_JOURNAL_PATH = os.path.join(".cache", "upload_journal.sqlite3")
+JOB_STORE_PATH = os.path.join(".cache", "import_jobs.sqlite3")
+JOB_UPLOAD_DIR = os.path.join(".cache", "job_files")
+IMPORT_SERVICE_PORT = 8780
+# Spans the import service keeps for its trace and metrics exports; stage totals stay exact
+SERVICE_TRACE_MAX_SPANS = 20000
+# Number of module imports listed by --profile-startup
+STARTUP_PROFILE_TOP_IMPORTS = 15
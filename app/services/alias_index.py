@@ -0,0 +1,134 @@
+from collections import defaultdict
+from typing import Dict, Optional, Set, Tuple
+import numpy as np
+from fuzzywuzzy import process, utils
+
+from app.constants import ALIAS_MATCH_THRESHOLD
+
+
+class AliasIndex:
+    """
+    Precompiled lookup over an alias table such as app.constants.exercise_dict.
+
+    A query is resolved by an exact hash lookup on its processed form first.
+    Otherwise a character-trigram inverted index shortlists the aliases that
+    share the most trigrams with it (scored with vectorized Dice similarity),
+    and fuzzywuzzy's default scorer ranks only that shortlist. When no
+    shortlisted alias scores at least threshold, a second, larger shortlist
+    is scored: aliases sharing the most word prefixes with the query, which
+    catches abbreviated names, then the next best by trigrams. The fuzzy
+    scorer therefore sees at most shortlist_size + second_pass_size aliases
+    per query, however large the table. The result approximates a full
+    scan's: an alias outside both shortlists is never considered.
+    """
+
+    def __init__(self, aliases: Dict[str, str], shortlist_size: int = 25, threshold: int = ALIAS_MATCH_THRESHOLD, second_pass_size: int = 100):
+        """
+        Build the index.
+
+        :param aliases: Mapping of alias to canonical exercise name.
+        :param shortlist_size: Maximum number of candidates passed to the fuzzy scorer.
+        :param threshold: Score below which the second shortlist is scored too.
+        :param second_pass_size: Maximum number of candidates in the second shortlist.
+        """
+        self.aliases = aliases
+        self.shortlist_size = shortlist_size
+        self.threshold = threshold
+        self.second_pass_size = second_pass_size
+        self.keys = list(aliases.keys())
+        self._exact: Dict[str, str] = {}
+        postings = defaultdict(list)
+        prefix_postings = defaultdict(set)
+        self._gram_counts = np.zeros(len(self.keys), dtype=np.float32)
+        for i, key in enumerate(self.keys):
+            processed = utils.full_process(key)
+            self._exact.setdefault(processed, key)
+            grams = self._trigrams(processed)
+            self._gram_counts[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+            for prefix in self._prefixes(processed):
+                prefix_postings[prefix].add(i)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._prefix_postings = {prefix: np.array(sorted(ids), dtype=np.int32) for prefix, ids in prefix_postings.items()}
+
+    @staticmethod
+    def _trigrams(text: str) -> Set[str]:
+        """
+        Return the character trigrams of each whitespace-separated token, padded at the token boundaries.
+
+        :param text: Processed text.
+        :return: Set of trigrams.
+        """
+        grams = set()
+        for token in text.split():
+            padded = f"  {token} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return grams
+
+    @staticmethod
+    def _prefixes(text: str) -> Set[str]:
+        """Return the first three characters of each whitespace-separated token, e.g. "inc" for "incline" and "incl"."""
+        return {token[:3] for token in text.split()}
+
+    def exact(self, query: str) -> Optional[str]:
+        """
+        Return the canonical name for a query that equals an alias after processing.
+
+        :param query: Exercise name to look up.
+        :return: Canonical exercise name, or None if no alias matches exactly.
+        """
+        key = self._exact.get(utils.full_process(query))
+        return self.aliases[key] if key is not None else None
+
+    def find_closest(self, query: str) -> Tuple[Optional[str], Optional[str], int]:
+        """
+        Find the closest alias for the query.
+
+        :param query: Exercise name to match.
+        :return: Canonical name, matched alias and fuzzy match score (0-100). Name and alias are None if no alias shares a trigram with the query.
+        """
+        processed = utils.full_process(query)
+        if not processed:
+            raise ValueError(f"Exercise name has no matchable characters: {query!r}")
+        key = self._exact.get(processed)
+        if key is not None:
+            return self.aliases[key], key, 100
+
+        grams = self._trigrams(processed)
+        hits = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not hits:
+            return None, None, 0
+        overlap = np.bincount(np.concatenate(hits), minlength=len(self.keys))
+        dice = 2 * overlap / (self._gram_counts + len(grams))
+        candidate_count = min(self.shortlist_size, int(np.count_nonzero(overlap)))
+        # Sorted back into table order, so ties within the shortlist break the way a full scan would
+        shortlist = np.sort(np.argpartition(-dice, candidate_count - 1)[:candidate_count])
+
+        match, score = process.extractOne(query, [self.keys[i] for i in shortlist])
+        if score < self.threshold:
+            second_shortlist = self._second_shortlist(processed, dice, shortlist)
+            if len(second_shortlist):
+                second_match, second_score = process.extractOne(query, [self.keys[i] for i in second_shortlist])
+                if second_score > score:
+                    match, score = second_match, second_score
+        return self.aliases[match], match, score
+
+    def _second_shortlist(self, processed: str, dice: np.ndarray, shortlist: np.ndarray) -> np.ndarray:
+        """
+        Pick the candidates scored after the first shortlist came up short.
+
+        :param processed: Processed query.
+        :param dice: Trigram Dice similarity of every alias to the query.
+        :param shortlist: Aliases already scored.
+        :return: Up to second_pass_size alias positions, in table order.
+        """
+        hits = [self._prefix_postings[prefix] for prefix in self._prefixes(processed) if prefix in self._prefix_postings]
+        shared_prefixes = np.bincount(np.concatenate(hits), minlength=len(self.keys)) if hits else np.zeros(len(self.keys))
+        # Dice is at most 1, so aliases sharing more word prefixes always rank first
+        rank = shared_prefixes + dice
+        rank[shortlist] = 0
+        candidate_count = min(self.second_pass_size, int(np.count_nonzero(rank)))
+        if candidate_count == 0:
+            return shortlist[:0]
+        return np.sort(np.argpartition(-rank, candidate_count - 1)[:candidate_count])
@@ -0,0 +1,307 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+
+from app.constants import LYFTA_CONNECT_TIMEOUT, LYFTA_READ_TIMEOUT, LYFTA_MAX_RETRIES
+from app.services.lyfta_api_service import APIClient, TRANSIENT_STATUS_CODES, UNPROCESSED_STATUS_CODES, UPLOAD_MODES, UPLOAD_MODE_TWO_STEP, UPLOAD_MODE_SINGLE
+from app.services.upload_journal import UploadJournal
+from app.services.tracing import tracer
+
+
+class AsyncTokenBucket:
+    """Token bucket shared by every request of an event loop."""
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        Initialize the AsyncTokenBucket.
+
+        :param rate: Tokens added per second.
+        :param capacity: Maximum number of tokens, i.e. the allowed burst size.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncUploadEngine:
+    """
+    Upload weeks to Lyfta from a single asyncio event loop.
+
+    All weeks share one token bucket enforcing APIClient.MAX_CALLS per
+    APIClient.PERIOD and one bound on in-flight requests. Within a week, the
+    workouts are created concurrently once the collection they depend on
+    exists. The loop runs in a background thread, so thread-based callers
+    submit weeks and wait on the returned futures.
+    """
+
+    def __init__(self, max_in_flight: int = APIClient.MAX_CALLS, connect_timeout: float = LYFTA_CONNECT_TIMEOUT, read_timeout: float = LYFTA_READ_TIMEOUT, max_retries: int = LYFTA_MAX_RETRIES, upload_mode: str = UPLOAD_MODE_TWO_STEP):
+        """
+        Initialize the AsyncUploadEngine and start its event loop.
+
+        :param max_in_flight: Maximum number of concurrent requests.
+        :param connect_timeout: Seconds to wait for a connection to be established.
+        :param read_timeout: Seconds to wait for the server to respond.
+        :param max_retries: Retries per request for transport errors, 429 and 5xx responses.
+        :param upload_mode: One of lyfta_api_service.UPLOAD_MODES, selecting how many requests a workout takes.
+        """
+        if upload_mode not in UPLOAD_MODES:
+            raise ValueError(f"Unsupported upload mode: {upload_mode}")
+        self.logging = logging.getLogger(__name__)
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.upload_mode = upload_mode
+        self.single_request_supported = None
+        self._workouts_created = 0
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._requests_by_endpoint = Counter()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="lyfta-upload-loop", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+
+    async def _setup(self) -> None:
+        # Created inside the loop so they bind to it
+        self._bucket = AsyncTokenBucket(rate=APIClient.MAX_CALLS / APIClient.PERIOD, capacity=APIClient.MAX_CALLS)
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._client = httpx.AsyncClient(
+            base_url=APIClient.BASE_URL + "/",
+            headers=APIClient.HEADERS,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight),
+        )
+
+    def submit_week(self, week_number: int, formatted_workouts: List[Dict[str, Any]], cookie: str, journal: Optional[UploadJournal] = None, program_key: Optional[str] = None) -> Future:
+        """
+        Schedule the upload of a week's collection and workouts.
+
+        :param week_number: Week number, used for the collection name and sort order.
+        :param formatted_workouts: Workouts as returned by WorkoutProgramParser.format_workout_data.
+        :param cookie: Cookie for the Lyfta account.
+        :param journal: Journal used to skip items an earlier run already created.
+        :param program_key: Key of the program in the journal.
+        :return: Future resolving to the created workout IDs.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.upload_week(week_number, formatted_workouts, cookie, journal, program_key), self._loop
+        )
+
+    def submit_collection(self, week_number: int, cookie: str, journal: Optional[UploadJournal] = None, program_key: Optional[str] = None) -> Future:
+        """
+        Schedule the creation of a week's collection, for weeks whose workouts are submitted one at a time.
+
+        :return: Future resolving to the collection ID and user ID.
+        """
+        return asyncio.run_coroutine_threadsafe(self.open_collection(week_number, cookie, journal, program_key), self._loop)
+
+    def submit_workout(self, week_number: int, position: int, workout: Dict[str, Any], collection: Tuple[str, str], cookie: str, journal: Optional[UploadJournal] = None, program_key: Optional[str] = None) -> Future:
+        """
+        Schedule the upload of one workout into a collection created by submit_collection.
+
+        :param position: Position of the workout within its week, part of its journal key.
+        :return: Future resolving to the workout ID.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.upload_workout(week_number, position, workout, collection, cookie, journal, program_key), self._loop
+        )
+
+    async def upload_week(self, week_number: int, formatted_workouts: List[Dict[str, Any]], cookie: str, journal: Optional[UploadJournal] = None, program_key: Optional[str] = None) -> List[str]:
+        collection = await self.open_collection(week_number, cookie, journal, program_key)
+        workout_ids = await asyncio.gather(*[
+            self.upload_workout(week_number, position, workout, collection, cookie, journal, program_key)
+            for position, workout in enumerate(formatted_workouts)
+        ])
+        if journal:
+            await asyncio.to_thread(journal.complete_week, program_key, week_number)
+        self.logging.info(f'Processed Week {week_number}')
+        return list(workout_ids)
+
+    async def open_collection(self, week_number: int, cookie: str, journal: Optional[UploadJournal] = None, program_key: Optional[str] = None) -> Tuple[str, str]:
+        """Create the week's collection, unless the journal records one from an earlier run, and return its ID and the user ID."""
+        collection_name = f"Week {week_number}"
+        # Journal calls block on SQLite, so they run in worker threads rather than on the event loop
+        collection = await asyncio.to_thread(journal.get_collection, program_key, week_number) if journal else None
+        if collection:
+            collection_id, user_id = collection
+            self.logging.info(f"Reusing collection '{collection_name}' with ID {collection_id}")
+            return collection_id, user_id
+        collection_id, user_id = await self.create_collection(collection_name, week_number, cookie)
+        if journal:
+            await asyncio.to_thread(journal.record_collection, program_key, week_number, collection_id, user_id)
+        return collection_id, user_id
+
+    async def upload_workout(self, week_number: int, position: int, workout: Dict[str, Any], collection: Tuple[str, str], cookie: str, journal: Optional[UploadJournal] = None, program_key: Optional[str] = None) -> str:
+        """Upload a workout into the week's collection, skipping or completing it as the journal records, and return its ID."""
+        collection_id, user_id = collection
+        collection_name = f"Week {week_number}"
+        if not journal:
+            return await self.create_workout_in_collection(workout, collection_id, user_id, collection_name, cookie)
+        workout_key = journal.workout_key(position, workout["title"])
+        recorded = await asyncio.to_thread(journal.get_workout, program_key, week_number, workout_key)
+        if recorded and recorded[1]:
+            self.logging.info(f"Skipping already uploaded workout '{workout['title']}'")
+            return recorded[0]
+        if recorded:
+            workout_id = recorded[0]
+            await self.save_workout(workout, workout_id, user_id, cookie)
+        else:
+            workout_id = await self.create_workout(
+                workout, collection_id, user_id, collection_name, cookie,
+                on_created=lambda created_id: journal.record_workout(program_key, week_number, workout_key, created_id, completed=False),
+            )
+        await asyncio.to_thread(journal.record_workout, program_key, week_number, workout_key, workout_id, completed=True)
+        return workout_id
+
+    async def send_request(self, endpoint: str, data: Dict[str, Any], cookie: str) -> httpx.Response:
+        """Send a POST request, retrying transient failures with exponential backoff; creates are only retried if they were not processed."""
+        idempotent = APIClient.is_idempotent(endpoint, data)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._send_once(endpoint, data, cookie)
+            except httpx.HTTPError as e:
+                if attempt == self.max_retries or not self.is_transient_error(e, idempotent):
+                    raise
+                retry_after = e.response.headers.get("Retry-After") if isinstance(e, httpx.HTTPStatusError) else None
+                delay = APIClient.retry_delay(attempt, retry_after)
+                self.logging.warning(f"Retrying {endpoint} in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries}): {e}")
+                tracer.annotate(retries=1, retry_wait_s=delay)
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def is_transient_error(error: Exception, idempotent: bool = True) -> bool:
+        """
+        Return True for request failures worth retrying.
+
+        :param error: Exception raised by the request.
+        :param idempotent: Whether the request can safely be processed twice; if not, only failures before the server processed it are retried.
+        """
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in (TRANSIENT_STATUS_CODES if idempotent else UNPROCESSED_STATUS_CODES)
+        if not idempotent:
+            # Only these fail before the request is sent
+            return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+        return isinstance(error, httpx.TransportError)
+
+    async def _send_once(self, endpoint: str, data: Dict[str, Any], cookie: str) -> httpx.Response:
+        queued_at = time.perf_counter()
+        await self._bucket.acquire()
+        async with self._in_flight:
+            # Time spent waiting for the token bucket and a free request slot
+            tracer.annotate(queue_wait_s=time.perf_counter() - queued_at, requests=1)
+            self._requests_by_endpoint[endpoint] += 1
+            try:
+                response = await self._client.post(endpoint, json=data, headers={"Cookie": cookie})
+                response.raise_for_status()
+                return response
+            except httpx.HTTPStatusError as e:
+                self.logging.error(f"HTTP error while accessing {endpoint}: {e}, Status Code: {e.response.status_code}, Response: {e.response.text}")
+                raise
+            except httpx.HTTPError as e:
+                self.logging.error(f"Request failed for {endpoint}: {e}")
+                raise
+
+    async def create_collection(self, collection_name: str, week_number: int, cookie: str) -> Tuple[str, str]:
+        """Create a new collection and return its ID and the user ID."""
+        data = APIClient.build_collection_payload(collection_name, week_number)
+        with tracer.span("collection_create", week=week_number):
+            response = await self.send_request(APIClient.COLLECTION_ENDPOINT, data, cookie)
+        collection_id = response.json().get("data", {}).get("id")
+        user_id = response.json().get("data", {}).get("user_id")
+        if not collection_id:
+            raise ValueError("Failed to retrieve collection ID from API response")
+        self.logging.info(f"Created collection '{collection_name}' with ID {collection_id}")
+        return collection_id, user_id
+
+    async def create_workout_in_collection(self, workout: Dict[str, Any], collection_id: str, user_id: str, collection_name: str, cookie: str) -> str:
+        """Create a new workout inside a collection and return its ID."""
+        return await self.create_workout(workout, collection_id, user_id, collection_name, cookie)
+
+    async def create_workout(self, workout: Dict[str, Any], collection_id: str, user_id: str, collection_name: str, cookie: str, on_created: Optional[Callable[[str], None]] = None) -> str:
+        """Create a workout with its content in as few requests as the upload mode allows; see APIClient.create_workout. on_created runs in a worker thread."""
+        with tracer.span("workout_create", collection=collection_name, workout=workout["title"], upload_mode=self.upload_mode):
+            return await self._create_workout(workout, collection_id, user_id, collection_name, cookie, on_created)
+
+    async def _create_workout(self, workout: Dict[str, Any], collection_id: str, user_id: str, collection_name: str, cookie: str, on_created: Optional[Callable[[str], None]]) -> str:
+        if self.upload_mode != UPLOAD_MODE_TWO_STEP and self.single_request_supported is not False:
+            payload = APIClient.build_full_workout_payload(workout, collection_id, user_id, collection_name)
+            try:
+                response = await self.send_request(APIClient.WORKOUT_ENDPOINT, payload, cookie)
+            except httpx.HTTPStatusError as e:
+                # Auth failures, invalid workouts and server errors are not about the payload shape
+                if self.upload_mode == UPLOAD_MODE_SINGLE or not APIClient.is_unsupported_payload_error(e):
+                    raise
+                self.single_request_supported = False
+                self.logging.info("Endpoint rejected a full workout in one request; falling back to two-step uploads")
+            else:
+                data = response.json().get("data", {})
+                workout_id = data.get("id")
+                if not workout_id:
+                    raise ValueError("Failed to retrieve workout ID from API response")
+                self.logging.info(f"Created workout '{workout['title']}' with ID {workout_id}")
+                if self.upload_mode != UPLOAD_MODE_SINGLE and not APIClient.confirms_workout_content(data, workout):
+                    if on_created:
+                        await asyncio.to_thread(on_created, workout_id)
+                    await self.save_workout(workout, workout_id, user_id, cookie)
+                else:
+                    self.single_request_supported = True
+                self._workouts_created += 1
+                return workout_id
+
+        workout_id = await self.create_workout_skeleton(workout, collection_id, collection_name, cookie)
+        if on_created:
+            await asyncio.to_thread(on_created, workout_id)
+        await self.save_workout(workout, workout_id, user_id, cookie)
+        self._workouts_created += 1
+        return workout_id
+
+    async def create_workout_skeleton(self, workout: Dict[str, Any], collection_id: str, collection_name: str, cookie: str) -> str:
+        """Create an empty workout inside a collection and return its ID."""
+        payload1 = APIClient.build_workout_skeleton_payload(workout, collection_id, collection_name)
+        response = await self.send_request(APIClient.WORKOUT_ENDPOINT, payload1, cookie)
+        workout_id = response.json().get("data", {}).get("id")
+        if not workout_id:
+            raise ValueError("Failed to retrieve workout ID from API response")
+        self.logging.info(f"Created workout '{workout['title']}' with ID {workout_id}")
+        return workout_id
+
+    async def save_workout(self, workout: Dict[str, Any], workout_id: str, user_id: str, cookie: str) -> None:
+        """Save the full content of a workout that already has an ID."""
+        workout["id"] = workout_id
+        workout["user_id"] = user_id
+        await self.send_request(APIClient.WORKOUT_ENDPOINT, {"workout": workout}, cookie)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return request counts per endpoint and per workout."""
+        requests_by_endpoint = dict(self._requests_by_endpoint)
+        workout_requests = requests_by_endpoint.get(APIClient.WORKOUT_ENDPOINT, 0)
+        return {
+            "requests": sum(requests_by_endpoint.values()),
+            "requests_by_endpoint": requests_by_endpoint,
+            "workouts_created": self._workouts_created,
+            "requests_per_workout": workout_requests / self._workouts_created if self._workouts_created else 0.0,
+        }
+
+    def close(self) -> None:
+        """Close the HTTP client and stop the event loop."""
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from app.constants import EXERCISE_DB_PATH, LYFTA_WORKOUT_CONCURRENCY
+from app.services.import_pipeline import ImportPipeline
+from app.services.llm_service import LLMService
+from app.services.lyfta_api_service import APIClient, UPLOAD_MODE_TWO_STEP
+from app.services.tracing import tracer
+from app.services.upload_journal import UploadJournal
+
+if TYPE_CHECKING:
+    from app.services.exercise_matcher import ExerciseMatcher
+
+# File types picked up when a directory is given as input
+SUPPORTED_EXTENSIONS = (".xlsx", ".xls", ".pdf", ".txt", ".csv")
+
+STATUS_SUCCEEDED = "succeeded"
+STATUS_PARTIAL = "partial"
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class FileImportResult:
+    """Outcome of importing one file."""
+    file_path: str
+    status: str
+    seconds: float
+    failed_weeks: List[int] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class BatchImporter:
+    """
+    Import many workout files while sharing the expensive resources between them.
+
+    All files go through one LLMService (and so one scheduler and response
+    cache), one ExerciseMatcher loaded once in the background, one pooled
+    Lyfta client or async upload engine, and one upload journal. At most
+    max_concurrent_files files are imported at a time, and the upload
+    workers are split evenly between them. A file that fails is recorded and
+    does not affect the others.
+    """
+
+    def __init__(
+        self,
+        llm_service: LLMService,
+        exercise_db_path: str = EXERCISE_DB_PATH,
+        max_concurrent_files: int = 2,
+        upload_workers: Optional[int] = None,
+        multi_week: bool = False,
+        async_upload: bool = False,
+        upload_mode: str = UPLOAD_MODE_TWO_STEP,
+        journal: Optional[UploadJournal] = None,
+        resume: bool = False,
+        intermediate_dir: Optional[str] = None,
+        stream_llm: bool = False,
+    ):
+        """
+        Initialize the BatchImporter and start loading the exercise matcher.
+
+        :param llm_service: Service used for the LLM calls of every file.
+        :param exercise_db_path: Path to the exercise database JSON file.
+        :param max_concurrent_files: Maximum number of files imported at the same time.
+        :param upload_workers: Weeks uploaded concurrently across all files; sizes the shared connection pool.
+        :param multi_week: Extract several weeks per LLM call.
+        :param async_upload: Upload through one shared asyncio engine.
+        :param upload_mode: How workouts are created in Lyfta; one of lyfta_api_service.UPLOAD_MODES.
+        :param journal: Journal recording created collections and workouts, or None to disable it.
+        :param resume: Continue earlier imports of the same files.
+        :param intermediate_dir: If set, each file's LLM output is written to a subdirectory named after the file.
+        :param stream_llm: Stream each week's LLM response and match and upload its days as they are generated.
+        """
+        self.llm_service = llm_service
+        self.max_concurrent_files = max(1, max_concurrent_files)
+        self.upload_workers = upload_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.multi_week = multi_week
+        self.stream_llm = stream_llm
+        self.upload_mode = upload_mode
+        self.journal = journal
+        self.resume = resume
+        self.intermediate_dir = intermediate_dir
+        self.api_client = APIClient(pool_size=self.upload_workers * LYFTA_WORKOUT_CONCURRENCY, upload_mode=upload_mode)
+        self.upload_engine = None
+        if async_upload:
+            from app.services.async_upload_engine import AsyncUploadEngine
+
+            self.upload_engine = AsyncUploadEngine(upload_mode=upload_mode)
+        self._matcher_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="matcher-load")
+        self.matcher_future = self._matcher_executor.submit(self._load_matcher, exercise_db_path)
+        self._progress_lock = threading.Lock()
+
+    @staticmethod
+    def _load_matcher(exercise_db_path: str) -> "ExerciseMatcher":
+        from app.services.exercise_matcher import ExerciseMatcher
+
+        with tracer.span("matcher_load"):
+            return ExerciseMatcher(exercise_db_path)
+
+    def import_file(
+        self,
+        file_path: str,
+        cookie: str,
+        resume: Optional[bool] = None,
+        on_week_done: Optional[Callable[[int, Optional[str]], None]] = None,
+    ) -> FileImportResult:
+        """
+        Import one file with the shared resources, never raising.
+
+        :param file_path: Path to the workout file.
+        :param cookie: Cookie for the Lyfta account the file is imported into.
+        :param resume: Continue an earlier import of the file; defaults to the importer's setting.
+        :param on_week_done: Called with the week number and None, or an error message, as each week finishes.
+        :return: Outcome of the import.
+        """
+        start_time = time.time()
+        intermediate_dir = None
+        if self.intermediate_dir:
+            intermediate_dir = os.path.join(self.intermediate_dir, os.path.splitext(os.path.basename(file_path))[0])
+        pipeline = ImportPipeline(
+            self.llm_service,
+            multi_week=self.multi_week,
+            stream_llm=self.stream_llm,
+            intermediate_dir=intermediate_dir,
+            upload_workers=max(1, self.upload_workers // self.max_concurrent_files),
+            journal=self.journal,
+            resume=self.resume if resume is None else resume,
+            upload_mode=self.upload_mode,
+            api_client=self.api_client,
+            upload_engine=self.upload_engine,
+            matcher_future=self.matcher_future,
+            on_week_done=on_week_done,
+        )
+        try:
+            failed_weeks = pipeline.run(file_path, cookie)
+        except Exception as e:
+            logging.error(f"Import of {file_path} failed: {e}", exc_info=True)
+            return FileImportResult(file_path, STATUS_FAILED, time.time() - start_time, error=str(e))
+        status = STATUS_PARTIAL if failed_weeks else STATUS_SUCCEEDED
+        return FileImportResult(file_path, status, time.time() - start_time, failed_weeks=failed_weeks)
+
+    def run(self, jobs: List[Tuple[str, str]]) -> List[FileImportResult]:
+        """
+        Import files concurrently, logging progress as each one finishes.
+
+        :param jobs: (file path, Lyfta cookie) pairs.
+        :return: Outcome per file, in the order of jobs.
+        """
+        results: Dict[int, FileImportResult] = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_files, thread_name_prefix="file-import") as executor:
+            futures = {}
+            for index, (file_path, cookie) in enumerate(jobs):
+                futures[executor.submit(self.import_file, file_path, cookie)] = index
+            for future in as_completed(futures):
+                index = futures[future]
+                result = future.result()
+                results[index] = result
+                with self._progress_lock:
+                    logging.info(
+                        f"[{len(results)}/{len(jobs)}] {result.file_path}: {result.status} in {result.seconds:.1f}s"
+                        + (f", failed weeks {result.failed_weeks}" if result.failed_weeks else "")
+                        + (f" ({result.error})" if result.error else "")
+                    )
+        return [results[index] for index in range(len(jobs))]
+
+    def close(self) -> None:
+        """Close the shared clients and save the match cache."""
+        if self.matcher_future.done() and self.matcher_future.exception() is None:
+            self.matcher_future.result().save_match_cache()
+        self._matcher_executor.shutdown(wait=True)
+        if self.upload_engine is not None:
+            logging.info(f"Lyfta API metrics: {self.upload_engine.metrics()}")
+            self.upload_engine.close()
+        else:
+            logging.info(f"Lyfta API metrics: {self.api_client.metrics()}")
+        self.api_client.close()
+
+    @staticmethod
+    def collect_inputs(paths: List[str]) -> List[str]:
+        """Expand directories to the supported workout files they contain, sorted by name."""
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(
+                    os.path.join(path, name) for name in sorted(os.listdir(path))
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS) and os.path.isfile(os.path.join(path, name))
+                )
+            else:
+                files.append(path)
+        return files
+
+    @staticmethod
+    def read_manifest(manifest_path: str, default_cookie: Optional[str]) -> List[Tuple[str, str]]:
+        """
+        Read a JSON manifest listing the files to import.
+
+        Entries are either a file path or an object with "file_path" and an
+        optional "lyfta_cookie", so files can go to different accounts.
+        Relative paths are resolved against the manifest's directory.
+
+        :param manifest_path: Path to the manifest file.
+        :param default_cookie: Cookie for entries without their own.
+        :return: (file path, Lyfta cookie) pairs.
+        """
+        with open(manifest_path, "r") as f:
+            entries = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(manifest_path))
+        jobs = []
+        for entry in entries:
+            if isinstance(entry, str):
+                entry = {"file_path": entry}
+            cookie = entry.get("lyfta_cookie") or default_cookie
+            if not cookie:
+                raise ValueError(f"No Lyfta cookie for {entry['file_path']}; set lyfta_cookie or pass --lyfta-cookie")
+            jobs.append((os.path.join(base_dir, entry["file_path"]), cookie))
+        return jobs
@@ -0,0 +1,225 @@
+import os
+import math
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.constants import DOCUMENT_MEMO_SIZE, EXTRACTION_CACHE_DIR, PDF_CHUNKS_PER_WORKER, PDF_PARALLEL_MIN_PAGES
+from app.utils import compute_file_hash
+from app.services.tracing import tracer
+
+# Bump whenever the rendered text for a given input file would change, so
+# stale entries in the on-disk cache are never served.
+EXTRACTOR_VERSION = "2"
+
+
+@dataclass(frozen=True)
+class ExtractedDocument:
+    """Normalized text of a workout file together with its content hash."""
+    file_path: str
+    content_hash: str
+    text: str
+
+
+def render_pdf_pages(file_path: str, page_numbers: Sequence[int], extract_text: bool = True, extract_tables: bool = True) -> List[str]:
+    """
+    Render a range of PDF pages to text.
+
+    Module-level so that it can run in a worker process.
+
+    :param file_path: Path to the PDF file.
+    :param page_numbers: Zero-based numbers of the pages to render.
+    :param extract_text: Include the text of each page.
+    :param extract_tables: Include each page's tables as markdown.
+    :return: Rendered text of each page, in the order of page_numbers.
+    """
+    import pandas as pd
+    import pdfplumber
+
+    rendered = []
+    with pdfplumber.open(file_path) as pdf:
+        for i in page_numbers:
+            page = pdf.pages[i]
+            parts = [f"--- Page {i+1} ---\n\n"]
+            if extract_text:
+                text = page.extract_text()
+                if text:
+                    parts.append(text + "\n\n")
+            if extract_tables:
+                # Convert tables to markdown
+                for table in page.extract_tables():
+                    df = pd.DataFrame(table[1:], columns=table[0])
+                    parts.append(df.to_markdown(index=False) + "\n\n")
+            rendered.append("".join(parts))
+            # Release the page's parsed objects, which pdfplumber otherwise keeps for the whole document
+            page.close()
+    return rendered
+
+
+class DocumentExtractor:
+    def __init__(
+        self,
+        cache_dir: Optional[str] = EXTRACTION_CACHE_DIR,
+        pdf_workers: Optional[int] = None,
+        extract_text: bool = True,
+        extract_tables: bool = True,
+        memo_size: int = DOCUMENT_MEMO_SIZE,
+    ):
+        """
+        Initialize the DocumentExtractor.
+
+        :param cache_dir: Directory for the on-disk extraction cache. Pass None to disable it.
+        :param pdf_workers: Processes rendering the pages of a PDF; defaults to the CPU count. 1 renders in-process.
+        :param extract_text: Include the text of PDF pages.
+        :param extract_tables: Include the tables of PDF pages as markdown.
+        :param memo_size: Number of most recently used documents kept in memory.
+        """
+        self.cache_dir = cache_dir
+        self.pdf_workers = pdf_workers or os.cpu_count() or 1
+        self.extract_text = extract_text
+        self.extract_tables = extract_tables
+        self.memo_size = max(1, memo_size)
+        self._documents: "OrderedDict[Tuple[str, int, int], ExtractedDocument]" = OrderedDict()
+        # Extractions in progress, so each file is parsed once however many callers ask for it
+        self._pending: Dict[Tuple[str, int, int], Future] = {}
+        self._lock = threading.Lock()
+
+    def extract(self, file_path: str) -> ExtractedDocument:
+        """
+        Return the normalized text of a workout file, extracting it at most once.
+
+        The most recently used results are memoized per process (keyed by
+        path, size and mtime), and all of them are persisted on disk keyed by
+        content hash and extractor version.
+
+        :param file_path: Path to the workout file.
+        :return: Extracted document.
+        """
+        with tracer.span("extract", file=os.path.basename(file_path)) as span:
+            stat = os.stat(file_path)
+            memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+            # Only the memo is locked; concurrent callers for the same file wait on its extraction's future
+            with self._lock:
+                document = self._documents.get(memo_key)
+                if document is not None:
+                    self._documents.move_to_end(memo_key)
+                    span.set(source="memory")
+                    return document
+                pending = self._pending.get(memo_key)
+                extracting = pending is None
+                if extracting:
+                    pending = self._pending[memo_key] = Future()
+            if not extracting:
+                span.set(source="memory")
+                return pending.result()
+
+            try:
+                document = self._load(file_path, span)
+            except BaseException as e:
+                with self._lock:
+                    del self._pending[memo_key]
+                pending.set_exception(e)
+                raise
+            with self._lock:
+                self._documents[memo_key] = document
+                if len(self._documents) > self.memo_size:
+                    self._documents.popitem(last=False)
+                del self._pending[memo_key]
+            pending.set_result(document)
+            return document
+
+    def _load(self, file_path: str, span) -> ExtractedDocument:
+        """Read a document from the on-disk cache, or render it and store it there."""
+        content_hash = compute_file_hash(file_path)
+        text = self._read_cache(content_hash)
+        if text is None:
+            logging.info(f"Extracting document: {file_path}")
+            span.set(source="file")
+            text = self._render(file_path)
+            self._write_cache(content_hash, text)
+        else:
+            logging.info(f"Loaded extracted document from cache: {file_path}")
+            span.set(source="disk_cache")
+        span.set(characters=len(text))
+        return ExtractedDocument(file_path=file_path, content_hash=content_hash, text=text)
+
+    def _render_pdf(self, file_path: str) -> List[str]:
+        """Render every page of a PDF, spreading contiguous page ranges over worker processes for large files."""
+        import pdfplumber
+
+        with pdfplumber.open(file_path) as pdf:
+            page_count = len(pdf.pages)
+        workers = min(self.pdf_workers, page_count)
+        with tracer.span("extract_pdf", pages=page_count, workers=workers if page_count >= PDF_PARALLEL_MIN_PAGES else 1):
+            if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+                return render_pdf_pages(file_path, range(page_count), self.extract_text, self.extract_tables)
+            # A few ranges per worker balance pages of uneven cost; each range opens the file once
+            chunk_size = math.ceil(page_count / (workers * PDF_CHUNKS_PER_WORKER))
+            chunks = [range(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # map yields results in submission order, so pages stay in order
+                rendered = executor.map(
+                    render_pdf_pages,
+                    [file_path] * len(chunks),
+                    chunks,
+                    [self.extract_text] * len(chunks),
+                    [self.extract_tables] * len(chunks),
+                )
+                return [page for chunk in rendered for page in chunk]
+
+    def _cache_path(self, content_hash: str) -> str:
+        options = ("" if self.extract_text else "-notext") + ("" if self.extract_tables else "-notables")
+        return os.path.join(self.cache_dir, f"{content_hash}-v{EXTRACTOR_VERSION}{options}.txt")
+
+    def _read_cache(self, content_hash: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(content_hash), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning(f"Could not read extraction cache: {e}")
+            return None
+
+    def _write_cache(self, content_hash: str, text: str) -> None:
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cache_path = self._cache_path(content_hash)
+            tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logging.warning(f"Could not write extraction cache: {e}")
+
+    def _render(self, file_path: str) -> str:
+        """
+        Read a workout file and convert it to a string representation.
+
+        :param file_path: Path to the workout file.
+        :return: Text representation of the file.
+        """
+        if file_path.endswith(('.xlsx', '.xls')):
+            import pandas as pd
+
+            # Read all sheets from the Excel file
+            excel_data = pd.read_excel(file_path, sheet_name=None)
+            parts = []
+            for sheet_name, df in excel_data.items():
+                parts.append(f"Sheet: {sheet_name}\n")
+                parts.append(df.to_markdown(index=False) + "\n\n")
+            workout_program = "".join(parts)
+        elif file_path.endswith('.pdf'):
+            workout_program = "".join(self._render_pdf(file_path))
+        else:
+            # For text files
+            with open(file_path, "r") as file:
+                workout_program = file.read()
+        return workout_program
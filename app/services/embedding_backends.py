@@ -0,0 +1,253 @@
+import os
+import json
+import logging
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+
+from app.constants import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MODEL_NAME,
+    ONNX_EMBEDDING_DIR,
+)
+
+EMBEDDING_BACKEND_SENTENCE_TRANSFORMERS = "sentence-transformers"
+EMBEDDING_BACKEND_ONNX = "onnx"
+EMBEDDING_BACKENDS = (EMBEDDING_BACKEND_SENTENCE_TRANSFORMERS, EMBEDDING_BACKEND_ONNX)
+
+# Files written by export_onnx and read by OnnxEmbeddingBackend
+ONNX_MODEL_FILE = "model_int8.onnx"
+ONNX_CONFIG_FILE = "embedding_config.json"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class EmbeddingBackend(ABC):
+    """A model that embeds short texts, such as exercise names, as float32 vectors."""
+
+    # Identifies the embeddings produced, part of the key of persisted FAISS indexes
+    name: str = ""
+
+    def __init__(self):
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def load(self) -> None:
+        """Load the model now rather than on the first encode."""
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+
+    @abstractmethod
+    def _load(self) -> None:
+        """Load the model; called once, under a lock."""
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts in batches.
+
+        :param texts: Texts to embed.
+        :return: Matrix of float32 embeddings, one row per text.
+        """
+        self.load()
+        return np.ascontiguousarray(self._encode(texts), dtype="float32")
+
+    @abstractmethod
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts with the loaded model."""
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Backend running a sentence-transformers model on PyTorch."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, batch_size: int = EMBEDDING_BATCH_SIZE):
+        """
+        Initialize the SentenceTransformerBackend.
+
+        :param model_name: sentence-transformers model name or path.
+        :param batch_size: Texts embedded per forward pass.
+        """
+        super().__init__()
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.name = f"{EMBEDDING_BACKEND_SENTENCE_TRANSFORMERS}:{model_name}"
+        self._model = None
+
+    def _load(self) -> None:
+        # Imported here: torch alone takes seconds to import
+        from sentence_transformers import SentenceTransformer
+        logging.info(f"Loading embedding model {self.model_name}")
+        self._model = SentenceTransformer(self.model_name)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self._model.encode(texts, batch_size=self.batch_size)
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """
+    Backend running an int8-quantized ONNX export of a sentence-transformers model on ONNX Runtime.
+
+    Needs only onnxruntime, tokenizers and numpy, not PyTorch. The model
+    directory is written by export_onnx, which records the pooling and
+    normalization of the source model so embeddings match it.
+    """
+
+    def __init__(self, model_dir: str = ONNX_EMBEDDING_DIR, batch_size: int = EMBEDDING_BATCH_SIZE, threads: Optional[int] = None):
+        """
+        Initialize the OnnxEmbeddingBackend.
+
+        :param model_dir: Directory written by export_onnx.
+        :param batch_size: Texts embedded per inference call.
+        :param threads: Intra-op threads for ONNX Runtime; defaults to its own choice.
+        """
+        super().__init__()
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+        self.threads = threads
+        config_path = os.path.join(model_dir, ONNX_CONFIG_FILE)
+        if not os.path.exists(config_path):
+            raise FileNotFoundError(
+                f"No exported embedding model in {model_dir}; create one with python -m app.services.embedding_backends --output {model_dir}"
+            )
+        with open(config_path, "r") as f:
+            self.config = json.load(f)
+        self.name = f"{EMBEDDING_BACKEND_ONNX}:{self.config['source_model']}:{self.config['quantization']}"
+        self._session = None
+        self._tokenizer = None
+        self._input_names: List[str] = []
+
+    def _load(self) -> None:
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        logging.info(f"Loading ONNX embedding model from {self.model_dir}")
+        options = onnxruntime.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        self._session = onnxruntime.InferenceSession(
+            os.path.join(self.model_dir, ONNX_MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = [model_input.name for model_input in self._session.get_inputs()]
+        tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, TOKENIZER_FILE))
+        tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        tokenizer.enable_padding(pad_id=self.config["pad_token_id"], pad_token=self.config["pad_token"])
+        self._tokenizer = tokenizer
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        batches = [self._encode_batch(texts[start:start + self.batch_size]) for start in range(0, len(texts), self.batch_size)]
+        return np.concatenate(batches) if batches else np.zeros((0, self.config["dimension"]), dtype="float32")
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype="int64")
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype="int64")
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.array([encoding.type_ids for encoding in encodings], dtype="int64")
+        token_embeddings = self._session.run(None, inputs)[0]
+        mask = attention_mask[:, :, None].astype("float32")
+        if self.config["pooling"] == "cls":
+            embeddings = token_embeddings[:, 0]
+        else:
+            embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config["normalize"]:
+            embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+
+def build_embedding_backend(backend: str = EMBEDDING_BACKEND) -> EmbeddingBackend:
+    """
+    Create an embedding backend by name.
+
+    :param backend: One of EMBEDDING_BACKENDS.
+    :return: The backend; its model is loaded on first use.
+    """
+    if backend == EMBEDDING_BACKEND_SENTENCE_TRANSFORMERS:
+        return SentenceTransformerBackend()
+    if backend == EMBEDDING_BACKEND_ONNX:
+        return OnnxEmbeddingBackend()
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {EMBEDDING_BACKENDS}")
+
+
+def export_onnx(model_name: str, output_dir: str, opset: int = 14) -> None:
+    """
+    Export a sentence-transformers model to ONNX and quantize its weights to int8.
+
+    Needs torch, sentence-transformers and onnx, but the exported directory is
+    used by OnnxEmbeddingBackend without them.
+
+    :param model_name: sentence-transformers model name or path.
+    :param output_dir: Directory to write the model, tokenizer and embedding config to.
+    :param opset: ONNX opset version.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0]
+    pooling = next(module for module in model if isinstance(module, Pooling))
+    # sentence-transformers 6 exposes the mode as an attribute, earlier versions through a getter
+    pooling_mode = getattr(pooling, "pooling_mode", None) or pooling.get_pooling_mode_str()
+    if pooling_mode not in ("mean", "cls"):
+        raise ValueError(f"Pooling mode {pooling_mode!r} is not supported by the ONNX backend")
+
+    tokenizer = transformer.tokenizer
+    sample = tokenizer(["barbell bench press", "squat"], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    float_path = os.path.join(output_dir, "model.onnx")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer.auto_model.eval()),
+            tuple(sample[name] for name in input_names),
+            float_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False,
+        )
+    quantize_dynamic(float_path, os.path.join(output_dir, ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(float_path)
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, TOKENIZER_FILE))
+
+    config = {
+        "source_model": model_name,
+        "quantization": "int8",
+        "dimension": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "pooling": pooling_mode,
+        "normalize": any(isinstance(module, Normalize) for module in model),
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+    }
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+    logging.info(f"Exported {model_name} to {output_dir}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Export the embedding model to int8-quantized ONNX for EMBEDDING_BACKEND=onnx")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help=f"sentence-transformers model name or path (default: {EMBEDDING_MODEL_NAME})")
+    parser.add_argument("--output", default=ONNX_EMBEDDING_DIR, help=f"Output directory (default: {ONNX_EMBEDDING_DIR})")
+    args = parser.parse_args()
+    export_onnx(args.model, args.output)
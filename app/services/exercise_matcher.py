@@ -1,34 +1,238 @@
 import os
 import json
+import time
+import hashlib
 import logging
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 import faiss
 from uuid import uuid4
-from fuzzywuzzy import process
 import re
-from app.constants import exercise_dict
+from app.constants import exercise_dict, ALIAS_MATCH_THRESHOLD, EXERCISE_CATALOGS, EXERCISE_INDEX_DIR_NAME, EXERCISE_INDEX_TYPE, MATCH_CACHE_PATH
+from app.utils import compute_file_hash
+from app.services.match_cache import MatchCache
+from app.services.alias_index import AliasIndex
+from app.services.embedding_backends import EmbeddingBackend, build_embedding_backend
+from app.services.tracing import tracer
+from app.services.vector_index import configure_search, build_vector_index, normalize_embeddings
+
+# Bump whenever the way exercise names are embedded changes, so persisted
+# indexes built the old way are not reused.
+EXERCISE_INDEX_VERSION = "2"
+# Bump whenever the name-to-exercise matching rules change, so cached matches are discarded.
+MATCHER_VERSION = "2"
+
+# Tiers reported for each resolved exercise, cheapest first
+TIER_EXACT = "exact"
+TIER_ALIAS = "alias"
+TIER_CACHE = "cache"
+TIER_SEMANTIC = "semantic"
+
+# Name of the catalog loaded from exercise_db_path
+DEFAULT_CATALOG = "default"
+
+
+def parse_catalogs(spec: str) -> Dict[str, str]:
+    """
+    Parse extra exercise catalogs given as comma-separated name=path pairs.
+
+    :param spec: Catalogs, e.g. "custom=my_exercises.json,gym=gym.json"; empty for none.
+    :return: Mapping of catalog name to exercise JSON path.
+    """
+    catalogs = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, separator, path = entry.partition("=")
+        if not separator or not name.strip() or not path.strip():
+            raise ValueError(f"Invalid exercise catalog {entry!r}; expected name=path")
+        catalogs[name.strip()] = path.strip()
+    return catalogs
+
 
 class ExerciseMatcher:
-    _faiss_index = None  # Class-level variable to cache the FAISS index
+    _faiss_indexes = {}  # Class-level cache of FAISS indexes, keyed by index key, so catalogs are shared by all matchers
+    _faiss_lock = threading.Lock()
+    _alias_index = None  # Class-level variable to cache the alias index built from exercise_dict
 
-    def __init__(self, exercise_db_path: str):
+    def __init__(
+        self,
+        exercise_db_path: str,
+        persist_index: bool = True,
+        match_cache_path: str = MATCH_CACHE_PATH,
+        match_cache_size: int = 10000,
+        embedding_backend: Optional[EmbeddingBackend] = None,
+        catalogs: Optional[Dict[str, str]] = None,
+        index_type: str = EXERCISE_INDEX_TYPE,
+    ):
         """
         Initialize the ExerciseMatcher with the path to the exercise database.
 
         :param exercise_db_path: Path to the JSON file containing exercise data.
+        :param persist_index: Save the FAISS index and embeddings next to the database and reuse them on later runs.
+        :param match_cache_path: File the match cache is persisted to, or None to keep it in memory only.
+        :param match_cache_size: Maximum number of normalized names kept in the match cache.
+        :param embedding_backend: Backend embedding names for semantic search; defaults to the one selected by EMBEDDING_BACKEND.
+        :param catalogs: Extra exercise catalogs searched alongside the database, by name; defaults to EXERCISE_CATALOGS.
+        :param index_type: FAISS index type built for every catalog; one of vector_index.INDEX_TYPES.
         """
         logging.info(f"Initializing ExerciseMatcher with database path: {exercise_db_path}")
-        if not os.path.exists(exercise_db_path):
-            logging.error(f"Exercise database file not found at path: {exercise_db_path}")
-            raise FileNotFoundError(f"Exercise database file not found at path: {exercise_db_path}")
-        
-        self.exercises = self._load_json_file(exercise_db_path)
-        self._validate_exercises(self.exercises)
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        if ExerciseMatcher._faiss_index is None:
-            ExerciseMatcher._faiss_index = self._build_faiss_index()
-        self.index = ExerciseMatcher._faiss_index
+        catalogs = parse_catalogs(EXERCISE_CATALOGS) if catalogs is None else catalogs
+        if DEFAULT_CATALOG in catalogs:
+            raise ValueError(f"The catalog name {DEFAULT_CATALOG!r} is reserved for the exercise database")
+        self.catalog_paths = {DEFAULT_CATALOG: exercise_db_path, **catalogs}
+        self.catalogs: Dict[str, List[Dict[str, Any]]] = {}
+        for name, path in self.catalog_paths.items():
+            if not os.path.exists(path):
+                logging.error(f"Exercise database file not found at path: {path}")
+                raise FileNotFoundError(f"Exercise database file not found at path: {path}")
+            self.catalogs[name] = self._load_json_file(path)
+            self._validate_exercises(self.catalogs[name])
+        self.exercises = [exercise for exercises in self.catalogs.values() for exercise in exercises]
+        # The embedding model and FAISS indexes are only loaded once a name needs semantic search
+        self.embedding_backend = embedding_backend or build_embedding_backend()
+        self.index_type = index_type
+        self.persist_index = persist_index
+        self.index_keys = {
+            name: self._index_key(path, self.embedding_backend.name, index_type) for name, path in self.catalog_paths.items()
+        }
+        # Earlier catalogs win exact name and id lookups
+        self._exercises_by_id = {}
+        self._exercises_by_name = {}
+        for name, exercises in self.catalogs.items():
+            for exercise in exercises:
+                if self._exercises_by_id.setdefault(exercise["id"], exercise) is not exercise:
+                    logging.warning(f"Exercise id {exercise['id']} of catalog {name} is already used by another catalog; matches resolve to the first")
+                self._exercises_by_name.setdefault(self._preprocess(exercise["name"]), exercise)
+        self.tier_counts = Counter()
+        self._tier_lock = threading.Lock()
+        # Names being resolved by semantic search, so concurrent callers wait for one search per name
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_lock = threading.Lock()
+        if ExerciseMatcher._alias_index is None:
+            ExerciseMatcher._alias_index = AliasIndex(exercise_dict)
+        self.alias_index = ExerciseMatcher._alias_index
+        self.match_cache = MatchCache(self._match_fingerprint(), max_entries=match_cache_size, path=match_cache_path)
+
+    def _match_fingerprint(self) -> str:
+        """
+        Identify everything a cached match depends on: the alias table, the exercise database and the matching rules.
+
+        :return: Hex digest used to invalidate the match cache.
+        """
+        payload = json.dumps([exercise_dict, self.index_keys, MATCHER_VERSION], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @property
+    def model(self) -> EmbeddingBackend:
+        """Embedding backend; its model is loaded on first use, so it costs nothing when no semantic search is needed."""
+        return self.embedding_backend
+
+    @property
+    def index(self):
+        """FAISS index over the exercise names of the database, loaded or built on first use."""
+        return self._faiss_entry(DEFAULT_CATALOG)[0]
+
+    @property
+    def embeddings(self):
+        """Normalized embedding matrix the database's FAISS index was built from."""
+        return self._faiss_entry(DEFAULT_CATALOG)[1]
+
+    def _faiss_entry(self, catalog: str):
+        index_key = self.index_keys[catalog]
+        with ExerciseMatcher._faiss_lock:
+            if index_key not in ExerciseMatcher._faiss_indexes:
+                ExerciseMatcher._faiss_indexes[index_key] = self._load_or_build_faiss_index(catalog)
+            return ExerciseMatcher._faiss_indexes[index_key]
+
+    def warm_up(self) -> None:
+        """Load the embedding model and the FAISS index of every catalog now rather than on the first semantic match."""
+        self.embedding_backend.load()
+        for catalog in self.catalogs:
+            self._faiss_entry(catalog)
+
+    def match_stats(self) -> Dict[str, Any]:
+        """Return how many names each matching tier resolved, plus match cache statistics."""
+        with self._tier_lock:
+            tiers = dict(self.tier_counts)
+        return {"tiers": tiers, "cache": self.match_cache.stats()}
+
+    def save_match_cache(self) -> None:
+        """Persist the match cache and log matching statistics."""
+        logging.info(f"Match stats: {self.match_stats()}")
+        self.match_cache.save()
+
+    @staticmethod
+    def _index_key(exercise_db_path: str, embedding_name: str, index_type: str) -> str:
+        """
+        Build the key identifying an index for a catalog file, embedding backend and index type.
+
+        :param exercise_db_path: Path to the JSON file containing exercise data.
+        :param embedding_name: Name of the embedding backend and model, so each backend gets its own index.
+        :param index_type: FAISS index type, so each type gets its own index.
+        :return: Hex digest of the catalog content hash, embedding name, index type and index version.
+        """
+        payload = f"{compute_file_hash(exercise_db_path)}:{embedding_name}:{index_type}:{EXERCISE_INDEX_VERSION}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _load_or_build_faiss_index(self, catalog: str):
+        """
+        Load the persisted FAISS index for a catalog, building and saving it on a miss.
+
+        :param catalog: Catalog name.
+        :return: FAISS index and the embedding matrix it was built from.
+        """
+        if self.persist_index:
+            persisted = self._load_persisted_index(catalog)
+            if persisted is not None:
+                return persisted
+        index, embeddings = self._build_faiss_index(catalog)
+        if self.persist_index:
+            self._persist_index(catalog, index, embeddings)
+        return index, embeddings
+
+    def _index_paths(self, catalog: str):
+        # Persisted next to the catalog file
+        index_dir = os.path.join(os.path.dirname(os.path.abspath(self.catalog_paths[catalog])), EXERCISE_INDEX_DIR_NAME)
+        base = os.path.join(index_dir, self.index_keys[catalog])
+        return f"{base}.faiss", f"{base}.npy"
+
+    def _load_persisted_index(self, catalog: str):
+        index_path, embeddings_path = self._index_paths(catalog)
+        if not (os.path.exists(index_path) and os.path.exists(embeddings_path)):
+            return None
+        try:
+            # Memory-mapped so several worker processes share one page-cached copy
+            embeddings = np.load(embeddings_path, mmap_mode="r")
+            mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+            try:
+                index = faiss.read_index(index_path, mmap_flag)
+            except RuntimeError:
+                index = faiss.read_index(index_path)
+            if index.ntotal != len(self.catalogs[catalog]):
+                logging.warning(f"Persisted FAISS index does not match the {catalog} catalog, rebuilding")
+                return None
+            configure_search(index)
+            logging.info(f"Loaded persisted FAISS index from {index_path}")
+            return index, embeddings
+        except Exception as e:
+            logging.warning(f"Could not load persisted FAISS index, rebuilding: {e}")
+            return None
+
+    def _persist_index(self, catalog: str, index, embeddings) -> None:
+        index_path, embeddings_path = self._index_paths(catalog)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            faiss.write_index(index, index_path + suffix)
+            with open(embeddings_path + suffix, "wb") as f:
+                np.save(f, embeddings)
+            os.replace(index_path + suffix, index_path)
+            os.replace(embeddings_path + suffix, embeddings_path)
+            logging.info(f"Persisted FAISS index to {index_path}")
+        except Exception as e:
+            logging.warning(f"Could not persist FAISS index: {e}")
         
     def _load_json_file(self, file_path: str) -> List[Dict[str, Any]]:
         """
@@ -73,20 +277,20 @@ class ExerciseMatcher:
         text = re.sub(r'[^a-zA-Z0-9 ]', '', text)
         return text.strip()
 
-    def _build_faiss_index(self) -> faiss.IndexFlatIP:
+    def _build_faiss_index(self, catalog: str):
         """
-        Build and return a FAISS index for the exercise names.
+        Build and return a FAISS index for the exercise names of a catalog.
 
-        :return: FAISS index.
+        :param catalog: Catalog name.
+        :return: FAISS index and the normalized embedding matrix it was built from.
         """
-        logging.info("Building FAISS index...")
+        logging.info(f"Building {self.index_type} FAISS index for the {catalog} catalog...")
         try:
-            exercise_names = [self._preprocess(exercise['name']) for exercise in self.exercises]
-            embeddings = self.model.encode(exercise_names)
-            index = faiss.IndexFlatIP(embeddings.shape[1])
-            index.add(embeddings)
+            exercise_names = [self._preprocess(exercise['name']) for exercise in self.catalogs[catalog]]
+            embeddings = normalize_embeddings(self.model.encode(exercise_names))
+            index = build_vector_index(embeddings, self.index_type)
             logging.info("FAISS index built successfully.")
-            return index
+            return index, embeddings
         except Exception as e:
             logging.error(f"Error building FAISS index: {e}")
             raise
@@ -99,23 +303,187 @@ class ExerciseMatcher:
         :param top_n: Number of top matches to return.
         :return: List of dictionaries containing matched exercises and their similarity scores.
         """
+        return self.find_most_similar_batch([input_name], top_n=top_n)[0]
+
+    def find_most_similar_batch(self, input_names: List[str], top_n: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Find the most similar exercises for several input names with one encode and one search per catalog.
+
+        The cosine similarities of all catalogs are comparable, so their hits are merged by score.
+
+        :param input_names: Names of the exercises to match.
+        :param top_n: Number of top matches to return per name.
+        :return: For each input name, a list of dictionaries containing matched exercises, their similarity scores and catalogs.
+        """
+        if not input_names:
+            return []
         try:
-            input_embedding = self.model.encode([self._preprocess(input_name)])
-            input_embedding = input_embedding.astype('float32')
-            distances, indices = self.index.search(input_embedding, top_n)
+            input_embeddings = normalize_embeddings(self.model.encode([self._preprocess(name) for name in input_names]))
+            hits = [[] for _ in input_names]
+            for catalog, exercises in self.catalogs.items():
+                distances, indices = self._faiss_entry(catalog)[0].search(input_embeddings, min(top_n, len(exercises)))
+                for row in range(len(input_names)):
+                    # Approximate indexes pad with -1 when they find fewer than top_n neighbours
+                    hits[row].extend((float(score), catalog, exercises[i]) for score, i in zip(distances[row], indices[row]) if i >= 0)
             results = []
-            for i in range(top_n):
-                result = {
-                    "name": self.exercises[indices[0][i]]['name'],
-                    "similarity_score": float(distances[0][i]),
-                    "details": self.exercises[indices[0][i]]
-                }
-                results.append(result)
+            for row_hits in hits:
+                row_hits.sort(key=lambda hit: hit[0], reverse=True)
+                results.append([
+                    {"name": exercise['name'], "similarity_score": score, "catalog": catalog, "details": exercise}
+                    for score, catalog, exercise in row_hits[:top_n]
+                ])
             return results
         except Exception as e:
-            logging.error(f"Error finding most similar exercises for exercise: {input_name} {e}")
+            logging.error(f"Error finding most similar exercises for exercises: {input_names} {e}")
             raise
 
+    def resolve_names(self, primary_names: List[str]) -> Dict[str, Tuple[Dict[str, Any], str]]:
+        """
+        Resolve normalized exercise names to database exercises.
+
+        Names are deduplicated and resolved by the cheapest tier that can:
+        an exact alias of a database name, an exact database name, the match
+        cache, and finally semantic search. Every name that needs semantic
+        search is encoded and searched in a single batch, so the embedding
+        model is never loaded when the cheaper tiers resolve everything. A
+        name another thread is already searching for, e.g. a lift repeated
+        in a week being matched concurrently, waits for that search and is
+        reported as a cache hit.
+
+        :param primary_names: Normalized primary exercise names.
+        :return: Mapping of each resolvable name to its matched database exercise and the tier that resolved it.
+        """
+        resolved = {}
+        # Futures of the names this call searches for, and of the names other calls are searching for
+        owned: Dict[str, Future] = {}
+        waiting: Dict[str, Future] = {}
+        # Time spent per tier, so a trace shows which tier a slow match run went to
+        tier_seconds = Counter()
+        try:
+            self._resolve_by_tier(primary_names, resolved, owned, waiting, tier_seconds)
+        except BaseException as e:
+            self._settle(owned, {}, error=e)
+            raise
+        self._settle(owned, resolved)
+
+        # Only waited for once this call's own searches are settled, so concurrent calls cannot wait on each other
+        started = time.perf_counter()
+        for name, pending in waiting.items():
+            match = pending.result()
+            if match is not None:
+                resolved[name] = (match, TIER_CACHE)
+        if waiting:
+            tier_seconds[TIER_CACHE] += time.perf_counter() - started
+
+        tiers = Counter(tier for _, tier in resolved.values())
+        with self._tier_lock:
+            self.tier_counts.update(tiers)
+        for tier, seconds in tier_seconds.items():
+            tracer.record(f"match.{tier}", seconds, names=tiers[tier])
+        return resolved
+
+    def _resolve_by_tier(
+        self,
+        primary_names: List[str],
+        resolved: Dict[str, Tuple[Dict[str, Any], str]],
+        owned: Dict[str, Future],
+        waiting: Dict[str, Future],
+        tier_seconds: Counter,
+    ) -> None:
+        """
+        Resolve names through the tiers, claiming each name that needs semantic search unless another call already has.
+
+        :param primary_names: Normalized primary exercise names.
+        :param resolved: Filled with the name, matched exercise and tier of each resolved name.
+        :param owned: Filled with the in-flight futures this call settles.
+        :param waiting: Filled with the in-flight futures of other calls.
+        :param tier_seconds: Time spent per tier, added to.
+        """
+        queries = {}
+        for primary_name in dict.fromkeys(primary_names):
+            started = time.perf_counter()
+            # An alias takes precedence over a database name, as it always has
+            alias_value = self.alias_index.exact(primary_name)
+            alias_match = self._exercises_by_name.get(self._preprocess(alias_value)) if alias_value else None
+            if alias_match is not None:
+                resolved[primary_name] = (alias_match, TIER_ALIAS)
+                tier_seconds[TIER_ALIAS] += time.perf_counter() - started
+                continue
+            exact_match = self._exercises_by_name.get(self._preprocess(primary_name))
+            if exact_match is not None:
+                resolved[primary_name] = (exact_match, TIER_EXACT)
+                tier_seconds[TIER_EXACT] += time.perf_counter() - started
+                continue
+            with self._in_flight_lock:
+                cached_id = self.match_cache.get(primary_name)
+                if cached_id not in self._exercises_by_id:
+                    pending = self._in_flight.get(primary_name)
+                    if pending is not None:
+                        waiting[primary_name] = pending
+                        continue
+                    owned[primary_name] = self._in_flight[primary_name] = Future()
+            if cached_id in self._exercises_by_id:
+                resolved[primary_name] = (self._exercises_by_id[cached_id], TIER_CACHE)
+                tier_seconds[TIER_CACHE] += time.perf_counter() - started
+                continue
+            try:
+                # Fuzzy match with exercise_dict for un-common names
+                closest_value, matched_key, fuzzy_match_score = self.alias_index.find_closest(primary_name)
+                queries[primary_name] = closest_value if fuzzy_match_score >= ALIAS_MATCH_THRESHOLD else primary_name
+            except Exception as e:
+                logging.error(f"Error matching exercise: {primary_name} {e}")
+            tier_seconds[TIER_SEMANTIC] += time.perf_counter() - started
+
+        # Use semantic search to find the most similar exercises
+        started = time.perf_counter()
+        unique_queries = list(dict.fromkeys(queries.values()))
+        query_matches = {}
+        for query, match in zip(unique_queries, self._search_queries(unique_queries)):
+            # An approximate index can come back empty-handed; such names stay unresolved
+            if match:
+                query_matches[query] = match[0]['details']
+        for name, query in queries.items():
+            if query not in query_matches:
+                logging.warning(f"No semantic match found for exercise: {name}")
+                continue
+            resolved[name] = (query_matches[query], TIER_SEMANTIC)
+            self.match_cache.put(name, query_matches[query]["id"])
+        if queries:
+            tier_seconds[TIER_SEMANTIC] += time.perf_counter() - started
+
+    def _search_queries(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        Search for the best match of every query in one batch, or one at a time if the batch fails.
+
+        :param queries: Names to search for.
+        :return: For each query, its best match, or an empty list if searching for that query failed.
+        """
+        try:
+            return self.find_most_similar_batch(queries, top_n=1)
+        except Exception:
+            # Already logged by the batch search, which searched for this query alone
+            if len(queries) == 1:
+                return [[]]
+        matches = []
+        for query in queries:
+            try:
+                matches.append(self.find_most_similar(query, top_n=1))
+            except Exception as e:
+                logging.error(f"Error matching exercise: {query} {e}")
+                matches.append([])
+        return matches
+
+    def _settle(self, owned: Dict[str, Future], resolved: Dict[str, Tuple[Dict[str, Any], str]], error: Optional[BaseException] = None) -> None:
+        """Hand the outcome of this call's semantic searches to the callers waiting for the same names."""
+        with self._in_flight_lock:
+            for name in owned:
+                del self._in_flight[name]
+        for name, future in owned.items():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(resolved[name][0] if name in resolved else None)
+
     def match_exercises(self, workout_exercises: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Match workout exercises to the exercises in the database.
@@ -123,45 +491,70 @@ class ExerciseMatcher:
         :param workout_exercises: List of workout exercises to match.
         :return: List of matched exercises with additional details.
         """
+        return self.match_program([workout_exercises])[0]
+
+    def match_program(self, program_days: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """
+        Match the exercises of many workout days at once.
+
+        Exercise names are normalized and deduplicated across all days, so a
+        lift repeated throughout a program is embedded and searched only once.
+
+        :param program_days: Lists of workout exercises, one list per day.
+        :return: Lists of matched exercises, in the same order as program_days.
+        """
         logging.info("Matching workout exercises...")
-        matched_exercises = []
-        for exercise in workout_exercises:
-            # logging.critical(f"exercise: {exercise['Exercise Name']}")
-            try:
-                primary_name = self._normalize(self._extract_primary_name(exercise["Exercise Name"]))
-                
-                # Step 1: Fuzzy match with exercise_dict for un-common names
-                closest_value, matched_key, fuzzy_match_score = self.find_closest_match(primary_name, exercise_dict)
-                
-                # Step 2: Use semantic search to find the most similar exercises
-                if fuzzy_match_score >= 95:
-                    matches = self.find_most_similar(closest_value, top_n=1)
-                else:
-                    matches = self.find_most_similar(primary_name, top_n=1)
-                direct_match = matches[0]['details']
-                if direct_match:
-                    exercise_note = f"(Orignal Name: {exercise['Exercise Name']}). Notes: {exercise['Notes']}" if exercise.get("Notes") else f"Orignal Name: {exercise['Exercise Name']}"
-                    matched_exercises.append({
-                        "exercise_id": direct_match["id"],
-                        "excercise_name": direct_match["name"],
-                        "exercise_image": direct_match.get("image_name", ""),
-                        "exercise_type": direct_match["exercise_type"],
-                        "exercise_uuid": str(uuid4()),
-                        "exercise_note": exercise_note,
-                        "sets": [
-                            {
-                                "weight": str(set_info["Weight"]["value"]) if set_info["Weight"]["value"] else "",
-                                "reps": f"{set_info['Reps']['min']}" if set_info['Reps'].get("isRange") else str(set_info['Reps']['value'])
-                            }
-                            for set_info in exercise.get("Sets", [])
-                        ]
-                    })
-                # logging.critical(f"Matched Exercise: {matched_exercises[:3]}")
-            except Exception as e:
-                logging.error(f"Error matching exercise: {e}")
-                continue
-        logging.info(f"Matched {len(matched_exercises)} exercises.")
-        return matched_exercises
+        primary_names = {}
+        for exercises in program_days:
+            for exercise in exercises:
+                try:
+                    primary_names[id(exercise)] = self._normalize(self._extract_primary_name(exercise["Exercise Name"]))
+                except Exception as e:
+                    logging.error(f"Error matching exercise: {e}")
+        resolved = self.resolve_names(list(primary_names.values()))
+
+        matched_days = []
+        for exercises in program_days:
+            matched_exercises = []
+            for exercise in exercises:
+                direct_match, tier = resolved.get(primary_names.get(id(exercise)), (None, None))
+                if not direct_match:
+                    continue
+                try:
+                    matched_exercises.append(self._build_matched_exercise(exercise, direct_match, tier))
+                except Exception as e:
+                    logging.error(f"Error matching exercise: {e}")
+            logging.info(f"Matched {len(matched_exercises)} exercises.")
+            matched_days.append(matched_exercises)
+        return matched_days
+
+    @staticmethod
+    def _build_matched_exercise(exercise: Dict[str, Any], direct_match: Dict[str, Any], tier: str) -> Dict[str, Any]:
+        """
+        Combine a workout exercise with its matched database exercise.
+
+        :param exercise: Workout exercise from the LLM output.
+        :param direct_match: Matched database exercise.
+        :param tier: Matching tier that resolved the exercise.
+        :return: Matched exercise with additional details.
+        """
+        exercise_note = f"(Orignal Name: {exercise['Exercise Name']}). Notes: {exercise['Notes']}" if exercise.get("Notes") else f"Orignal Name: {exercise['Exercise Name']}"
+        return {
+            "exercise_id": direct_match["id"],
+            "excercise_name": direct_match["name"],
+            "exercise_image": direct_match.get("image_name", ""),
+            "exercise_type": direct_match["exercise_type"],
+            "exercise_uuid": str(uuid4()),
+            "exercise_note": exercise_note,
+            "match_tier": tier,
+            "sets": [
+                {
+                    "weight": str(set_info["Weight"]["value"]) if set_info["Weight"]["value"] else "",
+                    "reps": f"{set_info['Reps']['min']}" if set_info['Reps'].get("isRange") else str(set_info['Reps']['value'])
+                }
+                for set_info in exercise.get("Sets", [])
+            ]
+        }
 
     @staticmethod
     def _normalize(text: str) -> str:
@@ -182,15 +575,3 @@ class ExerciseMatcher:
         :return: Cleaned name.
         """
         return re.sub(r"\[.*?\]|\(.*?\)", "", name, flags=re.IGNORECASE).strip()
-
-    @staticmethod
-    def find_closest_match(input_string, dictionary):
-        """
-        Find the closest match for the input string in the dictionary using fuzzy matching.
-
-        :param input_string: Input string to match.
-        :param dictionary: Dictionary to search for matches.
-        :return: Closest match, matched key, and fuzzy match score.
-        """
-        match, score = process.extractOne(input_string, dictionary.keys())
-        return dictionary[match], match, score
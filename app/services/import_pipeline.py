@@ -0,0 +1,367 @@
+import os
+import json
+import time
+import logging
+import threading
+import traceback
+import contextvars
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from app.constants import EXERCISE_DB_PATH, LYFTA_WORKOUT_CONCURRENCY, WORKOUT_DURATION_PROMPT
+from app.services.llm_service import LLMService
+from app.services.lyfta_api_service import APIClient, UPLOAD_MODE_TWO_STEP
+from app.services.tracing import tracer
+from app.services.upload_journal import UploadJournal
+from app.services.workout_program_mapper import WorkoutProgramMapper
+from app.services.workout_program_parser import WorkoutProgramParser
+
+if TYPE_CHECKING:
+    # Imported where used: httpx and the matcher's numerical libraries are slow to import
+    from app.services.async_upload_engine import AsyncUploadEngine
+    from app.services.exercise_matcher import ExerciseMatcher
+
+
+class StreamedWeek:
+    """
+    Matches and uploads the days of one week while its LLM response is still being generated.
+
+    Days are added from the LLM thread as the response parser completes
+    them and are matched and uploaded on the upload executor, into a
+    collection created when the first day arrives. done resolves once the
+    response has ended and every day is uploaded, or with the first error.
+    """
+
+    def __init__(self, workout_parser: WorkoutProgramParser, week_number: int, cookie: str, matcher_future: Future, executor: Executor):
+        """
+        Initialize the StreamedWeek.
+
+        :param workout_parser: Parser uploading to Lyfta, shared by the weeks of the import.
+        :param week_number: Week being extracted.
+        :param cookie: Cookie for the Lyfta account.
+        :param matcher_future: Future of the ExerciseMatcher.
+        :param executor: Executor the days are matched and uploaded on.
+        """
+        self.workout_parser = workout_parser
+        self.week_number = week_number
+        self.cookie = cookie
+        self.matcher_future = matcher_future
+        self.executor = executor
+        self.done = Future()
+        # Day spans nest under the import, not under the LLM call that produced them
+        self._context = contextvars.copy_context()
+        self._lock = threading.Lock()
+        self._collection_lock = threading.Lock()
+        self._collection = None
+        self._positions = 0
+        self._pending = 0
+        self._closed = False
+        self._error: Optional[BaseException] = None
+
+    def add_day(self, week_label: Optional[str], day: Dict[str, Any]) -> None:
+        """Queue a completed day for matching and upload."""
+        if day["exercises"] == "":
+            return
+        with self._lock:
+            # Numbered like the days of a whole week, so the journal keys match upload_week's
+            position = self._positions
+            self._positions += 1
+            self._pending += 1
+        future = self.executor.submit(self._context.copy().run, self._upload_day, position, week_label or f"Week {self.week_number}", day)
+        future.add_done_callback(self._day_done)
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """Record that the LLM response has ended, successfully or with an error."""
+        with self._lock:
+            self._closed = True
+            if error is not None and self._error is None:
+                self._error = error
+            self._finish()
+
+    def _upload_day(self, position: int, week_label: str, day: Dict[str, Any]) -> None:
+        with tracer.span("day", week=self.week_number, day=day["day"]):
+            with tracer.span("matcher_wait", week=self.week_number):
+                exercise_matcher = self.matcher_future.result()
+            with tracer.span("match", weeks=[self.week_number], days=1, exercises=len(day["exercises"])):
+                workout = WorkoutProgramMapper(exercise_matcher).process_day(week_label, day["day"], day["exercises"])
+            with self._collection_lock:
+                if self._collection is None:
+                    self._collection = self.workout_parser.open_collection(self.week_number, self.cookie)
+            self.workout_parser.upload_day(self.week_number, position, workout, self._collection, self.cookie)
+
+    def _day_done(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if future.exception() is not None and self._error is None:
+                self._error = future.exception()
+            self._finish()
+
+    def _finish(self) -> None:
+        if not self._closed or self._pending or self.done.done():
+            return
+        if self._error is not None:
+            self.done.set_exception(self._error)
+            return
+        try:
+            self.workout_parser.complete_week(self.week_number)
+        except Exception as e:
+            self.done.set_exception(e)
+        else:
+            self.done.set_result(None)
+
+
+class ImportPipeline:
+    """
+    Streams a workout program from the LLM into Lyfta one week at a time.
+
+    Each week is handed to matching and upload as soon as its LLM result
+    arrives, so LLM latency overlaps with matching and HTTP time instead of
+    adding to it. With stream_llm, each day of a week is handed on as soon
+    as the LLM has generated it, before the rest of the week.
+    """
+
+    def __init__(
+        self,
+        llm_service: LLMService,
+        exercise_db_path: str = EXERCISE_DB_PATH,
+        multi_week: bool = False,
+        intermediate_dir: Optional[str] = None,
+        llm_workers: Optional[int] = None,
+        upload_workers: Optional[int] = None,
+        async_upload: bool = False,
+        journal: Optional[UploadJournal] = None,
+        resume: bool = False,
+        upload_mode: str = UPLOAD_MODE_TWO_STEP,
+        api_client: Optional[APIClient] = None,
+        upload_engine: Optional["AsyncUploadEngine"] = None,
+        matcher_future: Optional[Future] = None,
+        on_week_done: Optional[Callable[[int, Optional[str]], None]] = None,
+        stream_llm: bool = False,
+    ):
+        """
+        Initialize the ImportPipeline.
+
+        :param llm_service: Service used for all LLM calls.
+        :param exercise_db_path: Path to the exercise database JSON file.
+        :param multi_week: Extract several weeks per LLM call.
+        :param intermediate_dir: If set, write each week's LLM output there as result-{i}.json.
+        :param llm_workers: Number of threads submitting LLM calls; defaults to the scheduler's maximum concurrency.
+        :param upload_workers: Number of weeks matched and uploaded concurrently; also sizes the Lyfta connection pool.
+        :param async_upload: Upload through the asyncio engine, which shares one rate limiter across all weeks.
+        :param journal: Journal recording created collections and workouts, or None to disable it.
+        :param resume: Continue an earlier import of the same file, skipping everything the journal marks as uploaded.
+        :param upload_mode: How workouts are created in Lyfta; one of lyfta_api_service.UPLOAD_MODES.
+        :param api_client: Lyfta client shared with other imports; one is created and closed per run if None.
+        :param upload_engine: Async upload engine shared with other imports; with async_upload, one is created per run if None.
+        :param matcher_future: Future of an ExerciseMatcher shared with other imports; the matcher is loaded per run if None.
+        :param on_week_done: Called with the week number and None, or an error message, once each week is uploaded or has failed.
+        :param stream_llm: Stream each week's LLM response and match and upload its days as they are generated; not combinable with multi_week.
+        """
+        if stream_llm and multi_week:
+            raise ValueError("Streamed LLM responses are extracted one week per call; multi_week cannot be combined with stream_llm")
+        self.llm_service = llm_service
+        self.exercise_db_path = exercise_db_path
+        self.multi_week = multi_week
+        self.intermediate_dir = intermediate_dir
+        self.llm_workers = llm_workers or llm_service.scheduler.max_concurrency
+        self.upload_workers = upload_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.async_upload = async_upload
+        self.journal = journal
+        self.resume = resume
+        self.upload_mode = upload_mode
+        self.api_client = api_client
+        self.upload_engine = upload_engine
+        self.matcher_future = matcher_future
+        self.on_week_done = on_week_done
+        self.stream_llm = stream_llm
+
+    def run(self, workout_file_path: str, cookie: str) -> List[int]:
+        """
+        Import a workout program file into Lyfta.
+
+        :param workout_file_path: Path to the workout file.
+        :param cookie: Cookie for the Lyfta account.
+        :return: Week numbers that failed to import.
+        """
+        # Clients passed in are shared with other imports and left open
+        api_client = self.api_client or APIClient(pool_size=self.upload_workers * LYFTA_WORKOUT_CONCURRENCY, upload_mode=self.upload_mode)
+        upload_engine = self.upload_engine
+        if upload_engine is None and self.async_upload:
+            from app.services.async_upload_engine import AsyncUploadEngine
+
+            upload_engine = AsyncUploadEngine(upload_mode=self.upload_mode)
+        try:
+            with tracer.span("import", file=os.path.basename(workout_file_path)):
+                failed_weeks = self._run(workout_file_path, cookie, api_client, upload_engine)
+        finally:
+            if upload_engine is not self.upload_engine:
+                logging.info(f"Lyfta API metrics: {upload_engine.metrics()}")
+                upload_engine.close()
+            if api_client is not self.api_client:
+                if upload_engine is None:
+                    logging.info(f"Lyfta API metrics: {api_client.metrics()}")
+                api_client.close()
+
+        if failed_weeks:
+            logging.error(f"Failed to import week(s) of {workout_file_path}: {sorted(failed_weeks)}")
+        return sorted(failed_weeks)
+
+    def _run(self, workout_file_path: str, cookie: str, api_client: APIClient, upload_engine: Optional["AsyncUploadEngine"]) -> List[int]:
+        started = time.perf_counter()
+        content_hash = self.llm_service.document_extractor.extract(workout_file_path).content_hash
+        program_key = UploadJournal.program_key(content_hash, cookie)
+        if self.journal is None:
+            return self._import(workout_file_path, cookie, api_client, upload_engine, program_key, started)
+        self.journal.begin(program_key, self.resume)
+        try:
+            return self._import(workout_file_path, cookie, api_client, upload_engine, program_key, started)
+        finally:
+            self.journal.end(program_key)
+
+    def _import(self, workout_file_path: str, cookie: str, api_client: APIClient, upload_engine: Optional["AsyncUploadEngine"], program_key: str, started: float) -> List[int]:
+        workout_parser = WorkoutProgramParser(
+            workout_file_path, self.intermediate_dir or ".", self.llm_service, api_client, upload_engine, self.journal, program_key
+        )
+        failed_weeks = []
+        with ThreadPoolExecutor(max_workers=1) as setup_executor:
+            # Load the matcher while the first LLM calls are in flight
+            matcher_future = self.matcher_future or setup_executor.submit(self._load_matcher)
+
+            duration = self.llm_service.make_llm_call(WORKOUT_DURATION_PROMPT, workout_file_path, is_duration_call=True)
+            logging.info(f"Workout duration: {duration} weeks")
+            num_weeks = abs(int(duration))
+            if self.multi_week:
+                batches = self.llm_service.plan_week_batches(workout_file_path, num_weeks)
+            else:
+                batches = [[i] for i in range(1, num_weeks + 1)]
+            if self.journal is not None and self.resume:
+                batches = self._pending_batches(batches, program_key)
+
+            with ThreadPoolExecutor(max_workers=self.llm_workers) as llm_executor, \
+                    ThreadPoolExecutor(max_workers=self.upload_workers) as upload_executor:
+                start_times = {}
+                future_to_weeks = {}
+                upload_futures = {}
+                if self.stream_llm:
+                    # Days are uploaded from the LLM threads as they stream in; only the week results are collected here
+                    for batch in batches:
+                        week = StreamedWeek(workout_parser, batch[0], cookie, matcher_future, upload_executor)
+                        llm_executor.submit(self._stream_week, week, workout_file_path)
+                        upload_futures[week.done] = batch[0]
+                else:
+                    for batch in batches:
+                        future = llm_executor.submit(self._extract_batch, batch, workout_file_path)
+                        start_times[future] = time.time()
+                        future_to_weeks[future] = batch
+
+                for future in as_completed(future_to_weeks):
+                    weeks = future_to_weeks[future]
+                    try:
+                        results = future.result()
+                        logging.info(f"Week(s) {weeks} extracted in {time.time() - start_times[future]:.2f} seconds.")
+                    except Exception as exc:
+                        logging.error(f'Week(s) {weeks} generated an exception: {exc}')
+                        failed_weeks.extend(weeks)
+                        for week_number in weeks:
+                            self._week_done(week_number, f"LLM extraction failed: {exc}")
+                        continue
+
+                    for week_number, text in results.items():
+                        self._save_intermediate(week_number, text)
+                        upload_future = upload_executor.submit(
+                            self._process_week, workout_parser, week_number, text, cookie, matcher_future, time.perf_counter()
+                        )
+                        upload_futures[upload_future] = week_number
+
+                for future in as_completed(upload_futures):
+                    week_number = upload_futures[future]
+                    try:
+                        future.result()
+                    except Exception as exc:
+                        failed_weeks.append(week_number)
+                        self._week_done(week_number, str(exc))
+                    else:
+                        self._week_done(week_number, None)
+
+            if matcher_future.done() and matcher_future.exception() is None:
+                matcher_future.result().save_match_cache()
+        if workout_parser.first_upload_at is not None:
+            time_to_first_upload = workout_parser.first_upload_at - started
+            tracer.record("time_to_first_upload", time_to_first_upload, file=os.path.basename(workout_file_path))
+            logging.info(f"First workout uploaded {time_to_first_upload:.2f} seconds after the import started.")
+        return failed_weeks
+
+    def _pending_batches(self, batches: List[List[int]], program_key: str) -> List[List[int]]:
+        """Drop the weeks the journal marks as fully uploaded."""
+        pending = []
+        for batch in batches:
+            remaining = [week for week in batch if not self.journal.is_week_complete(program_key, week)]
+            skipped = [week for week in batch if week not in remaining]
+            if skipped:
+                logging.info(f"Resuming: skipping {len(skipped)} already uploaded week(s) of {batch}")
+            for week_number in skipped:
+                self._week_done(week_number, None)
+            if remaining:
+                pending.append(remaining)
+        return pending
+
+    def _week_done(self, week_number: int, error: Optional[str]) -> None:
+        if self.on_week_done is None:
+            return
+        try:
+            self.on_week_done(week_number, error)
+        except Exception as e:
+            logging.warning(f"Week {week_number} callback failed: {e}")
+
+    def _extract_batch(self, week_numbers: List[int], workout_file_path: str) -> Dict[int, str]:
+        if self.multi_week:
+            return self.llm_service.extract_weeks(week_numbers, workout_file_path)
+        prompt = self.llm_service.generate_week_prompt(week_numbers[0])
+        return {week_numbers[0]: self.llm_service.make_llm_call(prompt, workout_file_path, week_numbers=week_numbers)}
+
+    def _stream_week(self, week: StreamedWeek, workout_file_path: str) -> None:
+        start_time = time.time()
+        try:
+            text = self.llm_service.stream_week(week.week_number, workout_file_path, week.add_day)
+            logging.info(f"Week {week.week_number} streamed in {time.time() - start_time:.2f} seconds.")
+            self._save_intermediate(week.week_number, text)
+            # Days are only dispatched as they parse; a response that does not parse as a whole failed part-way
+            json.loads(text)
+        except json.JSONDecodeError as e:
+            logging.error(f"Invalid JSON for week {week.week_number}: {e}")
+            week.close(e)
+        except Exception as e:
+            logging.error(f"Week {week.week_number} generated an exception: {e}")
+            week.close(e)
+        else:
+            week.close()
+
+    def _load_matcher(self) -> "ExerciseMatcher":
+        from app.services.exercise_matcher import ExerciseMatcher
+
+        with tracer.span("matcher_load"):
+            return ExerciseMatcher(self.exercise_db_path)
+
+    def _save_intermediate(self, week_number: int, text: str) -> None:
+        if not self.intermediate_dir:
+            return
+        os.makedirs(self.intermediate_dir, exist_ok=True)
+        with open(os.path.join(self.intermediate_dir, f"result-{week_number}.json"), "w") as f:
+            f.write(text)
+
+    @staticmethod
+    def _process_week(workout_parser: WorkoutProgramParser, week_number: int, text: str, cookie: str, matcher_future, queued_at: float) -> None:
+        start_time = time.time()
+        try:
+            with tracer.span("week", week=week_number):
+                tracer.record("upload_queue_wait", time.perf_counter() - queued_at, week=week_number)
+                with tracer.span("json_parse", week=week_number, characters=len(text)):
+                    data = json.loads(text)
+                with tracer.span("matcher_wait", week=week_number):
+                    exercise_matcher = matcher_future.result()
+                workout_parser.process_week_data(week_number, data, cookie, exercise_matcher)
+            logging.info(f"Week {week_number} matched and uploaded in {time.time() - start_time:.2f} seconds.")
+        except json.JSONDecodeError as e:
+            logging.error(f"Invalid JSON for week {week_number}: {e}")
+            logging.error(traceback.format_exc())
+            raise
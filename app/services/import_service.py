@@ -0,0 +1,304 @@
+import os
+import json
+import base64
+import uuid
+import shutil
+import logging
+import threading
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from app.constants import IMPORT_SERVICE_PORT, JOB_UPLOAD_DIR
+from app.services.batch_importer import BatchImporter, STATUS_FAILED, STATUS_SUCCEEDED
+from app.services.job_store import JobStore, STATUS_RUNNING
+from app.services.upload_journal import account_id
+
+
+class ImportService:
+    """
+    Long-running import daemon with an HTTP job API.
+
+    The BatchImporter it wraps keeps the ExerciseMatcher (with its embedding
+    model and FAISS index), the LLMService and the Lyfta client loaded between
+    jobs, so a job only costs its LLM and upload time. Jobs are persisted in a
+    JobStore and run on a pool of worker threads; queued jobs of different
+    users take turns, so one user's large submission does not hold up the
+    others. Jobs left queued by a previous process are picked up again on
+    start. The cookie of a running job is only held in memory, so jobs left
+    running are marked failed and can be resubmitted with resume, which
+    skips the weeks already uploaded.
+
+    Endpoints:
+        GET  /health          Worker and queue state.
+        POST /jobs            Submit a job: {"lyfta_cookie", "file_path"} with
+                              a file inside the upload directory, or
+                              {"lyfta_cookie", "file_name", "content"} with
+                              base64 file content, plus optional "user" and "resume".
+        GET  /jobs            Recent jobs; ?status= and ?user= filter them.
+        GET  /jobs/{job_id}   One job with its per-week results.
+    """
+
+    def __init__(
+        self,
+        importer: BatchImporter,
+        store: JobStore,
+        host: str = "127.0.0.1",
+        port: int = IMPORT_SERVICE_PORT,
+        workers: int = 2,
+        upload_dir: str = JOB_UPLOAD_DIR,
+    ):
+        """
+        Initialize the ImportService.
+
+        :param importer: Importer holding the shared matcher, LLM service and Lyfta clients.
+        :param store: Store the jobs and their results are persisted in.
+        :param host: Interface to listen on.
+        :param port: Port to listen on; 0 picks a free port.
+        :param workers: Number of jobs run at the same time.
+        :param upload_dir: Directory files submitted as content are written to, and the only one file_path may point into.
+        """
+        self.importer = importer
+        self.store = store
+        self.workers = max(1, workers)
+        self.upload_dir = upload_dir
+        # Queued (job_id, file_path, cookie, resume) per user, in the order users take turns
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._running = 0
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._server_thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """Requeue unfinished jobs, start the workers and the HTTP server, and return the base URL."""
+        for job in self.store.unfinished_jobs():
+            if job["status"] == STATUS_RUNNING:
+                self.store.finish_job(job["job_id"], STATUS_FAILED, [], "Interrupted by a restart; resubmit with resume to continue")
+                continue
+            if not job["cookie"]:
+                self.store.finish_job(job["job_id"], STATUS_FAILED, [], "No Lyfta cookie stored for the job")
+                continue
+            logging.info(f"Requeueing job {job['job_id']} ({job['file_path']})")
+            self._enqueue(job["user"], (job["job_id"], job["file_path"], job["cookie"], job["resume"]))
+        threading.Thread(target=self._warm_up, name="import-service-warm-up", daemon=True).start()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"import-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name="import-service", daemon=True)
+        self._server_thread.start()
+        logging.info(f"Import service listening on {self.base_url} with {self.workers} workers")
+        return self.base_url
+
+    def stop(self) -> None:
+        """Stop accepting requests, let running jobs finish and close the shared clients. Queued jobs stay queued."""
+        self._server.shutdown()
+        self._server.server_close()
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self.importer.close()
+
+    def __enter__(self) -> "ImportService":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def submit(
+        self,
+        cookie: str,
+        file_path: Optional[str] = None,
+        file_name: Optional[str] = None,
+        content: Optional[bytes] = None,
+        user: Optional[str] = None,
+        resume: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Queue an import.
+
+        :param cookie: Cookie for the Lyfta account the file is imported into.
+        :param file_path: Path to a workout file inside the upload directory.
+        :param file_name: Name of the submitted file when content is given.
+        :param content: Content of the workout file, written to the upload directory.
+        :param user: Name the job is scheduled under; derived from the cookie if None.
+        :param resume: Continue an earlier import of the same file.
+        :return: The queued job.
+        """
+        user = user or account_id(cookie)
+        if content is not None:
+            file_path = self._save_upload(file_name or "upload", content)
+        elif not file_path or not self._in_upload_dir(file_path):
+            raise ValueError(f"file_path must be inside the upload directory {self.upload_dir}")
+        elif not os.path.isfile(file_path):
+            raise ValueError(f"File not found: {file_path}")
+        job = self.store.create_job(os.path.abspath(file_path), cookie, user, resume)
+        self._enqueue(user, (job["job_id"], job["file_path"], cookie, resume))
+        logging.info(f"Queued job {job['job_id']} for {job['file_path']} (user {user})")
+        return job
+
+    def health(self) -> Dict[str, Any]:
+        with self._condition:
+            queued = sum(len(queue) for queue in self._queues.values())
+            running = self._running
+        matcher_future = self.importer.matcher_future
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "running": running,
+            "queued": queued,
+            "matcher_loaded": matcher_future.done() and matcher_future.exception() is None,
+        }
+
+    def handle(self, method: str, path: str, body: Optional[Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+        """
+        Answer an API request.
+
+        :param method: HTTP method.
+        :param path: Request path including the query string.
+        :param body: Parsed JSON body of a POST.
+        :return: Status code and JSON payload.
+        """
+        url = urlsplit(path)
+        parts = [part for part in url.path.split("/") if part]
+        if method == "GET" and parts == ["health"]:
+            return 200, self.health()
+        if method == "GET" and parts == ["jobs"]:
+            query = parse_qs(url.query)
+            jobs = self.store.list_jobs(status=query.get("status", [None])[0], user=query.get("user", [None])[0])
+            return 200, {"jobs": jobs}
+        if method == "GET" and len(parts) == 2 and parts[0] == "jobs":
+            job = self.store.get_job(parts[1])
+            if job is None:
+                return 404, {"message": "Job not found."}
+            return 200, job
+        if method == "POST" and parts == ["jobs"]:
+            if not isinstance(body, dict) or not body.get("lyfta_cookie"):
+                return 422, {"message": "The lyfta_cookie field is required."}
+            if not body.get("file_path") and body.get("content") is None:
+                return 422, {"message": "Either file_path or content is required."}
+            try:
+                content = base64.b64decode(body["content"], validate=True) if body.get("content") is not None else None
+                job = self.submit(
+                    body["lyfta_cookie"],
+                    file_path=body.get("file_path"),
+                    file_name=body.get("file_name"),
+                    content=content,
+                    user=body.get("user"),
+                    resume=bool(body.get("resume")),
+                )
+            except ValueError as e:
+                return 422, {"message": str(e)}
+            return 202, job
+        return 404, {"message": "Not Found"}
+
+    def _in_upload_dir(self, file_path: str) -> bool:
+        # Resolved first, so neither ".." nor a symlink leads out of the upload directory
+        upload_dir = os.path.realpath(self.upload_dir)
+        return os.path.commonpath([upload_dir, os.path.realpath(file_path)]) == upload_dir
+
+    def _save_upload(self, file_name: str, content: bytes) -> str:
+        directory = os.path.join(self.upload_dir, uuid.uuid4().hex)
+        os.makedirs(directory, exist_ok=True)
+        # Only the base name is used, so a submitted name cannot escape the upload directory
+        path = os.path.join(directory, os.path.basename(file_name) or "upload")
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def _enqueue(self, user: str, item: Tuple[str, str, str, bool]) -> None:
+        with self._condition:
+            self._queues.setdefault(user, deque()).append(item)
+            self._condition.notify()
+
+    def _next_job(self) -> Optional[Tuple[str, str, str, bool]]:
+        with self._condition:
+            while not self._queues and not self._stopping:
+                self._condition.wait()
+            if self._stopping:
+                return None
+            # Take the first user's oldest job and send the user to the back of the line
+            user, queue = next(iter(self._queues.items()))
+            item = queue.popleft()
+            del self._queues[user]
+            if queue:
+                self._queues[user] = queue
+            self._running += 1
+            return item
+
+    def _work(self) -> None:
+        while True:
+            item = self._next_job()
+            if item is None:
+                return
+            job_id, file_path, cookie, resume = item
+            try:
+                self._run_job(job_id, file_path, cookie, resume)
+            finally:
+                with self._condition:
+                    self._running -= 1
+
+    def _run_job(self, job_id: str, file_path: str, cookie: str, resume: bool) -> None:
+        logging.info(f"Starting job {job_id} ({file_path})")
+        self.store.start_job(job_id)
+        result = self.importer.import_file(
+            file_path,
+            cookie,
+            resume=resume,
+            on_week_done=lambda week_number, error: self.store.record_week(job_id, week_number, error),
+        )
+        self.store.finish_job(job_id, result.status, result.failed_weeks, result.error)
+        logging.info(f"Job {job_id} {result.status} in {result.seconds:.1f}s")
+        # Submitted copies are kept after failures, so a resubmission with resume can use them
+        if result.status == STATUS_SUCCEEDED and os.path.dirname(os.path.dirname(file_path)) == os.path.abspath(self.upload_dir):
+            shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+
+    def _warm_up(self) -> None:
+        try:
+            self.importer.matcher_future.result().warm_up()
+            logging.info("Exercise matcher loaded")
+        except Exception as e:
+            logging.error(f"Loading the exercise matcher failed: {e}")
+
+    def _handler_class(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self._respond(*service.handle("GET", self.path, None))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._respond(400, {"message": "Malformed JSON"})
+                    return
+                self._respond(*service.handle("POST", self.path, body))
+
+            def _respond(self, status: int, payload: Dict[str, Any]) -> None:
+                encoded = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format, *args):
+                logging.debug(f"Import service: {format % args}")
+
+        return Handler
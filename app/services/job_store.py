@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+from cryptography.fernet import Fernet, InvalidToken
+
+from app.constants import JOB_STORE_PATH
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+# Final statuses are those of batch_importer.FileImportResult
+FINAL_STATUSES = ("succeeded", "partial", "failed")
+
+WEEK_UPLOADED = "uploaded"
+WEEK_FAILED = "failed"
+
+
+class JobStore:
+    """
+    SQLite record of the import jobs submitted to the import service and their per-week results.
+
+    The Lyfta cookie of a job is kept, encrypted with a key stored next to
+    the database, only while the job is queued, so queued jobs can be picked
+    up again after a restart. It is wiped as soon as a worker starts the job.
+    """
+
+    def __init__(self, db_path: str = JOB_STORE_PATH, key_path: Optional[str] = None):
+        """
+        Initialize the JobStore.
+
+        :param db_path: Path to the SQLite database file.
+        :param key_path: Path to the key the cookies are encrypted with, created if missing; defaults to db_path + ".key".
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fernet = Fernet(self._load_key(key_path or f"{db_path}.key"))
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                user TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                cookie TEXT,
+                resume INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                failed_weeks TEXT NOT NULL DEFAULT '[]',
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+            CREATE TABLE IF NOT EXISTS job_weeks (
+                job_id TEXT NOT NULL,
+                week_number INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                finished_at REAL NOT NULL,
+                PRIMARY KEY (job_id, week_number)
+            );
+            """
+        )
+        conn.commit()
+
+    @staticmethod
+    def _load_key(key_path: str) -> bytes:
+        """Return the key stored at key_path, creating it readable by the owner only if it does not exist."""
+        try:
+            fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(key_path, "rb") as f:
+                return f.read().strip()
+        key = Fernet.generate_key()
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+        return key
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def create_job(self, file_path: str, cookie: str, user: str, resume: bool = False) -> Dict[str, Any]:
+        """
+        Record a new queued job.
+
+        :param file_path: Path to the workout file on the service's machine.
+        :param cookie: Cookie for the Lyfta account the file is imported into.
+        :param user: Name the job is scheduled under; jobs of different users take turns.
+        :param resume: Continue an earlier import of the same file.
+        :return: The job, as returned by get_job.
+        """
+        job_id = uuid.uuid4().hex
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, user, file_path, cookie, resume, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user, file_path, self._fernet.encrypt(cookie.encode()).decode(), int(resume), STATUS_QUEUED, time.time()),
+            )
+        return self.get_job(job_id)
+
+    def start_job(self, job_id: str) -> None:
+        """Mark a job as running and forget its cookie, which the worker running it holds from now on."""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, cookie = NULL WHERE job_id = ?",
+                (STATUS_RUNNING, time.time(), job_id),
+            )
+
+    def finish_job(self, job_id: str, status: str, failed_weeks: List[int], error: Optional[str] = None) -> None:
+        """Record the outcome of a job."""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, failed_weeks = ?, error = ?, finished_at = ?, cookie = NULL WHERE job_id = ?",
+                (status, json.dumps(failed_weeks), error, time.time(), job_id),
+            )
+
+    def record_week(self, job_id: str, week_number: int, error: Optional[str]) -> None:
+        """Record that a week of a job was uploaded, or failed with error."""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_weeks (job_id, week_number, status, error, finished_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, week_number, WEEK_FAILED if error else WEEK_UPLOADED, error, time.time()),
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job with its per-week results, or None if it does not exist."""
+        row = self._connection().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._job_dict(row)
+        weeks = self._connection().execute(
+            "SELECT week_number, status, error, finished_at FROM job_weeks WHERE job_id = ? ORDER BY week_number",
+            (job_id,),
+        ).fetchall()
+        job["weeks"] = [dict(week) for week in weeks]
+        return job
+
+    def list_jobs(self, status: Optional[str] = None, user: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return the most recent jobs, optionally filtered by status and user, without their week results."""
+        query = "SELECT * FROM jobs WHERE 1 = 1"
+        params: List[Any] = []
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if user:
+            query += " AND user = ?"
+            params.append(user)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        return [self._job_dict(row) for row in self._connection().execute(query, params).fetchall()]
+
+    def unfinished_jobs(self) -> List[Dict[str, Any]]:
+        """Return the queued and running jobs, oldest first, including the decrypted cookies of the queued ones."""
+        rows = self._connection().execute(
+            "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+            (STATUS_QUEUED, STATUS_RUNNING),
+        ).fetchall()
+        return [dict(self._job_dict(row), cookie=self._decrypt(row["cookie"])) for row in rows]
+
+    def _decrypt(self, token: Optional[str]) -> Optional[str]:
+        """Return a stored cookie, or None if there is none or it was encrypted with another key."""
+        if not token:
+            return None
+        try:
+            return self._fernet.decrypt(token.encode()).decode()
+        except InvalidToken:
+            return None
+
+    @staticmethod
+    def _job_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        del job["cookie"]
+        job["resume"] = bool(job["resume"])
+        job["failed_weeks"] = json.loads(job["failed_weeks"])
+        return job
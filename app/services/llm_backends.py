@@ -0,0 +1,235 @@
+import os
+import re
+import json
+import time
+import random
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+# Rough characters per token, used when the token count API is unavailable
+CHARS_PER_TOKEN_ESTIMATE = 4
+# Output tokens per chunk of a replayed streaming response
+REPLAY_STREAM_CHUNK_TOKENS = 32
+
+
+@dataclass
+class LLMResult:
+    text: str
+    truncated: bool
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.output_tokens
+
+
+class LLMBackend(ABC):
+    """A model that turns a prompt and a document into a JSON response."""
+
+    # Name of the model, part of the LLM response cache key
+    model: Optional[str] = None
+    # Whether responses are worth storing in the LLM response cache
+    cacheable = True
+
+    @abstractmethod
+    def generate(self, prompt: str, document_text: str, response_schema, max_output_tokens: int) -> LLMResult:
+        """
+        Generate a JSON response for the prompt applied to the document.
+
+        :param prompt: Instructions for the model.
+        :param document_text: Extracted text of the workout file.
+        :param response_schema: Pydantic model or type the response must conform to.
+        :param max_output_tokens: Output token limit; longer responses come back truncated.
+        :return: Generated result.
+        """
+
+    def generate_stream(self, prompt: str, document_text: str, response_schema, max_output_tokens: int, on_text: Callable[[str], None]) -> LLMResult:
+        """
+        Generate a JSON response, passing its text to on_text chunk by chunk as it is produced.
+
+        Backends that cannot stream pass the whole response as one chunk.
+
+        :param prompt: Instructions for the model.
+        :param document_text: Extracted text of the workout file.
+        :param response_schema: Pydantic model or type the response must conform to.
+        :param max_output_tokens: Output token limit; longer responses come back truncated.
+        :param on_text: Called with each chunk of the response text, in order.
+        :return: Generated result, holding the whole text.
+        """
+        result = self.generate(prompt, document_text, response_schema, max_output_tokens)
+        on_text(result.text)
+        return result
+
+    def count_tokens(self, text: str) -> int:
+        """Return the number of tokens in a text, estimated from its length by default."""
+        return len(text) // CHARS_PER_TOKEN_ESTIMATE
+
+
+class GeminiBackend(LLMBackend):
+    """Backend calling the Gemini API through google-genai."""
+
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+        """
+        Initialize the GeminiBackend.
+
+        :param api_key: Gemini API key; defaults to the GEMINI_API_KEY environment variable.
+        :param model: Gemini model name; defaults to the GEMINI_MODEL environment variable.
+        """
+        from google import genai
+
+        self.llm = genai.Client(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+        self.model = model or os.getenv("GEMINI_MODEL")
+
+    def generate(self, prompt: str, document_text: str, response_schema, max_output_tokens: int) -> LLMResult:
+        response = self.llm.models.generate_content(
+            model=self.model,
+            contents=[prompt, document_text],
+            config=self._config(response_schema, max_output_tokens),
+        )
+        return self._result(response.text, response)
+
+    def generate_stream(self, prompt: str, document_text: str, response_schema, max_output_tokens: int, on_text: Callable[[str], None]) -> LLMResult:
+        chunks = []
+        last_chunk = None
+        for chunk in self.llm.models.generate_content_stream(
+            model=self.model,
+            contents=[prompt, document_text],
+            config=self._config(response_schema, max_output_tokens),
+        ):
+            last_chunk = chunk
+            if chunk.text:
+                chunks.append(chunk.text)
+                on_text(chunk.text)
+        if last_chunk is None:
+            return LLMResult(text="", truncated=False)
+        # The last chunk carries the finish reason and the usage of the whole response
+        return self._result("".join(chunks), last_chunk)
+
+    @staticmethod
+    def _config(response_schema, max_output_tokens: int) -> dict:
+        return {
+            "response_mime_type": "application/json",
+            "response_schema": response_schema,
+            "max_output_tokens": max_output_tokens,
+        }
+
+    @staticmethod
+    def _result(text: str, response) -> LLMResult:
+        usage = response.usage_metadata
+        logging.info(f"Used {usage.total_token_count} tokens")
+        truncated = bool(response.candidates) and response.candidates[0].finish_reason is not None \
+            and response.candidates[0].finish_reason.name == "MAX_TOKENS"
+        if truncated:
+            logging.warning(f"LLM response truncated after {usage.candidates_token_count} output tokens")
+        return LLMResult(
+            text=text,
+            truncated=truncated,
+            prompt_tokens=usage.prompt_token_count or 0,
+            output_tokens=usage.candidates_token_count or 0,
+        )
+
+    def count_tokens(self, text: str) -> int:
+        try:
+            return self.llm.models.count_tokens(model=self.model, contents=[text]).total_tokens
+        except Exception as e:
+            logging.warning(f"Token count failed, estimating instead: {e}")
+            return super().count_tokens(text)
+
+
+class ReplayBackend(LLMBackend):
+    """
+    Offline backend serving recorded WorkoutProgram responses.
+
+    Week N is read from result-N.json in the replay directory, the format
+    written by --save-intermediate, and requests for several weeks are
+    answered by concatenating their files. The duration call is answered
+    with the number of recorded weeks. Token counts are estimated from the
+    text lengths, and latency can be simulated per call and per output
+    token, so runs are reproducible without network access. Streamed
+    responses arrive in chunks of REPLAY_STREAM_CHUNK_TOKENS tokens, paced
+    by the per-token latency.
+    """
+
+    cacheable = False
+    # Matches the scope of LLMService's extraction prompts, e.g. "Week 3" or "Weeks 1, 2 and 3"
+    SCOPE_PATTERN = re.compile(r"extract the exercises for Weeks? ([\d, and]+)")
+
+    def __init__(self, replay_dir: str, latency: float = 0.0, seconds_per_output_token: float = 0.0, latency_jitter: float = 0.0, seed: Optional[int] = None):
+        """
+        Initialize the ReplayBackend.
+
+        :param replay_dir: Directory holding result-{week}.json files.
+        :param latency: Seconds added to every call.
+        :param seconds_per_output_token: Seconds added per output token, simulating generation speed.
+        :param latency_jitter: Maximum random seconds added on top of the simulated latency.
+        :param seed: Seed for the latency jitter.
+        """
+        self.replay_dir = replay_dir
+        self.model = f"replay:{os.path.abspath(replay_dir)}"
+        self.latency = latency
+        self.seconds_per_output_token = seconds_per_output_token
+        self.latency_jitter = latency_jitter
+        self._random = random.Random(seed)
+
+    def recorded_weeks(self) -> List[int]:
+        """Return the week numbers with a recorded response, in order."""
+        weeks = []
+        for file_name in os.listdir(self.replay_dir):
+            match = re.fullmatch(r"result-(\d+)\.json", file_name)
+            if match:
+                weeks.append(int(match.group(1)))
+        return sorted(weeks)
+
+    def _load_week(self, week_number: int) -> dict:
+        with open(os.path.join(self.replay_dir, f"result-{week_number}.json"), "r") as f:
+            weeks = json.load(f)["weeks"]
+        return weeks[0]
+
+    def generate(self, prompt: str, document_text: str, response_schema, max_output_tokens: int) -> LLMResult:
+        result = self._respond(prompt, document_text, max_output_tokens)
+        delay = self._call_latency() + result.output_tokens * self.seconds_per_output_token
+        if delay:
+            time.sleep(delay)
+        return result
+
+    def generate_stream(self, prompt: str, document_text: str, response_schema, max_output_tokens: int, on_text: Callable[[str], None]) -> LLMResult:
+        result = self._respond(prompt, document_text, max_output_tokens)
+        delay = self._call_latency()
+        if delay:
+            time.sleep(delay)
+        chunk_chars = REPLAY_STREAM_CHUNK_TOKENS * CHARS_PER_TOKEN_ESTIMATE
+        for start in range(0, len(result.text), chunk_chars):
+            chunk = result.text[start:start + chunk_chars]
+            if self.seconds_per_output_token:
+                time.sleep(self.count_tokens(chunk) * self.seconds_per_output_token)
+            on_text(chunk)
+        return result
+
+    def _call_latency(self) -> float:
+        """Seconds before the first output token: the fixed latency plus jitter."""
+        delay = self.latency
+        if self.latency_jitter:
+            delay += self._random.uniform(0, self.latency_jitter)
+        return delay
+
+    def _respond(self, prompt: str, document_text: str, max_output_tokens: int) -> LLMResult:
+        """Build the recorded response to a prompt, without simulating any latency."""
+        scope = self.SCOPE_PATTERN.search(prompt)
+        if scope:
+            week_numbers = [int(n) for n in re.findall(r"\d+", scope.group(1))]
+            text = json.dumps({"weeks": [self._load_week(n) for n in week_numbers]})
+        else:
+            # The duration prompt is the only other call LLMService makes
+            text = json.dumps(len(self.recorded_weeks()))
+
+        prompt_tokens = self.count_tokens(prompt) + self.count_tokens(document_text)
+        output_tokens = self.count_tokens(text)
+        truncated = output_tokens > max_output_tokens
+        if truncated:
+            output_tokens = max_output_tokens
+            text = text[:max_output_tokens * CHARS_PER_TOKEN_ESTIMATE]
+            logging.warning(f"Replayed response truncated after {output_tokens} output tokens")
+        return LLMResult(text=text, truncated=truncated, prompt_tokens=prompt_tokens, output_tokens=output_tokens)
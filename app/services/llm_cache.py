@@ -0,0 +1,118 @@
+import os
+import time
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Optional
+
+from app.constants import LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES
+
+
+class LLMResponseCache:
+    """Persistent, size-bounded cache of raw LLM responses backed by SQLite."""
+
+    def __init__(self, db_path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        """
+        Initialize the LLMResponseCache.
+
+        :param db_path: Path to the SQLite database file.
+        :param max_bytes: Upper bound on the total size of cached responses; least recently used entries are evicted first.
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_accessed ON responses (last_accessed)")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(document_hash: str, prompt: str, model: str, schema: str) -> str:
+        """
+        Build a content-addressed cache key.
+
+        :param document_hash: Content hash of the input document.
+        :param prompt: Prompt sent with the document.
+        :param model: Name of the LLM model.
+        :param schema: Fingerprint of the response schema.
+        :return: Hex digest identifying the request.
+        """
+        payload = json.dumps([document_hash, prompt, model, schema])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached response for a key, or None on a miss.
+
+        :param key: Cache key from make_key.
+        :return: Cached response text.
+        """
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET last_accessed = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return row[0]
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache lookup failed: {e}")
+            return None
+
+    def set(self, key: str, response: str) -> None:
+        """
+        Store a response and evict least recently used entries beyond the size bound.
+
+        :param key: Cache key from make_key.
+        :param response: Response text to store.
+        """
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, response, size, now, now),
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY last_accessed ASC").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        logging.info(f"Evicted {len(evicted)} entries from LLM cache")
@@ -0,0 +1,161 @@
+import time
+import random
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Optional
+
+from app.services.tracing import tracer
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RATE_LIMIT_MARKERS = ("RESOURCE_EXHAUSTED", "429", "rate limit", "quota")
+WINDOW_SECONDS = 60.0
+
+
+class LLMScheduler:
+    """
+    Gate LLM calls behind requests-per-minute and tokens-per-minute budgets.
+
+    Concurrency grows additively while calls succeed and is halved whenever
+    the provider reports a rate limit. Rate-limit and transient server errors
+    are retried with exponential backoff and full jitter.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_concurrency: int = 1,
+        initial_concurrency: int = 1,
+        max_retries: int = 5,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+    ):
+        """
+        Initialize the LLMScheduler.
+
+        :param requests_per_minute: Request budget per rolling minute, or None for unlimited.
+        :param tokens_per_minute: Token budget per rolling minute, or None for unlimited.
+        :param max_concurrency: Upper bound on concurrent calls.
+        :param initial_concurrency: Concurrency to start from before adapting.
+        :param max_retries: Retries per call for retryable errors.
+        :param base_delay: First backoff delay in seconds.
+        :param max_delay: Cap on a single backoff delay in seconds.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = max(1, min(initial_concurrency, self.max_concurrency))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._in_flight = 0
+        self._successes = 0
+        # (timestamp, tokens) of calls started within the last window
+        self._window = deque()
+        # Tickets of callers waiting in _acquire, oldest first
+        self._waiting = deque()
+        self._condition = threading.Condition()
+
+    def run(self, call: Callable[[], Any], estimated_tokens: int = 0) -> Any:
+        """
+        Run an LLM call once budget and a concurrency slot are available, retrying retryable errors.
+
+        :param call: Zero-argument callable performing the request. If its result has a
+                     total_tokens attribute, that replaces the estimate in the token budget.
+        :param estimated_tokens: Expected token usage of the call.
+        :return: Result of the call.
+        """
+        for attempt in range(self.max_retries + 1):
+            queued = time.perf_counter()
+            entry = self._acquire(estimated_tokens)
+            tracer.annotate(queue_wait_s=time.perf_counter() - queued)
+            try:
+                result = call()
+            except Exception as e:
+                rate_limited = self.is_rate_limit_error(e)
+                self._release(success=False, rate_limited=rate_limited)
+                if attempt == self.max_retries or not (rate_limited or self.is_retryable_error(e)):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                logging.warning(f"LLM call failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                tracer.annotate(retries=1, retry_wait_s=delay)
+                tracer.increment("llm_retries")
+                time.sleep(delay)
+                continue
+            self._record_tokens(entry, getattr(result, "total_tokens", None))
+            self._release(success=True, rate_limited=False)
+            return result
+
+    @staticmethod
+    def is_rate_limit_error(error: Exception) -> bool:
+        """Return True if the error reports an exhausted quota or rate limit."""
+        if getattr(error, "code", None) == 429 or getattr(error, "status", None) == "RESOURCE_EXHAUSTED":
+            return True
+        message = str(error)
+        return any(marker.lower() in message.lower() for marker in RATE_LIMIT_MARKERS)
+
+    @staticmethod
+    def is_retryable_error(error: Exception) -> bool:
+        """Return True for transient server or connection errors."""
+        if getattr(error, "code", None) in RETRYABLE_STATUS_CODES:
+            return True
+        return isinstance(error, (ConnectionError, TimeoutError))
+
+    def _acquire(self, estimated_tokens: int) -> list:
+        with self._condition:
+            # Callers are admitted in arrival order, so concurrent imports share the budget fairly
+            ticket = object()
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._expire(now)
+                    wait = self._budget_wait(now, estimated_tokens)
+                    if self._waiting[0] is ticket and self._in_flight < self.concurrency and wait == 0:
+                        entry = [now, estimated_tokens]
+                        self._window.append(entry)
+                        self._in_flight += 1
+                        return entry
+                    self._condition.wait(timeout=wait or None)
+            finally:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+
+    def _release(self, success: bool, rate_limited: bool) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            if rate_limited:
+                self._successes = 0
+                self.concurrency = max(1, self.concurrency // 2)
+                logging.info(f"Rate limited; LLM concurrency reduced to {self.concurrency}")
+            elif success:
+                self._successes += 1
+                if self._successes >= self.concurrency and self.concurrency < self.max_concurrency:
+                    self._successes = 0
+                    self.concurrency += 1
+                    logging.info(f"LLM concurrency increased to {self.concurrency}")
+            self._condition.notify_all()
+
+    def _record_tokens(self, entry: list, actual_tokens: Optional[int]) -> None:
+        if actual_tokens is None:
+            return
+        with self._condition:
+            entry[1] = actual_tokens
+
+    def _expire(self, now: float) -> None:
+        while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+            self._window.popleft()
+
+    def _budget_wait(self, now: float, estimated_tokens: int) -> float:
+        """Return how long to wait before the request and token budgets admit another call."""
+        if not self._window:
+            return 0
+        wait_until_oldest_expires = WINDOW_SECONDS - (now - self._window[0][0])
+        if self.requests_per_minute and len(self._window) >= self.requests_per_minute:
+            return wait_until_oldest_expires
+        if self.tokens_per_minute:
+            used = sum(tokens for _, tokens in self._window)
+            if used + estimated_tokens > self.tokens_per_minute:
+                return wait_until_oldest_expires
+        return 0
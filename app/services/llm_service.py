@@ -1,25 +1,66 @@
 import os
-# import time
-import pandas as pd
-# from dotenv import load_dotenv
+import json
+import time
 import logging
-# import traceback
-import pdfplumber
+from typing import Any, Callable, Dict, List, Optional
 
 from app.schema.workout_schema import WorkoutProgram
+from app.services.document_extractor import DocumentExtractor
+from app.services.llm_backends import CHARS_PER_TOKEN_ESTIMATE, GeminiBackend, LLMBackend, LLMResult
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_scheduler import LLMScheduler
+from app.services.tracing import tracer
+from app.services.workout_stream_parser import WorkoutStreamParser
+from app.constants import GEMINI_MAX_OUTPUT_TOKENS
+
+# Output JSON tokens produced per input token of a week's program text
+JSON_OUTPUT_EXPANSION = 4
+# Fraction of the output limit a batch is planned to use
+OUTPUT_TOKEN_SAFETY_MARGIN = 0.75
+
+
+class LLMServiceError(Exception):
+    """Raised when an LLM call fails after all retries."""
 
-from google import genai
 
-# load_dotenv()
 class LLMService:
-    def __init__(self):
-        self.llm = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = os.getenv("GEMINI_MODEL")
+    def __init__(self, document_extractor: DocumentExtractor = None, response_cache: LLMResponseCache = None, refresh_cache: bool = False, scheduler: LLMScheduler = None, backend: LLMBackend = None):
+        # Gemini unless a replay or other backend is plugged in
+        self.backend = backend or GeminiBackend()
+        self.model = self.backend.model
+        self.max_output_tokens = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", GEMINI_MAX_OUTPUT_TOKENS))
+        # Shared across calls so each input file is parsed once per run
+        self.document_extractor = document_extractor or DocumentExtractor()
+        # None disables caching; refresh_cache skips lookups but still stores fresh responses
+        self.response_cache = response_cache if self.backend.cacheable else None
+        self.refresh_cache = refresh_cache
+        # Enforces request/token budgets and retries rate-limited calls
+        self.scheduler = scheduler or LLMScheduler()
+
+    @staticmethod
+    def _schema_fingerprint(schema) -> str:
+        """Return a stable string describing the response schema, used in cache keys."""
+        if hasattr(schema, "model_json_schema"):
+            return json.dumps(schema.model_json_schema(), sort_keys=True)
+        return schema.__name__
     
     def generate_week_prompt(self, week_number: int) -> str:
         """Generate a prompt to extract the workout program for a specific week in JSON format."""
+        return self._extraction_prompt(f"Week {week_number}")
+
+    def generate_weeks_prompt(self, week_numbers: List[int]) -> str:
+        """Generate a prompt to extract the workout program for several weeks in one JSON response."""
+        if len(week_numbers) == 1:
+            return self.generate_week_prompt(week_numbers[0])
+        listed = ", ".join(str(n) for n in week_numbers[:-1]) + f" and {week_numbers[-1]}"
+        return self._extraction_prompt(
+            f"Weeks {listed}, with exactly one entry in weeks per requested week, in that order"
+        )
+
+    @staticmethod
+    def _extraction_prompt(scope: str) -> str:
         return f"""
-                Analyze the workout program and extract the exercises for Week {week_number}. Return the output as a JSON object with no additional text or comments. Ensure the JSON is valid. If there are any quotes within any field, replace them with asterisks. Do not include any escaped characters in the output.
+                Analyze the workout program and extract the exercises for {scope}. Return the output as a JSON object with no additional text or comments. Ensure the JSON is valid. If there are any quotes within any field, replace them with asterisks. Do not include any escaped characters in the output.
                 For each exercise, include the following attributes:
                 - Exercise Name: If the exercise name has any superset related information, like A1, B2 etc, do not include it in the exercise name, but mention it in the notes.
                 - Sets: A list of objects where each object includes:
@@ -34,56 +75,141 @@ class LLMService:
                 3. Warmup sets may be written in text (e.g., *3 sets*), ensure they are included in the notes.                   
                 """.strip()
 
-    def make_llm_call(self, prompt: str, workout_file_path: str, is_duration_call: bool = False) -> str:
-        """Make a call to the LLM."""
+    def make_llm_call(self, prompt: str, workout_file_path: str, is_duration_call: bool = False, week_numbers: Optional[List[int]] = None) -> str:
+        """Make a call to the LLM; week_numbers only labels the call in traces."""
         try:
-            # Read file and convert to string representation
-            if workout_file_path.endswith(('.xlsx', '.xls')):
-                # Read all sheets from the Excel file
-                excel_data = pd.read_excel(workout_file_path, sheet_name=None)
-                workout_program = ""
-                for sheet_name, df in excel_data.items():
-                    workout_program += f"Sheet: {sheet_name}\n"
-                    workout_program += df.to_markdown(index=False) + "\n\n"
-            elif workout_file_path.endswith('.pdf'):
-                # Use pdfplumber to extract tables and text
-                workout_program = ""
-                with pdfplumber.open(workout_file_path) as pdf:
-                    for i, page in enumerate(pdf.pages):
-                        workout_program += f"--- Page {i+1} ---\n\n"
-                        # Extract text
-                        text = page.extract_text()
-                        if text:
-                            workout_program += text + "\n\n"
-                        
-                        # Extract tables and convert to markdown
-                        tables = page.extract_tables()
-                        for table in tables:
-                            df = pd.DataFrame(table[1:], columns=table[0])
-                            workout_program += df.to_markdown(index=False) + "\n\n"
-            else:
-                # For text files
-                with open(workout_file_path, "r") as file:
-                    workout_program = file.read()
-                    
-            contents = [prompt, workout_program]
-            model = self.model
-            config = {
-                "response_mime_type": "application/json",
-                "response_schema": WorkoutProgram if not is_duration_call else int,
-            }
-
-            response = self.llm.models.generate_content(
-                model=model,
-                contents=contents,
-                config=config,
-            )
-            logging.info(f"Used {response.usage_metadata.total_token_count} tokens")
-            print(f"Used {response.usage_metadata.total_token_count} tokens")
-            if response.candidates and response.candidates[0].finish_reason.name == "MAX_TOKENS":
-                _ = response.usage_metadata.total_token_count
-            return response.text
+            result = self._generate(prompt, workout_file_path, WorkoutProgram if not is_duration_call else int, week_numbers)
+            return result.text
         except Exception as e:
             logging.error(f"Error making LLM call: {e}")
-            return None
-        
+            raise LLMServiceError(f"LLM call failed: {e}") from e
+
+    def stream_week(self, week_number: int, workout_file_path: str, on_day: Callable[[Optional[str], Dict[str, Any]], None]) -> str:
+        """
+        Extract a week with a streamed LLM call, passing each workout day on as soon as it has been generated.
+
+        On a cache hit every day is passed on at once. If the call is retried,
+        days already passed on are not passed on again.
+
+        :param week_number: Week to extract.
+        :param workout_file_path: Path to the workout file.
+        :param on_day: Called with the week label and the WorkoutDay dict of each completed day.
+        :return: The whole WorkoutProgram JSON response.
+        """
+        started = time.perf_counter()
+
+        def on_parsed_day(label: Optional[str], day: Dict[str, Any]) -> None:
+            if parser.days_emitted == 1:
+                tracer.record("llm_first_day", time.perf_counter() - started, week=week_number)
+            on_day(label, day)
+
+        parser = WorkoutStreamParser(on_parsed_day)
+        try:
+            result = self._generate(self.generate_week_prompt(week_number), workout_file_path, WorkoutProgram, [week_number], stream_parser=parser)
+            return result.text
+        except Exception as e:
+            logging.error(f"Error making streamed LLM call: {e}")
+            raise LLMServiceError(f"LLM call failed: {e}") from e
+
+    def _generate(self, prompt: str, workout_file_path: str, response_schema, week_numbers: Optional[List[int]] = None, stream_parser: Optional[WorkoutStreamParser] = None) -> LLMResult:
+        """Send the prompt and extracted document to the LLM, going through the response cache; stream_parser receives the text as it arrives."""
+        document = self.document_extractor.extract(workout_file_path)
+        model = self.model
+
+        with tracer.span("llm_call", weeks=week_numbers, schema=getattr(response_schema, "__name__", str(response_schema))) as span:
+            cache_key = None
+            if self.response_cache is not None:
+                cache_key = LLMResponseCache.make_key(document.content_hash, prompt, model, self._schema_fingerprint(response_schema))
+                if not self.refresh_cache:
+                    cached = self.response_cache.get(cache_key)
+                    if cached is not None:
+                        logging.info("Using cached LLM response")
+                        span.set(cached=True)
+                        tracer.increment("llm_cache_hits")
+                        if stream_parser is not None:
+                            stream_parser.feed(cached)
+                        return LLMResult(text=cached, truncated=False)
+
+            def call() -> LLMResult:
+                if stream_parser is None:
+                    return self.backend.generate(prompt, document.text, response_schema, self.max_output_tokens)
+                # Each attempt of a retried call streams a fresh response
+                stream_parser.reset()
+                return self.backend.generate_stream(prompt, document.text, response_schema, self.max_output_tokens, stream_parser.feed)
+
+            estimated_tokens = (len(prompt) + len(document.text)) // CHARS_PER_TOKEN_ESTIMATE
+            result = self.scheduler.run(call, estimated_tokens=estimated_tokens)
+            span.set(cached=False, streamed=stream_parser is not None, prompt_tokens=result.prompt_tokens, output_tokens=result.output_tokens, truncated=result.truncated)
+            tracer.increment("llm_calls")
+            tracer.increment("llm_prompt_tokens", result.prompt_tokens)
+            tracer.increment("llm_output_tokens", result.output_tokens)
+        if not result.text:
+            raise LLMServiceError("LLM returned an empty response")
+        if cache_key is not None and not result.truncated:
+            self.response_cache.set(cache_key, result.text)
+        return result
+
+    def count_tokens(self, text: str) -> int:
+        """Count the tokens of a text for the configured model."""
+        return self.backend.count_tokens(text)
+
+    def plan_week_batches(self, workout_file_path: str, num_weeks: int) -> List[List[int]]:
+        """
+        Split the program's weeks into batches that fit in one response each.
+
+        The output size of a week is estimated from the document's token count
+        spread evenly over its weeks, scaled up for the verbosity of the JSON
+        schema, and compared against the model's output token limit.
+
+        :param workout_file_path: Path to the workout file.
+        :param num_weeks: Total number of weeks in the program.
+        :return: Consecutive lists of week numbers.
+        """
+        document = self.document_extractor.extract(workout_file_path)
+        document_tokens = self.count_tokens(document.text)
+        tokens_per_week = max(1, document_tokens * JSON_OUTPUT_EXPANSION // max(1, num_weeks))
+        output_budget = int(self.max_output_tokens * OUTPUT_TOKEN_SAFETY_MARGIN)
+        weeks_per_batch = max(1, min(num_weeks, output_budget // tokens_per_week))
+        logging.info(
+            f"Document has {document_tokens} tokens, estimated {tokens_per_week} output tokens per week; "
+            f"batching {weeks_per_batch} weeks per call"
+        )
+        weeks = list(range(1, num_weeks + 1))
+        return [weeks[i:i + weeks_per_batch] for i in range(0, num_weeks, weeks_per_batch)]
+
+    def extract_weeks(self, week_numbers: List[int], workout_file_path: str) -> Dict[int, str]:
+        """
+        Extract several weeks with a single LLM call.
+
+        If the response is truncated or does not contain one entry per
+        requested week, the batch is split in half and each half retried.
+        A single week that is still truncated raises LLMServiceError.
+
+        :param week_numbers: Week numbers to extract, in order.
+        :param workout_file_path: Path to the workout file.
+        :return: Mapping of week number to a WorkoutProgram JSON string holding only that week.
+        """
+        result = self._generate(self.generate_weeks_prompt(week_numbers), workout_file_path, WorkoutProgram, week_numbers)
+        weeks = None
+        if not result.truncated and result.text:
+            try:
+                weeks = json.loads(result.text).get("weeks")
+            except json.JSONDecodeError as e:
+                logging.warning(f"Invalid JSON for weeks {week_numbers}: {e}")
+
+        if weeks is not None and len(weeks) == len(week_numbers):
+            return {
+                week_number: json.dumps({"weeks": [week]})
+                for week_number, week in zip(week_numbers, weeks)
+            }
+        if len(week_numbers) == 1:
+            # Nothing left to split; a truncated week can only be handed back incomplete
+            if result.truncated:
+                raise LLMServiceError(f"Week {week_numbers[0]} does not fit in the output token limit")
+            return {week_numbers[0]: result.text}
+
+        logging.info(f"Splitting weeks {week_numbers} and retrying")
+        middle = len(week_numbers) // 2
+        extracted = self.extract_weeks(week_numbers[:middle], workout_file_path)
+        extracted.update(self.extract_weeks(week_numbers[middle:], workout_file_path))
+        return extracted
@@ -1,40 +1,208 @@
+import time
+import random
 import logging
-from typing import Dict, Any
+import threading
+from collections import Counter
+from typing import Callable, Dict, Any, Optional
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
 from ratelimit import limits, sleep_and_retry
 from datetime import datetime
 
+from app.services.tracing import tracer
+from app.constants import LYFTA_BASE_URL, LYFTA_CONNECT_TIMEOUT, LYFTA_READ_TIMEOUT, LYFTA_POOL_SIZE, LYFTA_MAX_RETRIES, LYFTA_BACKOFF_BASE
+from app.constants import UPLOAD_MODE_TWO_STEP, UPLOAD_MODE_SINGLE, UPLOAD_MODES
+
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+# Statuses with which the server turns a request away without processing it, so even a create can be resent
+UNPROCESSED_STATUS_CODES = {429, 503}
+# Statuses with which the endpoint rejects the shape of a full workout in one request, so auto mode falls back to two steps
+UNSUPPORTED_PAYLOAD_STATUS_CODES = {400, 404, 405, 415}
+
+
+class ConnectionCountingAdapter(HTTPAdapter):
+    """HTTPAdapter that reports every new TCP connection its pools open."""
+
+    def __init__(self, on_new_connection, **kwargs):
+        self._on_new_connection = on_new_connection
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        on_new_connection = self._on_new_connection
+
+        def counting(pool_class):
+            class CountingConnectionPool(pool_class):
+                def _new_conn(self):
+                    on_new_connection()
+                    return super()._new_conn()
+            return CountingConnectionPool
+
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: counting(pool_class)
+            for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
 
 class APIClient:
-    BASE_URL = "https://my.lyfta.app/api"
+    BASE_URL = LYFTA_BASE_URL
     MAX_CALLS = 10
     PERIOD = 1  # in seconds
+    HEADERS = {
+        "Accept": "*/*",
+        "Accept-Encoding": "gzip, deflate, br, zstd",
+        "Accept-Language": "en-US,en;q=0.5",
+        "Connection": "keep-alive",
+        "Content-Type": "application/json",
+        "Origin": "https://my.lyfta.app",
+        "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:134.0) Gecko/20100101 Firefox/134.0",
+    }
+
+    def __init__(self, pool_size: int = LYFTA_POOL_SIZE, connect_timeout: float = LYFTA_CONNECT_TIMEOUT, read_timeout: float = LYFTA_READ_TIMEOUT, max_retries: int = LYFTA_MAX_RETRIES, upload_mode: str = UPLOAD_MODE_TWO_STEP):
+        """
+        Initialize the APIClient with a pooled keep-alive session.
 
-    def __init__(self):
+        One client is meant to be shared by all upload threads.
+
+        :param pool_size: Maximum number of connections kept open; match it to the number of upload workers.
+        :param connect_timeout: Seconds to wait for a connection to be established.
+        :param read_timeout: Seconds to wait for the server to respond.
+        :param max_retries: Retries per request for connection errors, timeouts, 429 and 5xx responses.
+        :param upload_mode: One of UPLOAD_MODES, selecting how many requests a workout takes.
+        """
+        if upload_mode not in UPLOAD_MODES:
+            raise ValueError(f"Unsupported upload mode: {upload_mode}")
         self.logging = logging.getLogger(__name__)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.upload_mode = upload_mode
+        # Set to False once the endpoint rejects a full workout in one request
+        self.single_request_supported = None
+        self._metrics_lock = threading.Lock()
+        self._requests_by_endpoint = Counter()
+        self._workouts_created = 0
+        self._connections_opened = 0
+        self.session = requests.Session()
+        self.session.headers.update(self.HEADERS)
+        adapter = ConnectionCountingAdapter(self._count_connection, pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _count_connection(self) -> None:
+        with self._metrics_lock:
+            self._connections_opened += 1
+
+    def _count_workout(self) -> None:
+        with self._metrics_lock:
+            self._workouts_created += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return request counts per endpoint and per workout, and how many requests reused an open connection."""
+        with self._metrics_lock:
+            requests_sent = sum(self._requests_by_endpoint.values())
+            workout_requests = self._requests_by_endpoint[self.WORKOUT_ENDPOINT]
+            return {
+                "requests": requests_sent,
+                "requests_by_endpoint": dict(self._requests_by_endpoint),
+                "workouts_created": self._workouts_created,
+                "requests_per_workout": workout_requests / self._workouts_created if self._workouts_created else 0.0,
+                "connections_opened": self._connections_opened,
+                "connection_reuse_ratio": 1 - self._connections_opened / requests_sent if requests_sent else 0.0,
+            }
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+    @staticmethod
+    def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Return how long to wait before a retry: the server's Retry-After if given, else exponential backoff with jitter.
+
+        :param attempt: Zero-based number of the failed attempt.
+        :param retry_after: Value of the Retry-After response header, if any.
+        :return: Delay in seconds.
+        """
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return LYFTA_BACKOFF_BASE * 2 ** attempt + random.uniform(0, LYFTA_BACKOFF_BASE)
+
+    @classmethod
+    def is_idempotent(cls, endpoint: str, data: Optional[Dict[str, Any]]) -> bool:
+        """
+        Return False for requests that create a collection or workout, which would create a duplicate if sent twice.
+
+        Saving a workout that already has an ID overwrites it, so it can be sent again.
+
+        :param endpoint: Path below BASE_URL.
+        :param data: JSON request body.
+        """
+        if endpoint == cls.COLLECTION_ENDPOINT:
+            return False
+        if endpoint == cls.WORKOUT_ENDPOINT:
+            return bool((data or {}).get("workout", {}).get("id"))
+        return True
+
+    @staticmethod
+    def is_transient_error(error: Exception, idempotent: bool = True) -> bool:
+        """
+        Return True for request failures worth retrying.
+
+        :param error: Exception raised by the request.
+        :param idempotent: Whether the request can safely be processed twice; if not, only failures before the server processed it are retried.
+        """
+        if isinstance(error, requests.HTTPError):
+            status_codes = TRANSIENT_STATUS_CODES if idempotent else UNPROCESSED_STATUS_CODES
+            return error.response is not None and error.response.status_code in status_codes
+        if not idempotent:
+            # A timeout or dropped connection after the request was sent may still have created something
+            reason = getattr(error.args[0], "reason", None) if isinstance(error, requests.ConnectionError) and error.args else None
+            return isinstance(error, requests.ConnectTimeout) or isinstance(reason, ConnectTimeoutError)
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+    @staticmethod
+    def is_unsupported_payload_error(error: Exception) -> bool:
+        """Return True if a request was rejected because the endpoint does not accept its payload shape."""
+        response = getattr(error, "response", None)
+        return response is not None and response.status_code in UNSUPPORTED_PAYLOAD_STATUS_CODES
+
+    def send_request(self, endpoint: str, method: str, data: Dict[str, Any], cookie: str) -> requests.Response:
+        """Send a request, retrying transient failures with exponential backoff; creates are only retried if they were not processed."""
+        idempotent = self.is_idempotent(endpoint, data)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._send_once(endpoint, method, data, cookie, queued_at=time.perf_counter())
+            except requests.RequestException as e:
+                if attempt == self.max_retries or not self.is_transient_error(e, idempotent):
+                    raise
+                retry_after = e.response.headers.get("Retry-After") if e.response is not None else None
+                delay = self.retry_delay(attempt, retry_after)
+                self.logging.warning(f"Retrying {endpoint} in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries}): {e}")
+                tracer.annotate(retries=1, retry_wait_s=delay)
+                time.sleep(delay)
 
     @sleep_and_retry
     @limits(calls=MAX_CALLS, period=PERIOD)
-    def send_request(self, endpoint: str, method: str, data: Dict[str, Any], cookie: str) -> requests.Response:
+    def _send_once(self, endpoint: str, method: str, data: Dict[str, Any], cookie: str, queued_at: Optional[float] = None) -> requests.Response:
+        if queued_at is not None:
+            # Time spent waiting for the client-side rate limit
+            tracer.annotate(queue_wait_s=time.perf_counter() - queued_at)
+        tracer.annotate(requests=1)
         try:
             url = f"{self.BASE_URL}/{endpoint}"
-            headers = {
-                "Accept": "*/*",
-                "Accept-Encoding": "gzip, deflate, br, zstd",
-                "Accept-Language": "en-US,en;q=0.5",
-                "Connection": "keep-alive",
-                "Content-Type": "application/json",
-                "Cookie": cookie,
-                "Host": "my.lyfta.app",
-                "Origin": "https://my.lyfta.app",
-                "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:134.0) Gecko/20100101 Firefox/134.0",
-            }
+            headers = {"Cookie": cookie}
+            with self._metrics_lock:
+                self._requests_by_endpoint[endpoint] += 1
 
             # Choose the HTTP method
             if method.upper() == "POST":
-                response = requests.post(url, headers=headers, json=data)
+                response = self.session.post(url, headers=headers, json=data, timeout=self.timeout)
             elif method.upper() == "GET":
-                response = requests.get(url, headers=headers)
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
             else:
                 raise ValueError("Unsupported HTTP method")
 
@@ -54,11 +222,14 @@ class APIClient:
             self.logging.error(f"Unexpected error in send_request: {e}", exc_info=True)
             raise
 
-    def create_collection(self, collection_name: str, week_number:int, cookie: str) -> str:
-        """Create a new collection and return its ID."""
-        endpoint = "saveCollection"
+    COLLECTION_ENDPOINT = "saveCollection"
+    WORKOUT_ENDPOINT = "workout/SaveTemplate"
+
+    @staticmethod
+    def build_collection_payload(collection_name: str, week_number: int) -> Dict[str, Any]:
+        """Build the saveCollection request body for a week's collection."""
         current_time = datetime.now().isoformat()
-        data = {
+        return {
             "collection": {
                 "title": collection_name,
                 "description": "",
@@ -68,23 +239,11 @@ class APIClient:
                 "sort_priority": week_number
             }
         }
-        try:
-            response = self.send_request(endpoint, "POST", data, cookie)
-            collection_id = response.json().get("data", {}).get("id")  # Extract collection ID from response
-            user_id = response.json().get("data", {}).get("user_id")  # Extract user ID from response
-            if not collection_id:
-                raise ValueError("Failed to retrieve collection ID from API response")
 
-            self.logging.info(f"Created collection '{collection_name}' with ID {collection_id}")
-            return collection_id, user_id
-        except Exception as e:
-            self.logging.error(f"Error creating collection '{collection_name}': {e}", exc_info=True)
-            raise
-
-    def create_workout_in_collection(self, workout: Dict[str, Any], collection_id: str, user_id: str, collection_name: str, cookie: str) -> str:
-        """Create a new workout inside a collection and return its ID."""
-        endpoint = "workout/SaveTemplate"
-        payload1 = {
+    @staticmethod
+    def build_workout_skeleton_payload(workout: Dict[str, Any], collection_id: str, collection_name: str) -> Dict[str, Any]:
+        """Build the first SaveTemplate request body, which creates an empty workout and returns its ID."""
+        return {
             "workout": {
                 "id": None,
                 "collectionId": collection_id,
@@ -118,21 +277,114 @@ class APIClient:
                 "title": workout["title"]
             }
         }
+
+    @classmethod
+    def build_full_workout_payload(cls, workout: Dict[str, Any], collection_id: str, user_id: str, collection_name: str) -> Dict[str, Any]:
+        """Build a SaveTemplate request body that creates a workout together with its content."""
+        payload = cls.build_workout_skeleton_payload(workout, collection_id, collection_name)
+        payload["workout"].update(workout)
+        payload["workout"]["user_id"] = user_id
+        return payload
+
+    @staticmethod
+    def confirms_workout_content(response_data: Dict[str, Any], workout: Dict[str, Any]) -> bool:
+        """Return True if a SaveTemplate response shows the workout's exercises were stored."""
+        stored_exercises = response_data.get("exercises")
+        return isinstance(stored_exercises, list) and len(stored_exercises) == len(workout.get("exercises", []))
+
+    def create_collection(self, collection_name: str, week_number:int, cookie: str) -> str:
+        """Create a new collection and return its ID."""
+        endpoint = self.COLLECTION_ENDPOINT
+        data = self.build_collection_payload(collection_name, week_number)
         try:
-            response = self.send_request(endpoint, "POST", payload1, cookie)
-            workout_id = response.json().get("data", {}).get("id")  # Extract ID from response
-            if not workout_id:
-                raise ValueError("Failed to retrieve workout ID from API response")
-
-            self.logging.info(f"Created workout '{workout['title']}' with ID {workout_id}")
-            workout["id"] = workout_id
-            workout["user_id"] = user_id
-            payload2 = {
-                "workout": workout
-            }
+            with tracer.span("collection_create", week=week_number):
+                response = self.send_request(endpoint, "POST", data, cookie)
+            collection_id = response.json().get("data", {}).get("id")  # Extract collection ID from response
+            user_id = response.json().get("data", {}).get("user_id")  # Extract user ID from response
+            if not collection_id:
+                raise ValueError("Failed to retrieve collection ID from API response")
+
+            self.logging.info(f"Created collection '{collection_name}' with ID {collection_id}")
+            return collection_id, user_id
+        except Exception as e:
+            self.logging.error(f"Error creating collection '{collection_name}': {e}", exc_info=True)
+            raise
 
-            self.send_request(endpoint, "POST", payload2, cookie)
-            return workout_id
+    def create_workout_in_collection(self, workout: Dict[str, Any], collection_id: str, user_id: str, collection_name: str, cookie: str) -> str:
+        """Create a new workout inside a collection and return its ID."""
+        try:
+            return self.create_workout(workout, collection_id, user_id, collection_name, cookie)
         except Exception as e:
             self.logging.error(f"Error creating workout '{workout['title']}' in collection '{collection_name}': {e}", exc_info=True)
             raise
+
+    def create_workout(self, workout: Dict[str, Any], collection_id: str, user_id: str, collection_name: str, cookie: str, on_created: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Create a workout with its content, using as few requests as the upload mode allows.
+
+        :param workout: Formatted workout.
+        :param collection_id: ID of the collection to create the workout in.
+        :param user_id: ID of the Lyfta user.
+        :param collection_name: Name of the collection.
+        :param cookie: Cookie for the Lyfta account.
+        :param on_created: Called with the workout ID when a workout exists but its content is not saved yet.
+        :return: ID of the created workout.
+        """
+        with tracer.span("workout_create", collection=collection_name, workout=workout["title"], upload_mode=self.upload_mode):
+            return self._create_workout(workout, collection_id, user_id, collection_name, cookie, on_created)
+
+    def _create_workout(self, workout: Dict[str, Any], collection_id: str, user_id: str, collection_name: str, cookie: str, on_created: Optional[Callable[[str], None]]) -> str:
+        if self.upload_mode != UPLOAD_MODE_TWO_STEP and self.single_request_supported is not False:
+            payload = self.build_full_workout_payload(workout, collection_id, user_id, collection_name)
+            try:
+                response = self.send_request(self.WORKOUT_ENDPOINT, "POST", payload, cookie)
+            except requests.HTTPError as e:
+                # Auth failures, invalid workouts and server errors are not about the payload shape
+                if self.upload_mode == UPLOAD_MODE_SINGLE or not self.is_unsupported_payload_error(e):
+                    raise
+                self.single_request_supported = False
+                self.logging.info("Endpoint rejected a full workout in one request; falling back to two-step uploads")
+            else:
+                data = response.json().get("data", {})
+                workout_id = data.get("id")
+                if not workout_id:
+                    raise ValueError("Failed to retrieve workout ID from API response")
+                self.logging.info(f"Created workout '{workout['title']}' with ID {workout_id}")
+                if self.upload_mode == UPLOAD_MODE_SINGLE or self.confirms_workout_content(data, workout):
+                    self.single_request_supported = True
+                    self._count_workout()
+                    return workout_id
+                # The workout exists but its content may have been dropped; save it again under the same ID
+                if on_created:
+                    on_created(workout_id)
+                self.save_workout(workout, workout_id, user_id, cookie)
+                self._count_workout()
+                return workout_id
+
+        workout_id = self.create_workout_skeleton(workout, collection_id, collection_name, cookie)
+        if on_created:
+            on_created(workout_id)
+        self.save_workout(workout, workout_id, user_id, cookie)
+        self._count_workout()
+        return workout_id
+
+    def create_workout_skeleton(self, workout: Dict[str, Any], collection_id: str, collection_name: str, cookie: str) -> str:
+        """Create an empty workout inside a collection and return its ID."""
+        payload1 = self.build_workout_skeleton_payload(workout, collection_id, collection_name)
+        response = self.send_request(self.WORKOUT_ENDPOINT, "POST", payload1, cookie)
+        workout_id = response.json().get("data", {}).get("id")  # Extract ID from response
+        if not workout_id:
+            raise ValueError("Failed to retrieve workout ID from API response")
+
+        self.logging.info(f"Created workout '{workout['title']}' with ID {workout_id}")
+        return workout_id
+
+    def save_workout(self, workout: Dict[str, Any], workout_id: str, user_id: str, cookie: str) -> None:
+        """Save the full content of a workout that already has an ID."""
+        workout["id"] = workout_id
+        workout["user_id"] = user_id
+        payload2 = {
+            "workout": workout
+        }
+
+        self.send_request(self.WORKOUT_ENDPOINT, "POST", payload2, cookie)
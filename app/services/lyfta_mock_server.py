@@ -0,0 +1,277 @@
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from app.services.lyfta_api_service import APIClient
+
+
+class LyftaMockServer:
+    """
+    Local stand-in for the Lyfta endpoints used by APIClient and AsyncUploadEngine.
+
+    Serves saveCollection and workout/SaveTemplate under /api with payloads
+    shaped like Lyfta's, keeping created collections and workouts in memory.
+    Latency, random 5xx errors, random 429s and a server-side request rate
+    limit are configurable, so the upload path can be load-tested offline by
+    pointing LYFTA_BASE_URL at base_url. Every distinct cookie is its own
+    account, which can only add workouts to and update its own collections
+    and workouts.
+    """
+
+    USER_ID = 1000
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        rate_limit: Optional[int] = None,
+        rate_period: float = 1.0,
+        echo_exercises: bool = False,
+        reject_full_workouts: bool = False,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the LyftaMockServer.
+
+        :param host: Interface to listen on.
+        :param port: Port to listen on; 0 picks a free port.
+        :param latency: Seconds added to every response.
+        :param latency_jitter: Maximum random seconds added on top of latency.
+        :param error_rate: Fraction of requests answered with a 503.
+        :param throttle_rate: Fraction of requests answered with a 429, independent of rate_limit.
+        :param rate_limit: Requests allowed per rate_period before answering 429 with Retry-After, or None for no limit.
+        :param rate_period: Length in seconds of the rate limit window.
+        :param echo_exercises: Return the stored exercises in SaveTemplate responses, as the auto upload mode expects.
+        :param reject_full_workouts: Answer 400 to SaveTemplate requests creating a workout together with its exercises.
+        :param seed: Seed for the random error and latency draws.
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        self.echo_exercises = echo_exercises
+        self.reject_full_workouts = reject_full_workouts
+        self.collections: Dict[int, Dict[str, Any]] = {}
+        self.workouts: Dict[int, Dict[str, Any]] = {}
+        # Owning user of every collection and workout ID, and the user of every cookie seen
+        self.owners: Dict[int, int] = {}
+        self._users: Dict[str, int] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._recent_requests: deque = deque()
+        self._responses = Counter()
+        self._requests_by_endpoint = Counter()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self) -> str:
+        """Serve requests from a background thread and return the base URL."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="lyfta-mock-server", daemon=True)
+        self._thread.start()
+        logging.info(f"Lyfta mock server listening on {self.base_url}")
+        return self.base_url
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "LyftaMockServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request counts per endpoint and per status code, and how much was created."""
+        with self._lock:
+            return {
+                "requests": sum(self._requests_by_endpoint.values()),
+                "requests_by_endpoint": dict(self._requests_by_endpoint),
+                "responses_by_status": dict(self._responses),
+                "collections": len(self.collections),
+                "workouts": len(self.workouts),
+                "workouts_with_exercises": sum(1 for workout in self.workouts.values() if workout.get("exercises")),
+            }
+
+    def user_id(self, cookie: str) -> int:
+        """Return the user ID of the account a cookie logs into, creating the account on first use."""
+        with self._lock:
+            return self._user_id(cookie)
+
+    def _user_id(self, cookie: str) -> int:
+        if cookie not in self._users:
+            self._users[cookie] = self.USER_ID + len(self._users)
+        return self._users[cookie]
+
+    def _allocate_id(self) -> int:
+        workout_id = self._next_id
+        self._next_id += 1
+        return workout_id
+
+    def _check_rate_limit(self) -> Optional[float]:
+        """Record a request and return the seconds to wait if it exceeds the rate limit."""
+        if self.rate_limit is None:
+            return None
+        now = time.monotonic()
+        while self._recent_requests and now - self._recent_requests[0] >= self.rate_period:
+            self._recent_requests.popleft()
+        if len(self._recent_requests) >= self.rate_limit:
+            return self.rate_period - (now - self._recent_requests[0])
+        self._recent_requests.append(now)
+        return None
+
+    def handle(self, endpoint: str, cookie: Optional[str], body: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        """
+        Answer one request.
+
+        :param endpoint: Path below /api, e.g. "saveCollection".
+        :param cookie: Value of the Cookie header.
+        :param body: Decoded JSON request body.
+        :return: Status code, JSON response body and extra response headers.
+        """
+        with self._lock:
+            self._requests_by_endpoint[endpoint] += 1
+            delay = self.latency + self._random.uniform(0, self.latency_jitter)
+            retry_after = self._check_rate_limit()
+            roll = self._random.random()
+        if delay:
+            time.sleep(delay)
+
+        if retry_after is not None:
+            return 429, {"message": "Too Many Requests"}, {"Retry-After": str(max(1, round(retry_after)))}
+        if roll < self.throttle_rate:
+            return 429, {"message": "Too Many Requests"}, {}
+        if roll < self.throttle_rate + self.error_rate:
+            return 503, {"message": "Service Unavailable"}, {}
+        if not cookie:
+            return 401, {"message": "Unauthenticated."}, {}
+
+        with self._lock:
+            user_id = self._user_id(cookie)
+            if endpoint == APIClient.COLLECTION_ENDPOINT:
+                collection = body.get("collection")
+                if not isinstance(collection, dict) or not collection.get("title"):
+                    return 422, {"message": "The collection title field is required."}, {}
+                collection_id = self._allocate_id()
+                self.collections[collection_id] = collection
+                self.owners[collection_id] = user_id
+                return 200, {"data": {**collection, "id": collection_id, "user_id": user_id}}, {}
+
+            if endpoint == APIClient.WORKOUT_ENDPOINT:
+                workout = body.get("workout")
+                if not isinstance(workout, dict):
+                    return 422, {"message": "The workout field is required."}, {}
+                workout_id = workout.get("id")
+                if workout_id:
+                    if workout_id not in self.workouts or self.owners[workout_id] != user_id:
+                        return 404, {"message": "Workout not found."}, {}
+                    self.workouts[workout_id].update(workout)
+                else:
+                    if self.reject_full_workouts and workout.get("exercises"):
+                        return 400, {"message": "Exercises cannot be saved while creating a workout."}, {}
+                    if self.owners.get(workout.get("collectionId")) != user_id:
+                        return 422, {"message": "The selected collection id is invalid."}, {}
+                    workout_id = self._allocate_id()
+                    self.workouts[workout_id] = dict(workout, id=workout_id)
+                    self.owners[workout_id] = user_id
+                data = {"id": workout_id, "user_id": user_id}
+                if self.echo_exercises and self.workouts[workout_id].get("exercises"):
+                    data["exercises"] = self.workouts[workout_id]["exercises"]
+                return 200, {"data": data}, {}
+
+        return 404, {"message": "Not Found"}, {}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    status, payload, headers = 400, {"message": "Malformed JSON"}, {}
+                else:
+                    endpoint = self.path.split("?", 1)[0]
+                    endpoint = endpoint[len("/api/"):] if endpoint.startswith("/api/") else endpoint.lstrip("/")
+                    status, payload, headers = server.handle(endpoint, self.headers.get("Cookie"), body)
+                with server._lock:
+                    server._responses[status] += 1
+                encoded = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format, *args):
+                logging.debug(f"Lyfta mock server: {format % args}")
+
+        return Handler
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Lyfta API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Maximum random seconds added on top of --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--rate-limit", type=int, help="Requests allowed per --rate-period before answering 429")
+    parser.add_argument("--rate-period", type=float, default=1.0, help="Rate limit window in seconds")
+    parser.add_argument("--echo-exercises", action="store_true", help="Echo stored exercises in SaveTemplate responses")
+    parser.add_argument("--reject-full-workouts", action="store_true", help="Answer 400 to SaveTemplate requests creating a workout with its exercises")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    mock = LyftaMockServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        rate_limit=args.rate_limit,
+        rate_period=args.rate_period,
+        echo_exercises=args.echo_exercises,
+        reject_full_workouts=args.reject_full_workouts,
+        seed=args.seed,
+    )
+    mock.start()
+    logging.info(f"Set LYFTA_BASE_URL={mock.base_url} to upload against it")
+    try:
+        mock._thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logging.info(f"Lyfta mock server stats: {mock.stats()}")
+        mock.stop()
@@ -0,0 +1,119 @@
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class MatchCache:
+    """
+    Thread-safe LRU cache of normalized exercise name to matched exercise ID.
+
+    The cache is tied to a fingerprint of everything that can change a match
+    (the alias table and the exercise database); a persisted cache with a
+    different fingerprint is discarded on load.
+    """
+
+    def __init__(self, fingerprint: str, max_entries: int = 10000, path: Optional[str] = None):
+        """
+        Initialize the MatchCache.
+
+        :param fingerprint: Identifier of the alias table and exercise database the matches were made against.
+        :param max_entries: Maximum number of cached names; least recently used names are evicted first.
+        :param path: JSON file the cache is persisted to, or None to keep it in memory only.
+        """
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        # Counters accumulated over previous runs that used the same fingerprint
+        self._previous_hits = 0
+        self._previous_misses = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def get(self, name: str) -> Optional[Any]:
+        """
+        Return the cached exercise ID for a normalized name, counting the hit or miss.
+
+        :param name: Normalized exercise name.
+        :return: Cached exercise ID, or None on a miss.
+        """
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return self._entries[name]
+            self.misses += 1
+            return None
+
+    def put(self, name: str, exercise_id: Any) -> None:
+        """
+        Cache the exercise ID matched for a normalized name.
+
+        :param name: Normalized exercise name.
+        :param exercise_id: ID of the matched database exercise.
+        """
+        with self._lock:
+            self._entries[name] = exercise_id
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this run and across persisted runs."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "total_hits": self._previous_hits + self.hits,
+                "total_misses": self._previous_misses + self.misses,
+            }
+
+    def save(self) -> None:
+        """Persist the cache and its counters to disk, if a path is configured."""
+        if not self.path:
+            return
+        stats = self.stats()
+        with self._lock:
+            payload = {
+                "fingerprint": self.fingerprint,
+                "total_hits": stats["total_hits"],
+                "total_misses": stats["total_misses"],
+                "entries": list(self._entries.items()),
+            }
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Could not persist match cache: {e}")
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r") as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Could not load match cache, starting empty: {e}")
+            return
+        if payload.get("fingerprint") != self.fingerprint:
+            logging.info("Exercise aliases or database changed; discarding persisted match cache")
+            return
+        self._previous_hits = payload.get("total_hits", 0)
+        self._previous_misses = payload.get("total_misses", 0)
+        for name, exercise_id in payload.get("entries", [])[-self.max_entries:]:
+            self._entries[name] = exercise_id
+        logging.info(f"Loaded {len(self._entries)} cached exercise matches")
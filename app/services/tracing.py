@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import logging
+import itertools
+import threading
+import contextvars
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+METRIC_PREFIX = "workout_import"
+SUMMARY_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Span:
+    """A timed stage of an import, with attributes describing what it worked on."""
+
+    def __init__(self, name: str, span_id: int, parent_id: Optional[int], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.thread = threading.current_thread().name
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        """Set attributes, replacing earlier values."""
+        self.attributes.update(attributes)
+
+    def add(self, **amounts: float) -> None:
+        """Add to numeric attributes, e.g. retry counts or wait times accumulated over several calls."""
+        for key, amount in amounts.items():
+            self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "thread": self.thread,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """
+    Thread-safe, in-memory recorder of spans and counters.
+
+    The current span is tracked in a context variable, so spans nest
+    correctly across threads and asyncio tasks, and code deep in a call
+    (a scheduler, an HTTP client) can annotate the stage it runs in without
+    having the span passed to it. Spans are kept in memory and exported as
+    JSON or as Prometheus text at the end of a run. A long-running process
+    bounds them with limit_spans: the count, errors, total and maximum of
+    every stage stay exact, while the quantiles and the exported spans cover
+    the most recent ones.
+    """
+
+    def __init__(self, max_spans: Optional[int] = None):
+        """
+        Initialize the Tracer.
+
+        :param max_spans: Number of most recent spans kept, or None to keep all of them.
+        """
+        self._spans: deque = deque(maxlen=max_spans)
+        # Per span name: [count, errors, total seconds, max seconds] over every span ever recorded
+        self._stages: Dict[str, List[float]] = {}
+        self._counters: Counter = Counter()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._current: contextvars.ContextVar = contextvars.ContextVar(f"current_span_{id(self)}", default=None)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Time a block of code as a span nested in the current one.
+
+        :param name: Stage name, e.g. "llm_call".
+        :param attributes: Initial attributes, e.g. week=3.
+        :return: Context manager yielding the span, so attributes can be added while it runs.
+        """
+        parent = self._current.get()
+        span = Span(name, next(self._ids), parent.span_id if parent else None, attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - span._start
+            self._current.reset(token)
+            self._add(span)
+
+    def record(self, name: str, duration: float, **attributes: Any) -> None:
+        """Record a span that was timed elsewhere, as a child of the current span."""
+        parent = self._current.get()
+        span = Span(name, next(self._ids), parent.span_id if parent else None, attributes)
+        span.duration = duration
+        span.start_time -= duration
+        self._add(span)
+
+    def _add(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+            stage = self._stages.setdefault(span.name, [0, 0, 0.0, 0.0])
+            stage[0] += 1
+            stage[1] += 1 if span.error else 0
+            stage[2] += span.duration
+            stage[3] = max(stage[3], span.duration)
+
+    def limit_spans(self, max_spans: Optional[int]) -> None:
+        """
+        Keep only the most recent spans from now on, so a long-running process does not grow without bound.
+
+        :param max_spans: Number of spans kept, or None to keep all of them.
+        """
+        with self._lock:
+            self._spans = deque(self._spans, maxlen=max_spans)
+
+    def current_span(self) -> Optional[Span]:
+        return self._current.get()
+
+    def annotate(self, **amounts: float) -> None:
+        """Add to numeric attributes of the current span, if there is one."""
+        span = self._current.get()
+        if span is not None:
+            span.add(**amounts)
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        """Add to a run-wide counter, e.g. llm_prompt_tokens."""
+        with self._lock:
+            self._counters[name] += amount
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self) -> None:
+        """Forget all spans and counters."""
+        with self._lock:
+            self._spans.clear()
+            self._stages.clear()
+            self._counters.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Aggregate span durations per stage.
+
+        :return: Per span name: count, errors, total, mean, max and quantiles in seconds; the quantiles are over the spans kept.
+        """
+        durations = defaultdict(list)
+        for span in self.spans():
+            durations[span.name].append(span.duration or 0.0)
+        with self._lock:
+            stages = {name: list(stage) for name, stage in self._stages.items()}
+        summary = {}
+        for name, (count, errors, total, maximum) in sorted(stages.items()):
+            # A stage whose spans have all been dropped is summarized by its mean
+            values = sorted(durations[name]) or [total / count]
+            stats = {
+                "count": count,
+                "errors": errors,
+                "total_s": total,
+                "mean_s": total / count,
+                "max_s": maximum,
+            }
+            for quantile in SUMMARY_QUANTILES:
+                stats[f"p{int(quantile * 100)}_s"] = values[min(len(values) - 1, int(quantile * len(values)))]
+            summary[name] = stats
+        return summary
+
+    def log_summary(self) -> None:
+        """Log one line per stage with its span count, total and p95 duration."""
+        for stage, stats in self.summary().items():
+            logging.info(f"Stage {stage}: {stats['count']} spans, {stats['total_s']:.2f}s total, p95 {stats['p95_s']:.3f}s")
+
+    def export_json(self, path: str) -> None:
+        """Write every span kept, the per-stage summary and the counters to a JSON file."""
+        payload = {
+            "summary": self.summary(),
+            "counters": self.counters(),
+            "spans": [span.to_dict() for span in self.spans()],
+        }
+        self._write(path, json.dumps(payload, indent=2, default=str))
+
+    def prometheus_text(self) -> str:
+        """Render the per-stage summary and the counters in the Prometheus text exposition format."""
+        metric = f"{METRIC_PREFIX}_span_seconds"
+        lines = [
+            f"# HELP {metric} Duration of import stages.",
+            f"# TYPE {metric} summary",
+        ]
+        for name, stats in self.summary().items():
+            for quantile in SUMMARY_QUANTILES:
+                lines.append(f'{metric}{{stage="{name}",quantile="{quantile}"}} {stats[f"p{int(quantile * 100)}_s"]:.6f}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {stats["total_s"]:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {stats["count"]}')
+        errors = f"{METRIC_PREFIX}_span_errors_total"
+        lines += [f"# HELP {errors} Import stages that raised.", f"# TYPE {errors} counter"]
+        for name, stats in self.summary().items():
+            lines.append(f'{errors}{{stage="{name}"}} {stats["errors"]}')
+        for name, value in sorted(self.counters().items()):
+            counter = f"{METRIC_PREFIX}_{name}_total"
+            lines += [f"# TYPE {counter} counter", f"{counter} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, path: str) -> None:
+        """Write the Prometheus text rendering to a file, e.g. for node_exporter's textfile collector."""
+        self._write(path, self.prometheus_text())
+
+    @staticmethod
+    def _write(path: str, text: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+# Process-wide tracer the services record into, used like the logging module
+tracer = Tracer()
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Optional, Set, Tuple
+
+from app.constants import UPLOAD_JOURNAL_PATH
+
+
+def account_id(cookie: str) -> str:
+    """Identify the Lyfta account a cookie logs into, without keeping the cookie itself."""
+    return hashlib.sha256(cookie.strip().encode("utf-8")).hexdigest()[:12]
+
+
+class UploadJournal:
+    """
+    SQLite record of the collections and workouts created in Lyfta per program and week.
+
+    A workout is recorded as soon as its ID is known and marked completed once
+    its full content is saved, so an interrupted import can be resumed
+    without creating duplicates. IDs are stored JSON-encoded so they come back
+    with the type the API returned. Programs are keyed by file content and
+    account, so imports of one file into different accounts never share rows.
+    """
+
+    def __init__(self, db_path: str = UPLOAD_JOURNAL_PATH):
+        """
+        Initialize the UploadJournal.
+
+        :param db_path: Path to the SQLite database file.
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        # Program keys with an import running in this process
+        self._active: Set[str] = set()
+        self._active_lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS collections (
+                program_key TEXT NOT NULL,
+                week_number INTEGER NOT NULL,
+                collection_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (program_key, week_number)
+            );
+            CREATE TABLE IF NOT EXISTS workouts (
+                program_key TEXT NOT NULL,
+                week_number INTEGER NOT NULL,
+                workout_key TEXT NOT NULL,
+                workout_id TEXT NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (program_key, week_number, workout_key)
+            );
+            """
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def program_key(content_hash: str, cookie: str) -> str:
+        """
+        Key under which an import of a file into an account is recorded.
+
+        :param content_hash: Hash of the workout file's content.
+        :param cookie: Cookie for the Lyfta account.
+        """
+        return hashlib.sha256(f"{content_hash}:{account_id(cookie)}".encode("utf-8")).hexdigest()
+
+    def begin(self, program_key: str, resume: bool) -> None:
+        """
+        Claim a program for an import, forgetting what was recorded for it unless the import resumes.
+
+        :param program_key: Key returned by program_key.
+        :param resume: Keep the recorded collections and workouts.
+        :raises ValueError: If the same file is already being imported into the same account.
+        """
+        with self._active_lock:
+            if program_key in self._active:
+                raise ValueError("This file is already being imported into this Lyfta account")
+            self._active.add(program_key)
+        if not resume:
+            self.reset(program_key)
+
+    def end(self, program_key: str) -> None:
+        """Release a program claimed with begin."""
+        with self._active_lock:
+            self._active.discard(program_key)
+
+    def reset(self, program_key: str) -> None:
+        """Forget everything recorded for a program, so the next import starts from scratch."""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM collections WHERE program_key = ?", (program_key,))
+            conn.execute("DELETE FROM workouts WHERE program_key = ?", (program_key,))
+
+    def get_collection(self, program_key: str, week_number: int) -> Optional[Tuple[str, str]]:
+        """Return the (collection_id, user_id) created for a week, if any."""
+        row = self._connection().execute(
+            "SELECT collection_id, user_id FROM collections WHERE program_key = ? AND week_number = ?",
+            (program_key, week_number),
+        ).fetchone()
+        return (json.loads(row[0]), json.loads(row[1])) if row else None
+
+    def record_collection(self, program_key: str, week_number: int, collection_id: str, user_id: str) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO collections (program_key, week_number, collection_id, user_id, completed, updated_at) VALUES (?, ?, ?, ?, 0, ?)",
+                (program_key, week_number, json.dumps(collection_id), json.dumps(user_id), time.time()),
+            )
+
+    def complete_week(self, program_key: str, week_number: int) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE collections SET completed = 1, updated_at = ? WHERE program_key = ? AND week_number = ?",
+                (time.time(), program_key, week_number),
+            )
+
+    def is_week_complete(self, program_key: str, week_number: int) -> bool:
+        row = self._connection().execute(
+            "SELECT completed FROM collections WHERE program_key = ? AND week_number = ?",
+            (program_key, week_number),
+        ).fetchone()
+        return bool(row and row[0])
+
+    def get_workout(self, program_key: str, week_number: int, workout_key: str) -> Optional[Tuple[str, bool]]:
+        """Return the (workout_id, completed) recorded for a workout, if any."""
+        row = self._connection().execute(
+            "SELECT workout_id, completed FROM workouts WHERE program_key = ? AND week_number = ? AND workout_key = ?",
+            (program_key, week_number, workout_key),
+        ).fetchone()
+        return (json.loads(row[0]), bool(row[1])) if row else None
+
+    def record_workout(self, program_key: str, week_number: int, workout_key: str, workout_id: str, completed: bool) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO workouts (program_key, week_number, workout_key, workout_id, completed, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (program_key, week_number, workout_key, json.dumps(workout_id), int(completed), time.time()),
+            )
+
+    @staticmethod
+    def workout_key(position: int, title: str) -> str:
+        """Identify a workout within its week by its position and title."""
+        return f"{position}:{title}"
@@ -0,0 +1,83 @@
+import math
+import logging
+
+import faiss
+import numpy as np
+
+from app.constants import (
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+    IVF_LISTS_PER_SQRT,
+    IVF_MIN_POINTS_PER_LIST,
+    IVF_NPROBE,
+)
+
+INDEX_TYPE_FLAT = "flat"
+INDEX_TYPE_HNSW = "hnsw"
+INDEX_TYPE_IVF = "ivf"
+INDEX_TYPES = (INDEX_TYPE_FLAT, INDEX_TYPE_HNSW, INDEX_TYPE_IVF)
+
+
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize embeddings, so inner product search ranks by cosine similarity.
+
+    :param embeddings: Matrix of embeddings, one row per text.
+    :return: Contiguous float32 copy with unit-length rows.
+    """
+    normalized = np.array(embeddings, dtype="float32", order="C", copy=True)
+    faiss.normalize_L2(normalized)
+    return normalized
+
+
+def ivf_list_count(num_vectors: int) -> int:
+    """
+    Number of inverted lists for an IVF index over num_vectors vectors.
+
+    :param num_vectors: Number of vectors indexed.
+    :return: Number of lists, or 0 if there are too few vectors to train any.
+    """
+    return min(int(IVF_LISTS_PER_SQRT * math.sqrt(num_vectors)), num_vectors // IVF_MIN_POINTS_PER_LIST)
+
+
+def build_vector_index(embeddings: np.ndarray, index_type: str):
+    """
+    Build an inner product FAISS index over L2-normalized embeddings.
+
+    :param embeddings: Normalized float32 embeddings, one row per exercise.
+    :param index_type: One of INDEX_TYPES.
+    :return: FAISS index with the embeddings added, configured for searching.
+    """
+    dimension = embeddings.shape[1]
+    if index_type == INDEX_TYPE_FLAT:
+        index = faiss.IndexFlatIP(dimension)
+    elif index_type == INDEX_TYPE_HNSW:
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif index_type == INDEX_TYPE_IVF:
+        lists = ivf_list_count(len(embeddings))
+        if lists < 2:
+            logging.info(f"Only {len(embeddings)} exercises, too few to train an IVF index; using a flat index")
+            index = faiss.IndexFlatIP(dimension)
+        else:
+            quantizer = faiss.IndexFlatIP(dimension)
+            index = faiss.IndexIVFFlat(quantizer, dimension, lists, faiss.METRIC_INNER_PRODUCT)
+            index.train(embeddings)
+    else:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+    index.add(embeddings)
+    configure_search(index)
+    return index
+
+
+def configure_search(index) -> None:
+    """
+    Set the search-time parameters of an approximate index, which are not all persisted with it.
+
+    :param index: FAISS index built by build_vector_index or read back from disk.
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(IVF_NPROBE, index.nlist)
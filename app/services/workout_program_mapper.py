@@ -1,9 +1,11 @@
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any
 from datetime import datetime
 import json
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from app.services.exercise_matcher import ExerciseMatcher
+from app.services.tracing import tracer
+
+if TYPE_CHECKING:
+    from app.services.exercise_matcher import ExerciseMatcher
 
 class WorkoutProgramMapper:
     def __init__(self, exercise_matcher: "ExerciseMatcher"):
@@ -13,21 +15,7 @@ class WorkoutProgramMapper:
         try:
             # logging.critical(f" exercises : {exercises}")
             matched_exercises = self.exercise_matcher.match_exercises(exercises)
-            time_now = datetime.now().isoformat()
-            return {
-                "workout": {
-                    "id": None,
-                    "title": f'{week}-{day_name}',
-                    "description": "",
-                    "note": "",
-                    "color": "#1A118F",
-                    "picture": "",
-                    "user_id": None,
-                    "create_date": time_now,
-                    "update_date": time_now,
-                    "exercises": matched_exercises
-                }
-            }
+            return self.build_workout(week, day_name, matched_exercises)
         except Exception as e:
             logging.error(
                 f"Error processing day '{week}-{day_name}' with exercises: {exercises}. Exception: {str(e)}",
@@ -35,30 +23,29 @@ class WorkoutProgramMapper:
             )
             raise
 
+    @staticmethod
+    def build_workout(week: str, day_name: str, matched_exercises: List[Dict[str, Any]]) -> Dict[str, Any]:
+        time_now = datetime.now().isoformat()
+        return {
+            "workout": {
+                "id": None,
+                "title": f'{week}-{day_name}',
+                "description": "",
+                "note": "",
+                "color": "#1A118F",
+                "picture": "",
+                "user_id": None,
+                "create_date": time_now,
+                "update_date": time_now,
+                "exercises": matched_exercises
+            }
+        }
+
     def read_workout_json(self, file_path: str) -> List[Dict[str, Any]]:
         try:
             with open(file_path, 'r') as file:
                 data = json.load(file)
-
-            structured_workouts = []
-            with ThreadPoolExecutor() as executor:
-                futures = []
-                for week in data["weeks"]:
-                    for day in week["days"]:
-                        
-                        if day["exercises"] == "":
-                            continue
-                        futures.append(
-                            executor.submit(self.process_day, week['week'], day['day'], day["exercises"])
-                        )
-
-                for future in as_completed(futures):
-                    try:
-                        structured_workouts.append(future.result())
-                    except Exception as e:
-                        logging.error(f"Error in processing a workout day from the thread pool: {e}", exc_info=True)
-                        raise
-            return structured_workouts
+            return self.map_workout_data(data)
         except FileNotFoundError:
             logging.error(f"File not found: {file_path}", exc_info=True)
             raise
@@ -69,3 +56,24 @@ class WorkoutProgramMapper:
             logging.error(f"Unexpected error while reading workout JSON: {e}", exc_info=True)
             raise
 
+    def map_workout_data(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        days = []
+        for week in data["weeks"]:
+            for day in week["days"]:
+                
+                if day["exercises"] == "":
+                    continue
+                days.append((week['week'], day['day'], day["exercises"]))
+
+        try:
+            # One batched match for the whole program instead of one per day
+            with tracer.span("match", weeks=sorted({week for week, _, _ in days}), days=len(days),
+                             exercises=sum(len(exercises) for _, _, exercises in days)):
+                matched_days = self.exercise_matcher.match_program([exercises for _, _, exercises in days])
+        except Exception as e:
+            logging.error(f"Error matching exercises for {len(days)} workout days: {e}", exc_info=True)
+            raise
+        return [
+            self.build_workout(week, day_name, matched_exercises)
+            for (week, day_name, _), matched_exercises in zip(days, matched_days)
+        ]
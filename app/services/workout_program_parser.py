@@ -1,22 +1,40 @@
+import time
 import logging
 import traceback
 import os
-from typing import Any
+import threading
+import contextvars
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 from app.services.lyfta_api_service import APIClient
-from app.services.exercise_matcher import ExerciseMatcher
+from app.services.upload_journal import UploadJournal
+from app.services.tracing import tracer
 from app.services.llm_service import LLMService
 from app.services.workout_program_mapper import WorkoutProgramMapper
-from app.constants import EXERCISE_DB_PATH
+from app.constants import EXERCISE_DB_PATH, LYFTA_WORKOUT_CONCURRENCY
 from concurrent.futures import ThreadPoolExecutor
+
+if TYPE_CHECKING:
+    # Imported where used: httpx and the matcher's numerical libraries are slow to import
+    from app.services.async_upload_engine import AsyncUploadEngine
 class WorkoutProgramParser:
-    def __init__(self, input_file_path, tmp_dir_path):
+    def __init__(self, input_file_path, tmp_dir_path, llm_service: LLMService = None, api_client: APIClient = None, upload_engine: "AsyncUploadEngine" = None, journal: UploadJournal = None, program_key: str = None):
         self.excel_file_path = input_file_path
         self.dir_path=tmp_dir_path
         self.csv_file_path = os.path.join(tmp_dir_path,'output.csv')
-        self.llm_service = LLMService()
+        self.llm_service = llm_service or LLMService()
+        # Shared by all weeks so upload threads reuse pooled connections
+        self.api_client = api_client or APIClient()
+        # When set, uploads go through the shared asyncio engine instead of api_client
+        self.upload_engine = upload_engine
+        # Records created collections and workouts under program_key so interrupted imports can resume
+        self.journal = journal
+        self.program_key = program_key
+        # perf_counter time at which the first workout finished uploading
+        self.first_upload_at: Optional[float] = None
+        self._first_upload_lock = threading.Lock()
 
     def process_week(self, week_number: int, cookie: str, exercise_matcher: Any) -> None:
-        """Process a single week and save the output as a JSON file."""
+        """Process a single week from its saved JSON file and upload it."""
         try:
             output_file_path = os.path.join(self.dir_path, f'result-{week_number}.json')
 
@@ -26,29 +44,122 @@ class WorkoutProgramParser:
             #     json_file.write(response)
             workout_processor = WorkoutProgramMapper(exercise_matcher)
             structured_workouts = workout_processor.read_workout_json(output_file_path)
-        
-            api_client = APIClient()
-            # Create a collection for the week
-            collection_name = f"Week {week_number}"
-            collection_id, user_id = api_client.create_collection(collection_name, week_number, cookie)
-
-            # Send workouts to the API, associating them with the created collection
-
-            formatted_workouts = self.format_workout_data(structured_workouts)
-            
-            # Create the final payload
-
-            for workout in formatted_workouts:
-                api_client.create_workout_in_collection(workout, collection_id, user_id, collection_name, cookie)
+            self.upload_week(week_number, structured_workouts, cookie)
+        except Exception as e:
+            logging.error(f"Error processing week {week_number}: {e}")
+            logging.error(traceback.format_exc())
+            raise
 
-            logging.info(f'Processed Week {week_number}')
+    def process_week_data(self, week_number: int, data: Dict[str, Any], cookie: str, exercise_matcher: Any) -> None:
+        """Process a single week from its in-memory WorkoutProgram JSON and upload it."""
+        try:
+            workout_processor = WorkoutProgramMapper(exercise_matcher)
+            structured_workouts = workout_processor.map_workout_data(data)
+            self.upload_week(week_number, structured_workouts, cookie)
         except Exception as e:
             logging.error(f"Error processing week {week_number}: {e}")
             logging.error(traceback.format_exc())
             raise
 
+    def upload_week(self, week_number: int, structured_workouts: List[Dict[str, Any]], cookie: str) -> None:
+        """Create the week's collection in Lyfta and upload its workouts into it."""
+        with tracer.span("format", week=week_number, workouts=len(structured_workouts)):
+            formatted_workouts = self.format_workout_data(structured_workouts)
+        if self.upload_engine is not None:
+            self.upload_engine.submit_week(week_number, formatted_workouts, cookie, self.journal, self.program_key).result()
+            # The engine reports the week as a whole, so its first workout counts as uploaded with the week
+            self._workout_uploaded()
+            return
+
+        collection = self.open_collection(week_number, cookie)
+        # Workouts are independent of each other, so their round-trips overlap.
+        with ThreadPoolExecutor(max_workers=LYFTA_WORKOUT_CONCURRENCY) as executor:
+            # Each upload runs in a copy of this context so its spans nest under the current week
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._upload_workout, week_number, position, workout, collection, cookie)
+                for position, workout in enumerate(formatted_workouts)
+            ]
+            for future in futures:
+                future.result()
+
+        self.complete_week(week_number)
+
+    def open_collection(self, week_number: int, cookie: str) -> Tuple[str, str]:
+        """Create a collection for the week, unless an earlier run already did, and return its ID and the user ID."""
+        if self.upload_engine is not None:
+            return self.upload_engine.submit_collection(week_number, cookie, self.journal, self.program_key).result()
+        journal = self.journal
+        collection_name = f"Week {week_number}"
+        collection = journal.get_collection(self.program_key, week_number) if journal else None
+        if collection:
+            collection_id, user_id = collection
+            logging.info(f"Reusing collection '{collection_name}' with ID {collection_id}")
+            return collection_id, user_id
+        collection_id, user_id = self.api_client.create_collection(collection_name, week_number, cookie)
+        if journal:
+            journal.record_collection(self.program_key, week_number, collection_id, user_id)
+        return collection_id, user_id
+
+    def upload_day(self, week_number: int, position: int, structured_workout: Dict[str, Any], collection: Tuple[str, str], cookie: str) -> None:
+        """
+        Upload one workout into a collection returned by open_collection.
+
+        :param week_number: Week the workout belongs to.
+        :param position: Position of the workout within its week, as in upload_week; part of its journal key.
+        :param structured_workout: Workout as built by WorkoutProgramMapper.
+        :param collection: Collection ID and user ID of the week.
+        :param cookie: Cookie for the Lyfta account.
+        """
+        with tracer.span("format", week=week_number, workouts=1):
+            workout = self.format_workout_data([structured_workout])[0]
+        if self.upload_engine is not None:
+            self.upload_engine.submit_workout(week_number, position, workout, collection, cookie, self.journal, self.program_key).result()
+            self._workout_uploaded()
+            return
+        self._upload_workout(week_number, position, workout, collection, cookie)
+
+    def complete_week(self, week_number: int) -> None:
+        """Mark the week as fully uploaded in the journal."""
+        if self.journal:
+            self.journal.complete_week(self.program_key, week_number)
+        logging.info(f'Processed Week {week_number}')
+
+    def _upload_workout(self, week_number: int, position: int, workout: Dict[str, Any], collection: Tuple[str, str], cookie: str) -> None:
+        """Send a formatted workout to the API, associating it with the week's collection."""
+        api_client = self.api_client
+        journal = self.journal
+        collection_id, user_id = collection
+        collection_name = f"Week {week_number}"
+        if not journal:
+            api_client.create_workout_in_collection(workout, collection_id, user_id, collection_name, cookie)
+            self._workout_uploaded()
+            return
+        workout_key = journal.workout_key(position, workout["title"])
+        recorded = journal.get_workout(self.program_key, week_number, workout_key)
+        if recorded and recorded[1]:
+            logging.info(f"Skipping already uploaded workout '{workout['title']}'")
+            return
+        if recorded:
+            workout_id = recorded[0]
+            api_client.save_workout(workout, workout_id, user_id, cookie)
+        else:
+            workout_id = api_client.create_workout(
+                workout, collection_id, user_id, collection_name, cookie,
+                on_created=lambda created_id: journal.record_workout(self.program_key, week_number, workout_key, created_id, completed=False),
+            )
+        journal.record_workout(self.program_key, week_number, workout_key, workout_id, completed=True)
+        self._workout_uploaded()
+
+    def _workout_uploaded(self) -> None:
+        if self.first_upload_at is None:
+            with self._first_upload_lock:
+                if self.first_upload_at is None:
+                    self.first_upload_at = time.perf_counter()
+
     def parallel_process(self, num_weeks: int, cookie: str) -> None:
         """Process multiple weeks in parallel using ThreadPoolExecutor."""
+        from app.services.exercise_matcher import ExerciseMatcher
+
         exercise_matcher = ExerciseMatcher(EXERCISE_DB_PATH)
         try:
             with ThreadPoolExecutor() as executor:
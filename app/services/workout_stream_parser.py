@@ -0,0 +1,214 @@
+import re
+import json
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# Characters that change the parser state outside and inside strings
+STRUCTURAL_PATTERN = re.compile(r'[{}\[\]",:]')
+STRING_PATTERN = re.compile(r'["\\]')
+
+# Roles of the containers the parser tracks in a WorkoutProgram document
+ROLE_ROOT = "root"
+ROLE_WEEKS = "weeks"
+ROLE_WEEK = "week"
+ROLE_DAYS = "days"
+ROLE_DAY = "day"
+ROLE_OTHER = None
+
+
+class _Frame:
+    """An open JSON object or array."""
+
+    __slots__ = ("role", "is_object", "key", "expect_key", "start", "index", "label", "pending_days", "days")
+
+    def __init__(self, role: Optional[str], is_object: bool, start: int, index: int = 0):
+        self.role = role
+        self.is_object = is_object
+        # Last key read in an object, and whether the next string is a key
+        self.key: Optional[str] = None
+        self.expect_key = is_object
+        self.start = start
+        # Position of a week among the weeks, or the number of children opened in an array
+        self.index = index
+        # For a week: its "week" value, and its days read before that value
+        self.label: Optional[str] = None
+        self.pending_days: List[Tuple[int, Dict[str, Any]]] = []
+        self.days = 0
+
+
+class WorkoutStreamParser:
+    """
+    Parses a WorkoutProgram JSON response as it is generated and emits each day once it is complete.
+
+    Text is fed in arbitrary chunks. As soon as the closing brace of an
+    object in weeks[i].days arrives, that day is decoded and passed to
+    on_day with its week's "week" value; days generated before that value
+    are held back until it, or the end of their week, arrives. Only the
+    structure is tracked, and only the text of the open day or string is
+    kept, so the cost is linear in the response length.
+    """
+
+    def __init__(self, on_day: Callable[[Optional[str], Dict[str, Any]], None]):
+        """
+        Initialize the WorkoutStreamParser.
+
+        :param on_day: Called with the week label (None if the week has none) and the decoded day.
+        """
+        self.on_day = on_day
+        # (week index, day index) of every day emitted, kept across resets
+        self._emitted: Set[Tuple[int, int]] = set()
+        self.reset()
+
+    def reset(self) -> None:
+        """Start over on a new response, e.g. a retried call; days already emitted are not emitted again."""
+        # Unparsed text plus the text of the open day or string, which starts at _offset in the response
+        self._buffer = ""
+        self._offset = 0
+        self._position = 0
+        self._stack: List[_Frame] = []
+        self._string_start: Optional[int] = None
+        self._escaped = False
+        self._weeks_seen = 0
+
+    @property
+    def days_emitted(self) -> int:
+        return len(self._emitted)
+
+    def feed(self, chunk: str) -> None:
+        """
+        Parse the next chunk of the response.
+
+        :param chunk: Text following everything fed so far.
+        """
+        self._buffer += chunk
+        text = self._buffer
+        offset = self._offset
+        # Positions are relative to the response, not the buffer
+        position = self._position
+        end = offset + len(text)
+        while position < end:
+            if self._string_start is not None:
+                if self._escaped:
+                    self._escaped = False
+                    position += 1
+                    continue
+                match = STRING_PATTERN.search(text, position - offset)
+                if match is None:
+                    position = end
+                    break
+                position = offset + match.start()
+                if text[position - offset] == "\\":
+                    self._escaped = True
+                else:
+                    self._end_string(position)
+                position += 1
+                continue
+
+            match = STRUCTURAL_PATTERN.search(text, position - offset)
+            if match is None:
+                position = end
+                break
+            position = offset + match.start()
+            self._structural(text[position - offset], position)
+            position += 1
+        self._position = position
+        self._trim()
+
+    def _trim(self) -> None:
+        """Drop the parsed text that no open day or string will be read from."""
+        keep = self._position
+        if self._string_start is not None:
+            keep = min(keep, self._string_start)
+        for frame in self._stack:
+            if frame.role == ROLE_DAY:
+                keep = min(keep, frame.start)
+                break
+        if keep > self._offset:
+            self._buffer = self._buffer[keep - self._offset:]
+            self._offset = keep
+
+    def _slice(self, start: int, end: int) -> str:
+        """Return the response text from start up to, but excluding, end."""
+        return self._buffer[start - self._offset:end - self._offset]
+
+    def _structural(self, character: str, position: int) -> None:
+        top = self._stack[-1] if self._stack else None
+        if character == '"':
+            self._string_start = position
+        elif character == ":":
+            if top is not None and top.is_object:
+                top.expect_key = False
+        elif character == ",":
+            if top is not None and top.is_object:
+                top.expect_key = True
+        elif character in "{[":
+            self._open(character == "{", position, top)
+        else:
+            self._close(position)
+
+    def _open(self, is_object: bool, position: int, parent: Optional[_Frame]) -> None:
+        role = ROLE_OTHER
+        index = 0
+        if parent is None:
+            role = ROLE_ROOT if is_object else ROLE_OTHER
+        elif parent.is_object:
+            if parent.role == ROLE_ROOT and parent.key == "weeks" and not is_object:
+                role = ROLE_WEEKS
+            elif parent.role == ROLE_WEEK and parent.key == "days" and not is_object:
+                role = ROLE_DAYS
+        else:
+            index = parent.index
+            parent.index += 1
+            if parent.role == ROLE_WEEKS and is_object:
+                role = ROLE_WEEK
+                index = self._weeks_seen
+                self._weeks_seen += 1
+            elif parent.role == ROLE_DAYS and is_object:
+                role = ROLE_DAY
+        self._stack.append(_Frame(role, is_object, position, index))
+
+    def _close(self, position: int) -> None:
+        if not self._stack:
+            return
+        frame = self._stack.pop()
+        if frame.role == ROLE_DAY:
+            week = self._current_week()
+            if week is None:
+                return
+            day = json.loads(self._slice(frame.start, position + 1))
+            key = (week.index, week.days)
+            week.days += 1
+            if week.label is None:
+                week.pending_days.append((key, day))
+            else:
+                self._emit(key, week.label, day)
+        elif frame.role == ROLE_WEEK:
+            self._flush(frame)
+
+    def _end_string(self, position: int) -> None:
+        start = self._string_start
+        self._string_start = None
+        top = self._stack[-1] if self._stack else None
+        if top is None or not top.is_object:
+            return
+        if top.expect_key:
+            top.key = json.loads(self._slice(start, position + 1))
+        elif top.role == ROLE_WEEK and top.key == "week":
+            top.label = json.loads(self._slice(start, position + 1))
+            self._flush(top)
+
+    def _current_week(self) -> Optional[_Frame]:
+        for frame in reversed(self._stack):
+            if frame.role == ROLE_WEEK:
+                return frame
+        return None
+
+    def _flush(self, week: _Frame) -> None:
+        pending, week.pending_days = week.pending_days, []
+        for key, day in pending:
+            self._emit(key, week.label, day)
+
+    def _emit(self, key: Tuple[int, int], label: Optional[str], day: Dict[str, Any]) -> None:
+        if key in self._emitted:
+            return
+        self._emitted.add(key)
+        self.on_day(label, day)
@@ -0,0 +1,16 @@
+import hashlib
+
+
+def compute_file_hash(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 hex digest of a file's content.
+
+    :param file_path: Path to the file to hash.
+    :param chunk_size: Number of bytes read per iteration.
+    :return: Hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
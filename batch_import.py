@@ -0,0 +1,73 @@
+from app.cli import StartupProfiler, add_import_arguments, build_llm_service, export_traces, validate_import_arguments
+import sys
+import json
+import logging
+import argparse
+
+startup = StartupProfiler()
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s')
+
+parser = argparse.ArgumentParser(description="Import several workout files, sharing the exercise matcher, HTTP pool and LLM quota")
+parser.add_argument("inputs", nargs="*", help="Workout files, or directories whose .xlsx, .xls, .pdf, .txt and .csv files are imported")
+parser.add_argument("--manifest", metavar="FILE", help="JSON list of file paths, or of {\"file_path\", \"lyfta_cookie\"} objects for imports into different accounts")
+parser.add_argument("--lyfta-cookie", help="Cookie for your lyfta account; used for every file without its own cookie")
+parser.add_argument("--max-concurrent-files", type=int, default=2, help="Files imported at the same time (default: 2)")
+parser.add_argument("--upload-workers", type=int, help="Weeks uploaded concurrently across all files (default: min(32, CPUs + 4))")
+parser.add_argument("--report", metavar="FILE", help="Write the outcome of every file to FILE as JSON")
+add_import_arguments(parser)
+
+with startup.phase("parse_args"):
+    args = parser.parse_args()
+    validate_import_arguments(parser, args)
+    if not args.inputs and not args.manifest:
+        parser.error("give workout files, directories or --manifest")
+    if args.inputs and not args.lyfta_cookie:
+        parser.error("--lyfta-cookie is required for files given on the command line")
+if args.profile_startup:
+    startup.enable()
+
+# Imported only after the arguments are valid; the services pull in heavy dependencies
+with startup.phase("imports"):
+    from app.services.batch_importer import BatchImporter, STATUS_SUCCEEDED
+    from app.services.upload_journal import UploadJournal
+
+jobs = [(file_path, args.lyfta_cookie) for file_path in BatchImporter.collect_inputs(args.inputs)]
+if args.manifest:
+    try:
+        jobs += BatchImporter.read_manifest(args.manifest, args.lyfta_cookie)
+    except (OSError, ValueError) as e:
+        parser.error(f"invalid manifest {args.manifest}: {e}")
+if not jobs:
+    parser.error("no workout files found")
+logging.info(f"Importing {len(jobs)} files, {args.max_concurrent_files} at a time")
+
+with startup.phase("llm_service"):
+    llm_service = build_llm_service(args)
+importer = BatchImporter(
+    llm_service,
+    max_concurrent_files=args.max_concurrent_files,
+    upload_workers=args.upload_workers,
+    multi_week=args.multi_week,
+    stream_llm=args.stream_llm,
+    async_upload=args.async_upload,
+    upload_mode=args.upload_mode,
+    journal=UploadJournal(),
+    resume=args.resume,
+    intermediate_dir=args.save_intermediate,
+)
+if args.profile_startup:
+    startup.log_report()
+try:
+    results = importer.run(jobs)
+finally:
+    importer.close()
+    export_traces(args)
+
+failed = [result for result in results if result.status != STATUS_SUCCEEDED]
+logging.info(f"Imported {len(results) - len(failed)} of {len(results)} files completely")
+for result in failed:
+    logging.warning(f"{result.file_path}: {result.status}" + (f" ({result.error})" if result.error else f", failed weeks {result.failed_weeks}"))
+if args.report:
+    with open(args.report, "w") as f:
+        json.dump([result.to_dict() for result in results], f, indent=2)
+sys.exit(1 if failed else 0)
@@ -0,0 +1,137 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+from typing import Any, Dict, List
+
+from app.constants import EMBEDDING_MODEL_NAME, EXERCISE_DB_PATH, ONNX_EMBEDDING_DIR
+from app.services.embedding_backends import (
+    EMBEDDING_BACKEND_ONNX,
+    EMBEDDING_BACKEND_SENTENCE_TRANSFORMERS,
+    OnnxEmbeddingBackend,
+    SentenceTransformerBackend,
+)
+from benchmarks.synthetic_program import exercise_names
+
+DEFAULT_MIN_AGREEMENT = 0.98
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def normalize_name(text: str) -> str:
+    """Normalize a name the way ExerciseMatcher does before embedding it."""
+    return re.sub(r'[^a-zA-Z0-9 ]', '', text.lower()).strip()
+
+
+def measure_backend(backend_name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Load one backend, embed the database and the queries, and find each query's top-1 database exercise.
+
+    Run in a fresh process per backend, so load time and peak memory include its imports.
+
+    :param backend_name: EMBEDDING_BACKEND_SENTENCE_TRANSFORMERS or EMBEDDING_BACKEND_ONNX.
+    :param args: Parsed command-line options.
+    :return: Timings, peak RSS and the top-1 database index per query.
+    """
+    start = time.perf_counter()
+    if backend_name == EMBEDDING_BACKEND_ONNX:
+        backend = OnnxEmbeddingBackend(args.onnx_dir)
+    else:
+        backend = SentenceTransformerBackend(args.model)
+    backend.load()
+    load_s = time.perf_counter() - start
+
+    with open(args.exercise_db, "r") as f:
+        database_names = [normalize_name(exercise["name"]) for exercise in json.load(f)]
+    queries = [normalize_name(name) for name in exercise_names(args.exercise_db, args.queries, args.seed)]
+
+    start = time.perf_counter()
+    database_embeddings = backend.encode(database_names)
+    index_build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    query_embeddings = backend.encode(queries)
+    batch_s = time.perf_counter() - start
+    # One name per call, as when a single week needs one semantic match
+    single = queries[:args.single_queries]
+    start = time.perf_counter()
+    for query in single:
+        backend.encode([query])
+    single_s = (time.perf_counter() - start) / max(1, len(single))
+
+    scores = query_embeddings @ database_embeddings.T
+    return {
+        "backend": backend.name,
+        "load_s": load_s,
+        "index_build_s": index_build_s,
+        "batch_per_name_s": batch_s / max(1, len(queries)),
+        "single_name_s": single_s,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "torch_imported": "torch" in sys.modules,
+        "top1": scores.argmax(axis=1).tolist(),
+        "queries": queries,
+    }
+
+
+def run_worker(backend_name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run measure_backend for one backend in a fresh interpreter."""
+    command = [
+        sys.executable, "-m", "benchmarks.embedding_parity", "--worker", backend_name,
+        "--exercise-db", args.exercise_db, "--model", args.model, "--onnx-dir", args.onnx_dir,
+        "--queries", str(args.queries), "--single-queries", str(args.single_queries), "--seed", str(args.seed),
+    ]
+    output = subprocess.run(command, cwd=REPO_ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check that the ONNX embedding backend matches the sentence-transformers model, and compare their cost")
+    parser.add_argument("--exercise-db", default=EXERCISE_DB_PATH, help="Exercise database JSON file")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="sentence-transformers model the ONNX export was made from")
+    parser.add_argument("--onnx-dir", default=ONNX_EMBEDDING_DIR, help="Directory written by python -m app.services.embedding_backends")
+    parser.add_argument("--queries", type=int, default=1000, help="Exercise names matched against the database (default: 1000)")
+    parser.add_argument("--single-queries", type=int, default=100, help="Names embedded one per call for the single-name latency (default: 100)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-agreement", type=float, default=DEFAULT_MIN_AGREEMENT, help="Minimum share of queries with the same top-1 exercise (default: 0.98)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--worker", choices=[EMBEDDING_BACKEND_SENTENCE_TRANSFORMERS, EMBEDDING_BACKEND_ONNX], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.exercise_db = os.path.abspath(args.exercise_db)
+    args.onnx_dir = os.path.abspath(args.onnx_dir)
+
+    if args.worker:
+        print(json.dumps(measure_backend(args.worker, args)))
+        return 0
+
+    results = {name: run_worker(name, args) for name in (EMBEDDING_BACKEND_SENTENCE_TRANSFORMERS, EMBEDDING_BACKEND_ONNX)}
+    reference = results[EMBEDDING_BACKEND_SENTENCE_TRANSFORMERS]
+    candidate = results[EMBEDDING_BACKEND_ONNX]
+    mismatches: List[str] = [
+        query for query, expected, actual in zip(reference["queries"], reference["top1"], candidate["top1"]) if expected != actual
+    ]
+    agreement = 1 - len(mismatches) / max(1, len(reference["queries"]))
+
+    metrics = ["load_s", "index_build_s", "batch_per_name_s", "single_name_s", "peak_rss_mb"]
+    print(f"{'':20} {'sentence-transformers':>22} {'onnx int8':>12} {'ratio':>8}")
+    for metric in metrics:
+        before, after = reference[metric], candidate[metric]
+        print(f"{metric:20} {before:22.4f} {after:12.4f} {after / before if before else float('inf'):8.2f}")
+    print(f"{'torch_imported':20} {str(reference['torch_imported']):>22} {str(candidate['torch_imported']):>12}")
+    print(f"top-1 agreement: {agreement:.2%} over {len(reference['queries'])} queries")
+    for query in mismatches[:10]:
+        print(f"  differs: {query}")
+
+    if args.output:
+        report = {name: {key: value for key, value in result.items() if key not in ("top1", "queries")} for name, result in results.items()}
+        report["top1_agreement"] = agreement
+        report["mismatches"] = mismatches
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if agreement >= args.min_agreement else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
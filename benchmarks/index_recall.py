@@ -0,0 +1,125 @@
+import sys
+import json
+import time
+import argparse
+import statistics
+from typing import Any, Dict, List
+
+import faiss
+import numpy as np
+
+from app.constants import EXERCISE_DB_PATH
+from app.services.embedding_backends import build_embedding_backend
+from app.services.vector_index import INDEX_TYPE_FLAT, INDEX_TYPES, build_vector_index, normalize_embeddings
+from benchmarks.embedding_parity import normalize_name
+from benchmarks.synthetic_program import exercise_names
+
+DEFAULT_LATENCY_BUDGET_MS = 1.0
+DEFAULT_MIN_RECALL = 0.95
+
+
+def pad_catalog(embeddings: np.ndarray, size: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Grow a catalog to size entries with noisy copies of its embeddings.
+
+    The copies stand in for merged custom exercises and extra catalogs, which
+    are mostly near-duplicates of names already in the database.
+
+    :param embeddings: Normalized embeddings of the database.
+    :param size: Number of entries wanted.
+    :param noise: Standard deviation of the Gaussian noise added to each copy.
+    :param rng: Random generator.
+    :return: Normalized embeddings, the database first.
+    """
+    extra = max(0, size - len(embeddings))
+    copies = embeddings[rng.integers(len(embeddings), size=extra)] + rng.normal(0, noise, (extra, embeddings.shape[1]))
+    return normalize_embeddings(np.concatenate([embeddings, copies]))
+
+
+def measure_index(index_type: str, catalog: np.ndarray, queries: np.ndarray, truth: np.ndarray, top_k: int) -> Dict[str, Any]:
+    """
+    Build one index type over a catalog and measure its build time, query latency and recall against exact search.
+
+    :param index_type: One of vector_index.INDEX_TYPES.
+    :param catalog: Normalized catalog embeddings.
+    :param queries: Normalized query embeddings.
+    :param truth: Top-k neighbours of every query found by exact search.
+    :param top_k: Neighbours retrieved per query.
+    :return: Timings and recall.
+    """
+    start = time.perf_counter()
+    index = build_vector_index(catalog, index_type)
+    build_s = time.perf_counter() - start
+
+    # One query per search call, as when a single week needs one semantic match
+    latencies = []
+    for row in range(len(queries)):
+        start = time.perf_counter()
+        index.search(queries[row:row + 1], top_k)
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    _, found = index.search(queries, top_k)
+    batch_s = time.perf_counter() - start
+
+    return {
+        "build_s": build_s,
+        "query_ms": statistics.mean(latencies) * 1000,
+        "query_p99_ms": sorted(latencies)[int(0.99 * (len(latencies) - 1))] * 1000,
+        "batch_per_query_ms": batch_s / len(queries) * 1000,
+        "recall_at_1": float(np.mean(found[:, 0] == truth[:, 0])),
+        f"recall_at_{top_k}": float(np.mean([len(set(f) & set(t)) / top_k for f, t in zip(found.tolist(), truth.tolist())])),
+        "index_mb": faiss.serialize_index(index).nbytes / 2 ** 20,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare the recall and query latency of the approximate exercise index types with exact search")
+    parser.add_argument("--exercise-db", default=EXERCISE_DB_PATH, help="Exercise database JSON file")
+    parser.add_argument("--catalog-sizes", default="2000,20000,50000", help="Comma-separated catalog sizes; the database is padded with noisy copies (default: 2000,20000,50000)")
+    parser.add_argument("--index-types", default=",".join(INDEX_TYPES), help=f"Comma-separated index types (default: {','.join(INDEX_TYPES)})")
+    parser.add_argument("--queries", type=int, default=1000, help="Exercise names searched per catalog (default: 1000)")
+    parser.add_argument("--top-k", type=int, default=5, help="Neighbours retrieved per query (default: 5)")
+    parser.add_argument("--noise", type=float, default=0.05, help="Noise added to the padding copies (default: 0.05)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-budget-ms", type=float, default=DEFAULT_LATENCY_BUDGET_MS, help="Maximum mean milliseconds per single-query search (default: 1.0)")
+    parser.add_argument("--min-recall", type=float, default=DEFAULT_MIN_RECALL, help="Minimum recall@1 of the approximate index types (default: 0.95)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    # Embedded once with the backend selected by EMBEDDING_BACKEND; only the indexes differ between runs
+    backend = build_embedding_backend()
+    with open(args.exercise_db, "r") as f:
+        database = normalize_embeddings(backend.encode([normalize_name(exercise["name"]) for exercise in json.load(f)]))
+    queries = normalize_embeddings(backend.encode([normalize_name(name) for name in exercise_names(args.exercise_db, args.queries, args.seed)]))
+    rng = np.random.default_rng(args.seed)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    violations: List[str] = []
+    print(f"{'size':>7} {'index':6} {'build_s':>9} {'query_ms':>9} {'p99_ms':>8} {'batch_ms':>9} {'recall@1':>9} {f'recall@{args.top_k}':>9} {'MB':>7}")
+    for size in (int(size) for size in args.catalog_sizes.split(",")):
+        catalog = pad_catalog(database, size, args.noise, rng)
+        exact = faiss.IndexFlatIP(catalog.shape[1])
+        exact.add(catalog)
+        _, truth = exact.search(queries, args.top_k)
+        for index_type in args.index_types.split(","):
+            result = measure_index(index_type, catalog, queries, truth, args.top_k)
+            results[f"{size}.{index_type}"] = result
+            print(
+                f"{len(catalog):7} {index_type:6} {result['build_s']:9.3f} {result['query_ms']:9.4f} {result['query_p99_ms']:8.4f} "
+                f"{result['batch_per_query_ms']:9.4f} {result['recall_at_1']:9.3f} {result[f'recall_at_{args.top_k}']:9.3f} {result['index_mb']:7.1f}"
+            )
+            if index_type != INDEX_TYPE_FLAT and result["recall_at_1"] < args.min_recall:
+                violations.append(f"{index_type} at {len(catalog)} entries: recall@1 {result['recall_at_1']:.3f} < {args.min_recall:.3f}")
+            if index_type != INDEX_TYPE_FLAT and result["query_ms"] > args.latency_budget_ms:
+                violations.append(f"{index_type} at {len(catalog)} entries: {result['query_ms']:.3f}ms per query > {args.latency_budget_ms:.3f}ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"backend": backend.name, "args": vars(args), "results": results}, f, indent=2)
+    for violation in violations:
+        print(f"  {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.constants import EXERCISE_DB_PATH
+from app.services.document_extractor import DocumentExtractor
+from app.services.exercise_matcher import ExerciseMatcher
+from app.services.llm_backends import ReplayBackend
+from app.services.llm_service import LLMService
+from app.services.lyfta_api_service import APIClient, UPLOAD_MODES, UPLOAD_MODE_TWO_STEP
+from app.services.lyfta_mock_server import LyftaMockServer
+from app.services.workout_program_mapper import WorkoutProgramMapper
+from app.services.workout_program_parser import WorkoutProgramParser
+from benchmarks.synthetic_program import exercise_names, write_program
+
+# Timings below this many seconds are never reported as regressions, however
+# large the relative change, because they are dominated by noise.
+DEFAULT_MIN_DELTA = 0.005
+DEFAULT_THRESHOLD = 0.25
+# Cold-start budgets, in seconds, for `main.py --help` and for importing the
+# import pipeline as a text-file import does
+DEFAULT_HELP_BUDGET = 0.5
+DEFAULT_IMPORT_BUDGET = 1.0
+# Modules only the code paths that need them may import
+HEAVY_MODULES = ("pandas", "pdfplumber", "google.genai", "faiss", "fuzzywuzzy", "torch", "sentence_transformers", "onnxruntime", "httpx")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(function: Callable[[], Any], repeat: int = 1) -> Tuple[float, Any]:
+    """
+    Run a function several times.
+
+    :param function: Function to time.
+    :param repeat: Number of runs.
+    :return: Median wall time in seconds and the result of the last run.
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), result
+
+
+def reset_matcher_caches() -> None:
+    """Drop the process-level indexes, so the next matcher starts cold."""
+    ExerciseMatcher._faiss_indexes.clear()
+    ExerciseMatcher._alias_index = None
+
+
+def bench_startup(repeat: int) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Time cold starts in fresh interpreters and list heavy modules imported before they are needed.
+
+    :param repeat: Runs per timing.
+    :return: Timings, and the HEAVY_MODULES loaded by importing the import pipeline and building the LLM service.
+    """
+    def run(*command: str) -> Callable[[], str]:
+        return lambda: subprocess.run(
+            [sys.executable, *command], cwd=REPO_ROOT, check=True, capture_output=True, text=True
+        ).stdout
+
+    help_s, _ = timed(run("main.py", "--help"), repeat)
+    import_s, _ = timed(run("-c", "import app.services.import_pipeline"), repeat)
+    check = (
+        "import sys, argparse\n"
+        "from app.cli import add_import_arguments, build_llm_service\n"
+        "import app.services.import_pipeline\n"
+        "parser = argparse.ArgumentParser(); add_import_arguments(parser)\n"
+        "build_llm_service(parser.parse_args(['--llm-backend', 'replay', '--replay-dir', '.', '--no-llm-cache']))\n"
+        f"print(' '.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))\n"
+    )
+    eager_modules = run("-c", check)().split()
+    return {"help_s": help_s, "pipeline_import_s": import_s, "eager_heavy_modules": len(eager_modules)}, eager_modules
+
+
+def bench_matcher(exercise_db_path: str, names: List[str]) -> Dict[str, Any]:
+    """Time matcher startup, the first semantic match (model and index load) and warm per-exercise matching."""
+    reset_matcher_caches()
+    startup_s, matcher = timed(lambda: ExerciseMatcher(exercise_db_path, match_cache_path=None))
+    exercises = [{"Exercise Name": name, "Sets": [], "Notes": ""} for name in names]
+    first_match_s, _ = timed(lambda: matcher.match_program([exercises]))
+    # A fresh match cache, so every name goes through the tiers again with the model loaded
+    warm_matcher = ExerciseMatcher(exercise_db_path, match_cache_path=None)
+    warm_s, _ = timed(lambda: warm_matcher.match_program([exercises]))
+    return {
+        "startup_s": startup_s,
+        "first_match_s": first_match_s,
+        "match_per_exercise_s": warm_s / len(names),
+        "tiers": warm_matcher.match_stats()["tiers"],
+    }
+
+
+def bench_program(num_weeks: int, exercise_db_path: str, work_dir: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Time extraction, mapping, formatting and upload for a synthetic program."""
+    paths = write_program(num_weeks, exercise_db_path, work_dir, seed=args.seed)
+    week_files = [os.path.join(paths["results"], f"result-{week}.json") for week in range(1, num_weeks + 1)]
+    results: Dict[str, Any] = {}
+
+    extraction = {}
+    for kind in ("excel", "pdf"):
+        extraction[f"{kind}_s"], _ = timed(lambda: DocumentExtractor(cache_dir=None).extract(paths[kind]), args.repeat)
+    # In-process rendering, for comparison with the process pool used by default
+    extraction["pdf_serial_s"], _ = timed(lambda: DocumentExtractor(cache_dir=None, pdf_workers=1).extract(paths["pdf"]), args.repeat)
+    cache_dir = os.path.join(work_dir, "extraction-cache")
+    DocumentExtractor(cache_dir=cache_dir).extract(paths["pdf"])
+    extraction["cached_s"], _ = timed(lambda: DocumentExtractor(cache_dir=cache_dir).extract(paths["pdf"]), args.repeat)
+    results["extraction"] = extraction
+
+    matcher = ExerciseMatcher(exercise_db_path, match_cache_path=None)
+    mapping_s, structured_weeks = timed(
+        lambda: [WorkoutProgramMapper(matcher).read_workout_json(path) for path in week_files], args.repeat
+    )
+    exercise_count = sum(len(workout["workout"]["exercises"]) for week in structured_weeks for workout in week)
+    results["mapping"] = {
+        "total_s": mapping_s,
+        "per_week_s": mapping_s / num_weeks,
+        "per_exercise_s": mapping_s / exercise_count,
+    }
+
+    formatting_s, _ = timed(
+        lambda: [WorkoutProgramParser.format_workout_data(week) for week in structured_weeks], args.repeat
+    )
+    results["formatting"] = {"total_s": formatting_s, "per_week_s": formatting_s / num_weeks}
+
+    upload_weeks = structured_weeks[:args.upload_weeks]
+    with LyftaMockServer(latency=args.upload_latency, seed=args.seed) as server:
+        # Point the client at the mock server for this run only
+        base_url, APIClient.BASE_URL = APIClient.BASE_URL, server.base_url
+        api_client = APIClient(upload_mode=args.upload_mode)
+        try:
+            workout_parser = WorkoutProgramParser(
+                paths["excel"], work_dir, LLMService(backend=ReplayBackend(paths["results"])), api_client
+            )
+            upload_s, _ = timed(lambda: [
+                workout_parser.upload_week(week_number, week, "benchmark") for week_number, week in enumerate(upload_weeks, start=1)
+            ])
+            metrics = api_client.metrics()
+        finally:
+            api_client.close()
+            APIClient.BASE_URL = base_url
+    workout_count = sum(len(week) for week in upload_weeks)
+    results["upload"] = {
+        "weeks": len(upload_weeks),
+        "total_s": upload_s,
+        "per_workout_s": upload_s / workout_count if workout_count else 0.0,
+        "requests": metrics["requests"],
+        "requests_per_workout": metrics["requests_per_workout"],
+    }
+    return results
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Flatten nested results to dotted metric names, keeping numeric values only."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_delta: float) -> List[str]:
+    """
+    Compare timings against a baseline run.
+
+    :param current: Results of this run.
+    :param baseline: Results of the baseline run.
+    :param threshold: Allowed relative slowdown, e.g. 0.25 for 25%.
+    :param min_delta: Slowdowns smaller than this many seconds are ignored.
+    :return: Description of each timing that regressed.
+    """
+    current_metrics = flatten(current["results"])
+    regressions = []
+    for name, before in flatten(baseline["results"]).items():
+        after = current_metrics.get(name)
+        if not name.endswith("_s") or after is None:
+            continue
+        if after > before * (1 + threshold) and after - before > min_delta:
+            regressions.append(f"{name}: {before:.4f}s -> {after:.4f}s (+{(after / before - 1) * 100 if before else float('inf'):.0f}%)")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the import stages on synthetic programs")
+    parser.add_argument("--weeks", default="4,16,52", help="Comma-separated program lengths in weeks (default: 4,16,52)")
+    parser.add_argument("--exercise-db", default=EXERCISE_DB_PATH, help="Exercise database JSON file")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per timing; the median is reported (default: 3)")
+    parser.add_argument("--upload-weeks", type=int, default=4, help="Weeks of each program uploaded to the local Lyfta stand-in (default: 4)")
+    parser.add_argument("--upload-latency", type=float, default=0.0, help="Simulated Lyfta response latency in seconds")
+    parser.add_argument("--upload-mode", choices=UPLOAD_MODES, default=UPLOAD_MODE_TWO_STEP, help="How workouts are created, as in main.py (default: two-step)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed relative slowdown before a timing counts as a regression (default: 0.25)")
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA, help="Ignore slowdowns smaller than this many seconds (default: 0.005)")
+    parser.add_argument("--help-budget", type=float, default=DEFAULT_HELP_BUDGET, help="Maximum seconds for `main.py --help` (default: 0.5)")
+    parser.add_argument("--import-budget", type=float, default=DEFAULT_IMPORT_BUDGET, help="Maximum seconds to import the import pipeline (default: 1.0)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    week_counts = [int(weeks) for weeks in args.weeks.split(",")]
+
+    results: Dict[str, Any] = {}
+    results["startup"], eager_modules = bench_startup(args.repeat)
+    with tempfile.TemporaryDirectory(prefix="workout-bench-") as work_dir:
+        # Matcher timings use a copy of the database, so no persisted index is reused
+        db_copy = os.path.join(work_dir, "exercises.json")
+        with open(args.exercise_db, "rb") as source, open(db_copy, "wb") as target:
+            target.write(source.read())
+        results["matcher"] = bench_matcher(db_copy, exercise_names(db_copy, 200, args.seed))
+        for num_weeks in week_counts:
+            program_dir = os.path.join(work_dir, f"{num_weeks}w")
+            results[f"{num_weeks}w"] = bench_program(num_weeks, db_copy, program_dir, args)
+            print(f"Benchmarked {num_weeks}-week program", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    for name, value in flatten(results).items():
+        print(f"{name:45} {value:.6f}" if isinstance(value, float) else f"{name:45} {value}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    budget_violations = []
+    if results["startup"]["help_s"] > args.help_budget:
+        budget_violations.append(f"main.py --help took {results['startup']['help_s']:.3f}s, budget {args.help_budget:.3f}s")
+    if results["startup"]["pipeline_import_s"] > args.import_budget:
+        budget_violations.append(f"importing the pipeline took {results['startup']['pipeline_import_s']:.3f}s, budget {args.import_budget:.3f}s")
+    if eager_modules:
+        budget_violations.append(f"imported before needed: {', '.join(eager_modules)}")
+    if budget_violations:
+        print("Startup budget exceeded:")
+        for violation in budget_violations:
+            print(f"  {violation}")
+        return 1
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import os
+import json
+import random
+from typing import Any, Dict, List, Sequence
+import pandas as pd
+
+from app.constants import exercise_dict
+
+DAYS_PER_WEEK = 4
+EXERCISES_PER_DAY = 6
+SETS_PER_EXERCISE = 3
+# Share of exercise names spelled exactly like a database name or an alias;
+# the rest are perturbed so that they need semantic search
+EXACT_NAME_SHARE = 0.6
+NAME_PREFIXES = ["", "A1. ", "B2 - ", "Paused ", "Tempo "]
+NAME_SUFFIXES = ["", " (heavy)", " - top set", " w/ pause", " 3-1-1"]
+
+
+def exercise_names(exercise_db_path: str, count: int, seed: int = 0) -> List[str]:
+    """
+    Draw exercise names the way they appear in real programs.
+
+    Names are database names, aliases from app.constants.exercise_dict, and
+    variants of either with superset labels, tempo notes or other decorations.
+
+    :param exercise_db_path: Path to the exercise database JSON file.
+    :param count: Number of names to draw.
+    :param seed: Seed for the draws.
+    :return: Exercise names, with repetitions as in a real program.
+    """
+    rng = random.Random(seed)
+    with open(exercise_db_path, "r") as f:
+        database_names = [exercise["name"] for exercise in json.load(f)]
+    pool = database_names + list(exercise_dict.keys())
+    names = []
+    for _ in range(count):
+        name = rng.choice(pool)
+        if rng.random() >= EXACT_NAME_SHARE:
+            name = f"{rng.choice(NAME_PREFIXES)}{name.title()}{rng.choice(NAME_SUFFIXES)}"
+        names.append(name)
+    return names
+
+
+def build_program(num_weeks: int, exercise_db_path: str, seed: int = 0) -> Dict[str, Any]:
+    """
+    Build a WorkoutProgram-shaped dict like the LLM returns for a whole program.
+
+    A block of days is drawn once and repeated every week with progressing
+    loads, the way real programs repeat their exercise selection.
+
+    :param num_weeks: Number of weeks.
+    :param exercise_db_path: Path to the exercise database JSON file.
+    :param seed: Seed for the exercise selection.
+    :return: Program with one entry per week.
+    """
+    names = exercise_names(exercise_db_path, DAYS_PER_WEEK * EXERCISES_PER_DAY, seed)
+    weeks = []
+    for week in range(1, num_weeks + 1):
+        days = []
+        for day in range(DAYS_PER_WEEK):
+            exercises = []
+            for name in names[day * EXERCISES_PER_DAY:(day + 1) * EXERCISES_PER_DAY]:
+                exercises.append({
+                    "Exercise Name": name,
+                    "Sets": [
+                        {
+                            "Set Number": set_number,
+                            "Reps": {"isRange": False, "value": "8", "min": "", "max": ""},
+                            "Weight": {"value": str(40 + 2.5 * week), "unit": "kg"},
+                            "Rest Time": {"value": "90", "unit": "s"},
+                        }
+                        for set_number in range(1, SETS_PER_EXERCISE + 1)
+                    ],
+                    "Notes": "",
+                })
+            days.append({"day": f"Day {day + 1}", "exercises": exercises})
+        weeks.append({"week": f"Week {week}", "days": days})
+    return {"weeks": weeks}
+
+
+def program_rows(program: Dict[str, Any]) -> List[List[str]]:
+    """Flatten a program to one row per set, in the layout of a typical spreadsheet program."""
+    rows = []
+    for week in program["weeks"]:
+        for day in week["days"]:
+            for exercise in day["exercises"]:
+                for set_item in exercise["Sets"]:
+                    rows.append([
+                        week["week"], day["day"], exercise["Exercise Name"], str(set_item["Set Number"]),
+                        set_item["Reps"]["value"], f"{set_item['Weight']['value']} {set_item['Weight']['unit']}",
+                        f"{set_item['Rest Time']['value']}{set_item['Rest Time']['unit']}",
+                    ])
+    return rows
+
+
+PROGRAM_COLUMNS = ["Week", "Day", "Exercise", "Set", "Reps", "Weight", "Rest"]
+
+
+def write_excel(program: Dict[str, Any], path: str) -> None:
+    """Write the program as a workbook with one sheet per week."""
+    rows = program_rows(program)
+    with pd.ExcelWriter(path) as writer:
+        for week in program["weeks"]:
+            week_rows = [row for row in rows if row[0] == week["week"]]
+            pd.DataFrame(week_rows, columns=PROGRAM_COLUMNS).to_excel(writer, sheet_name=week["week"], index=False)
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(pages: Sequence[Sequence[str]], path: str) -> None:
+    """
+    Write a text-only PDF with one page per list of lines.
+
+    Only the PDF features pdfplumber needs are emitted, so no PDF library is required.
+
+    :param pages: Lines of text for each page.
+    :param path: Output file path.
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        text = "".join(f"({_pdf_escape(line)}) Tj T* " for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 36 770 Td {text}ET".encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    content = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(content))
+        content += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(content)
+    content += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    content += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    content += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def write_program(num_weeks: int, exercise_db_path: str, output_dir: str, seed: int = 0) -> Dict[str, str]:
+    """
+    Write a synthetic program as Excel, PDF and per-week LLM results.
+
+    :param num_weeks: Number of weeks.
+    :param exercise_db_path: Path to the exercise database JSON file.
+    :param output_dir: Directory to write into.
+    :param seed: Seed for the exercise selection.
+    :return: Paths of the written "excel" and "pdf" files and the "results" directory holding result-{week}.json.
+    """
+    program = build_program(num_weeks, exercise_db_path, seed)
+    results_dir = os.path.join(output_dir, "results")
+    os.makedirs(results_dir, exist_ok=True)
+    for week_number, week in enumerate(program["weeks"], start=1):
+        with open(os.path.join(results_dir, f"result-{week_number}.json"), "w") as f:
+            json.dump({"weeks": [week]}, f)
+
+    excel_path = os.path.join(output_dir, "program.xlsx")
+    write_excel(program, excel_path)
+
+    pdf_path = os.path.join(output_dir, "program.pdf")
+    rows = program_rows(program)
+    pages = []
+    for week in program["weeks"]:
+        lines = [week["week"]] + ["  ".join(row[1:]) for row in rows if row[0] == week["week"]]
+        # Split weeks that do not fit on a single page
+        pages.extend(lines[i:i + 65] for i in range(0, len(lines), 65))
+    write_pdf(pages, pdf_path)
+    return {"excel": excel_path, "pdf": pdf_path, "results": results_dir}
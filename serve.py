@@ -0,0 +1,63 @@
+from app.cli import StartupProfiler, add_import_arguments, build_llm_service, export_traces, validate_import_arguments
+from app.constants import IMPORT_SERVICE_PORT, JOB_STORE_PATH, SERVICE_TRACE_MAX_SPANS
+from app.services.tracing import tracer
+import signal
+import logging
+import argparse
+import threading
+
+startup = StartupProfiler()
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s')
+
+parser = argparse.ArgumentParser(description="Run the import service: a local HTTP job API that keeps the matcher, LLM and Lyfta clients loaded")
+parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1)")
+parser.add_argument("--port", type=int, default=IMPORT_SERVICE_PORT, help=f"Port to listen on (default: {IMPORT_SERVICE_PORT})")
+parser.add_argument("--workers", type=int, default=2, help="Jobs run at the same time (default: 2)")
+parser.add_argument("--upload-workers", type=int, help="Weeks uploaded concurrently across all jobs (default: min(32, CPUs + 4))")
+parser.add_argument("--job-store", default=JOB_STORE_PATH, help=f"SQLite file the jobs are persisted in (default: {JOB_STORE_PATH})")
+add_import_arguments(parser)
+
+with startup.phase("parse_args"):
+    args = parser.parse_args()
+    validate_import_arguments(parser, args)
+if args.profile_startup:
+    startup.enable()
+# The service runs for days; keep its trace bounded
+tracer.limit_spans(SERVICE_TRACE_MAX_SPANS)
+
+# Imported only after the arguments are valid; the services pull in heavy dependencies
+with startup.phase("imports"):
+    from app.services.batch_importer import BatchImporter
+    from app.services.import_service import ImportService
+    from app.services.job_store import JobStore
+    from app.services.upload_journal import UploadJournal
+
+with startup.phase("llm_service"):
+    llm_service = build_llm_service(args)
+importer = BatchImporter(
+    llm_service,
+    max_concurrent_files=args.workers,
+    upload_workers=args.upload_workers,
+    multi_week=args.multi_week,
+    stream_llm=args.stream_llm,
+    async_upload=args.async_upload,
+    upload_mode=args.upload_mode,
+    journal=UploadJournal(),
+    resume=args.resume,
+    intermediate_dir=args.save_intermediate,
+)
+service = ImportService(importer, JobStore(args.job_store), host=args.host, port=args.port, workers=args.workers)
+
+stop_event = threading.Event()
+signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+with startup.phase("service_start"):
+    service.start()
+if args.profile_startup:
+    startup.log_report()
+try:
+    stop_event.wait()
+except KeyboardInterrupt:
+    pass
+logging.info("Stopping; waiting for running jobs to finish")
+service.stop()
+export_traces(args)
@@ -0,0 +1,127 @@
+import json
+import hashlib
+from concurrent.futures import Future
+from typing import List
+
+import numpy as np
+import pytest
+
+from app.services.embedding_backends import EmbeddingBackend
+from app.services.lyfta_api_service import APIClient
+from app.services.lyfta_mock_server import LyftaMockServer
+
+EXERCISES = [
+    "full squat",
+    "barbell curl",
+    "dumbbell incline bench press",
+    "lever lying leg curl",
+    "pull up",
+    "barbell romanian deadlift",
+    "chest dip",
+    "cable kickback",
+    "front plank",
+    "seated row",
+]
+WEEKS = 3
+DAYS_PER_WEEK = 2
+
+
+class HashEmbeddingBackend(EmbeddingBackend):
+    """Offline stand-in for the embedding model: a hashed bag of words."""
+
+    name = "test:hash"
+
+    def __init__(self, dimension: int = 64):
+        super().__init__()
+        self.dimension = dimension
+        self.calls = 0
+
+    def _load(self) -> None:
+        pass
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        self.calls += 1
+        embeddings = np.zeros((len(texts), self.dimension), dtype="float32")
+        for row, text in enumerate(texts):
+            for token in text.split():
+                embeddings[row, int(hashlib.md5(token.encode()).hexdigest(), 16) % self.dimension] += 1
+        return embeddings
+
+
+def write_week(replay_dir, week_number: int, names: List[str]) -> None:
+    days = []
+    for day in range(DAYS_PER_WEEK):
+        exercises = [
+            {
+                "Exercise Name": name,
+                "Sets": [
+                    {
+                        "Set Number": 1,
+                        "Reps": {"isRange": False, "value": "8", "min": "", "max": ""},
+                        "Weight": {"value": "50", "unit": "kg"},
+                        "Rest Time": {"value": "60", "unit": "s"},
+                    }
+                ],
+                "Notes": "",
+            }
+            for name in names[day::DAYS_PER_WEEK]
+        ]
+        days.append({"day": f"Day {day + 1}", "exercises": exercises})
+    with open(replay_dir / f"result-{week_number}.json", "w") as f:
+        json.dump({"weeks": [{"week": f"Week {week_number}", "days": days}]}, f)
+
+
+@pytest.fixture
+def exercise_db(tmp_path):
+    path = tmp_path / "exercises.json"
+    with open(path, "w") as f:
+        json.dump([{"id": i, "name": name, "exercise_type": "weight_reps"} for i, name in enumerate(EXERCISES)], f)
+    return str(path)
+
+
+@pytest.fixture
+def program_file(tmp_path):
+    path = tmp_path / "program.txt"
+    path.write_text("Week 1-3: squat, curl, bench, leg curl, pull up, deadlift\n")
+    return str(path)
+
+
+@pytest.fixture
+def replay_dir(tmp_path):
+    """Recorded LLM responses for a WEEKS-week program whose exercises are all in the database."""
+    directory = tmp_path / "replay"
+    directory.mkdir()
+    for week_number in range(1, WEEKS + 1):
+        write_week(directory, week_number, EXERCISES[:6])
+    return directory
+
+
+@pytest.fixture
+def matcher(exercise_db):
+    from app.services.exercise_matcher import ExerciseMatcher
+
+    return ExerciseMatcher(exercise_db, persist_index=False, match_cache_path=None, embedding_backend=HashEmbeddingBackend(), catalogs={})
+
+
+@pytest.fixture
+def matcher_future(matcher):
+    future = Future()
+    future.set_result(matcher)
+    return future
+
+
+@pytest.fixture
+def lyfta(monkeypatch):
+    """Mock Lyfta server that APIClient and AsyncUploadEngine upload to."""
+    server = LyftaMockServer()
+    monkeypatch.setattr(APIClient, "BASE_URL", server.start())
+    yield server
+    server.stop()
+
+
+def account_totals(server: LyftaMockServer, cookie: str):
+    """Return the number of collections and workouts the account of a cookie owns."""
+    user_id = server.user_id(cookie)
+    collections = sum(1 for item_id in server.collections if server.owners[item_id] == user_id)
+    workouts = sum(1 for item_id in server.workouts if server.owners[item_id] == user_id)
+    return collections, workouts
@@ -0,0 +1,80 @@
+import random
+
+from fuzzywuzzy import process
+
+from app.constants import ALIAS_MATCH_THRESHOLD, exercise_dict
+from app.services.alias_index import AliasIndex
+
+
+def full_scan(query):
+    """The matching AliasIndex replaced: fuzzywuzzy's default scorer over the whole alias table."""
+    match, score = process.extractOne(query, exercise_dict.keys())
+    return exercise_dict[match], match, score
+
+
+def sample_queries(count=12, seed=0):
+    """Variations of aliases as they show up in programs: case, notes, typos, reordered and abbreviated words."""
+    rng = random.Random(seed)
+    queries = []
+    for alias in rng.sample(sorted(exercise_dict), count):
+        words = alias.split()
+        queries.append(alias.upper())
+        queries.append(f"{alias} (superset A1)")
+        position = rng.randrange(len(alias))
+        queries.append(alias[:position] + alias[position + 1:])
+        queries.append(" ".join(reversed(words)))
+        queries.append(f"dumbbell {alias}")
+        queries.append(" ".join(word[:4] for word in words))
+    queries += ["bulgarian split squat", "lat pulldown", "hip thrust", "zorbly lift", "incline db press"]
+    return queries
+
+
+def test_alias_decisions_match_a_full_scan():
+    index = AliasIndex(exercise_dict, shortlist_size=5)
+    for query in sample_queries():
+        name, _, score = index.find_closest(query)
+        expected_name, _, expected_score = full_scan(query)
+        assert (score >= ALIAS_MATCH_THRESHOLD) == (expected_score >= ALIAS_MATCH_THRESHOLD), query
+        if expected_score >= ALIAS_MATCH_THRESHOLD:
+            assert score == expected_score, query
+            assert name == expected_name, query
+
+
+def test_exact_alias_is_found_without_scoring():
+    index = AliasIndex(exercise_dict)
+    assert index.exact("  Back Squat ") == "full squat"
+    assert index.find_closest("back squat") == ("full squat", "back squat", 100)
+
+
+def test_second_shortlist_when_the_first_has_no_confident_match():
+    # "squatback press" shares more trigrams with the query, but "squat back" scores higher
+    aliases = {"squatback press": "dumbbell bench press", "squat back": "full squat"}
+    assert AliasIndex(aliases, shortlist_size=1, second_pass_size=1).find_closest("squatback") == ("full squat", "squat back", 95)
+
+
+def test_abbreviated_words_reach_the_second_shortlist():
+    index = AliasIndex(exercise_dict, shortlist_size=1, second_pass_size=10)
+    name, _, score = index.find_closest("incl db bench pres")
+    assert (name, score) == full_scan("incl db bench pres")[::2]
+
+
+def test_fuzzy_scoring_does_not_grow_with_the_table(monkeypatch):
+    rng = random.Random(0)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9))) for _ in range(400)]
+    scored = []
+    extract_one = process.extractOne
+
+    def counting_extract_one(query, choices, *args, **kwargs):
+        choices = list(choices)
+        scored.append(len(choices))
+        return extract_one(query, choices, *args, **kwargs)
+
+    monkeypatch.setattr(process, "extractOne", counting_extract_one)
+    for size in (100, 10000):
+        aliases = {" ".join(rng.sample(words, 3)): "full squat" for _ in range(size)}
+        index = AliasIndex(aliases, shortlist_size=25, second_pass_size=100)
+        scored.clear()
+        for query in ("zorbly lift", "dumbbell incline bench press", words[0] + " " + words[1]):
+            index.find_closest(query)
+        assert max(scored) <= 100
+        assert sum(scored) <= 3 * (25 + 100)
@@ -0,0 +1,37 @@
+import threading
+
+from app.services.async_upload_engine import AsyncUploadEngine
+from app.services.upload_journal import UploadJournal
+
+COOKIE = "session=a"
+WORKOUTS = [{"title": f"Day {day}", "exercises": []} for day in range(1, 4)]
+
+
+class ThreadRecordingJournal(UploadJournal):
+    """Journal noting which threads its methods are called from."""
+
+    def __init__(self, db_path):
+        self.threads = set()
+        super().__init__(db_path)
+
+    def _connection(self):
+        self.threads.add(threading.current_thread().name)
+        return super()._connection()
+
+
+def test_journal_calls_stay_off_the_event_loop(tmp_path, lyfta):
+    journal = ThreadRecordingJournal(str(tmp_path / "journal.sqlite3"))
+    journal.threads.clear()
+    key = UploadJournal.program_key("hash", COOKIE)
+    engine = AsyncUploadEngine()
+    try:
+        workout_ids = engine.submit_week(1, [dict(workout) for workout in WORKOUTS], COOKIE, journal, key).result()
+        # Resuming the completed week creates nothing new
+        assert engine.submit_week(1, [dict(workout) for workout in WORKOUTS], COOKIE, journal, key).result() == workout_ids
+    finally:
+        engine.close()
+
+    assert journal.threads and "lyfta-upload-loop" not in journal.threads
+    assert journal.is_week_complete(key, 1)
+    assert lyfta.stats()["collections"] == 1
+    assert lyfta.stats()["workouts"] == len(WORKOUTS)
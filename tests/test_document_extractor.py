@@ -0,0 +1,80 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.document_extractor import DocumentExtractor
+from app.services.llm_backends import ReplayBackend
+from app.services.llm_service import LLMService
+
+from conftest import WEEKS
+
+
+def write_programs(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"program-{i}.txt"
+        path.write_text(f"Week 1: {i} x squat\n")
+        paths.append(str(path))
+    return paths
+
+
+def test_memo_keeps_only_the_most_recently_used_documents(tmp_path):
+    extractor = DocumentExtractor(cache_dir=None, memo_size=2)
+    first, second, third = write_programs(tmp_path, 3)
+    document = extractor.extract(first)
+    extractor.extract(second)
+    assert extractor.extract(first) is document
+    extractor.extract(third)
+
+    assert len(extractor._documents) == 2
+    assert extractor.extract(first) is document
+    assert extractor.extract(second).text == "Week 1: 1 x squat\n"
+
+
+def test_different_files_extract_in_parallel(tmp_path, monkeypatch):
+    extractor = DocumentExtractor(cache_dir=None)
+    paths = write_programs(tmp_path, 2)
+    both_rendering = threading.Barrier(2, timeout=5)
+    renders = []
+
+    def render(file_path):
+        renders.append(file_path)
+        # Only returns if the other file is being rendered at the same time
+        both_rendering.wait()
+        return "text"
+
+    monkeypatch.setattr(extractor, "_render", render)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        documents = list(executor.map(extractor.extract, paths * 2))
+
+    assert sorted(renders) == sorted(paths)
+    assert [document.text for document in documents] == ["text"] * 4
+
+
+def test_disk_cache_serves_unchanged_files_without_rendering(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    (path,) = write_programs(tmp_path, 1)
+    first = DocumentExtractor(cache_dir=cache_dir).extract(path)
+
+    extractor = DocumentExtractor(cache_dir=cache_dir)
+    renders = []
+    monkeypatch.setattr(extractor, "_render", lambda file_path: renders.append(file_path) or "edited")
+    assert extractor.extract(path) == first
+    assert renders == []
+
+    # The cache is keyed by content, so an edited file is rendered again
+    (tmp_path / "program-0.txt").write_text("Week 1: 5 x squat\n")
+    assert extractor.extract(path).text == "edited"
+    assert renders == [path]
+
+
+def test_llm_calls_of_one_run_share_one_extraction(replay_dir, program_file, monkeypatch):
+    extractor = DocumentExtractor(cache_dir=None)
+    llm_service = LLMService(document_extractor=extractor, backend=ReplayBackend(str(replay_dir)))
+    renders = []
+    render = extractor._render
+    monkeypatch.setattr(extractor, "_render", lambda file_path: renders.append(file_path) or render(file_path))
+
+    for week_number in range(1, WEEKS + 1):
+        llm_service.make_llm_call(llm_service.generate_week_prompt(week_number), program_file)
+
+    assert renders == [program_file]
@@ -0,0 +1,56 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.services.exercise_matcher import DEFAULT_CATALOG, ExerciseMatcher
+
+from conftest import EXERCISES, HashEmbeddingBackend
+
+
+@pytest.fixture(autouse=True)
+def no_shared_indexes(monkeypatch):
+    # Indexes are shared by all matchers of a process; each test starts as a fresh process would
+    monkeypatch.setattr(ExerciseMatcher, "_faiss_indexes", {})
+
+
+def persisting_matcher(exercise_db):
+    return ExerciseMatcher(exercise_db, persist_index=True, match_cache_path=None, embedding_backend=HashEmbeddingBackend(), catalogs={})
+
+
+def test_index_is_persisted_and_loaded_without_encoding(exercise_db):
+    built = persisting_matcher(exercise_db)
+    _, embeddings_path = built._index_paths(DEFAULT_CATALOG)
+    expected = built.find_most_similar("barbell curl", top_n=3)
+
+    ExerciseMatcher._faiss_indexes.clear()
+    loaded = persisting_matcher(exercise_db)
+    loaded.index
+    assert loaded.embedding_backend.calls == 0
+    assert isinstance(loaded.embeddings, np.memmap)
+    assert np.array_equal(np.load(embeddings_path), built.embeddings)
+    assert [match["name"] for match in loaded.find_most_similar("barbell curl", top_n=3)] == [match["name"] for match in expected]
+
+
+def test_changed_database_gets_its_own_index(exercise_db):
+    first = persisting_matcher(exercise_db)
+    first.index
+    with open(exercise_db, "w") as f:
+        json.dump([{"id": i, "name": name, "exercise_type": "weight_reps"} for i, name in enumerate(EXERCISES[:5])], f)
+
+    changed = persisting_matcher(exercise_db)
+    assert changed._index_paths(DEFAULT_CATALOG) != first._index_paths(DEFAULT_CATALOG)
+    assert changed.index.ntotal == 5
+    assert changed.embedding_backend.calls == 1
+
+
+def test_unreadable_index_is_rebuilt(exercise_db):
+    index_path, _ = persisting_matcher(exercise_db)._index_paths(DEFAULT_CATALOG)
+    persisting_matcher(exercise_db).index
+    ExerciseMatcher._faiss_indexes.clear()
+    with open(index_path, "wb") as f:
+        f.write(b"not an index")
+
+    rebuilt = persisting_matcher(exercise_db)
+    assert rebuilt.index.ntotal == len(EXERCISES)
+    assert rebuilt.embedding_backend.calls == 1
@@ -0,0 +1,82 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.alias_index import AliasIndex
+from app.services.exercise_matcher import TIER_ALIAS, TIER_CACHE, TIER_EXACT, TIER_SEMANTIC
+
+from conftest import HashEmbeddingBackend
+
+
+class SlowHashEmbeddingBackend(HashEmbeddingBackend):
+    def _encode(self, texts):
+        time.sleep(0.2)
+        return super()._encode(texts)
+
+
+class BrokenNameEmbeddingBackend(HashEmbeddingBackend):
+    def _encode(self, texts):
+        if "broken lift" in texts:
+            raise ValueError("cannot encode")
+        return super()._encode(texts)
+
+
+def week(names):
+    return [[{"Exercise Name": name, "Sets": [], "Notes": ""} for name in names]]
+
+
+def test_concurrent_weeks_search_each_repeated_name_once(matcher):
+    matcher.embedding_backend = SlowHashEmbeddingBackend()
+    names = [f"zorbly lift variation {i}" for i in range(18)]
+    start = threading.Barrier(3)
+
+    def match_week(_):
+        start.wait()
+        return matcher.match_program(week(names))
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        weeks = list(executor.map(match_week, range(3)))
+
+    assert matcher.tier_counts[TIER_SEMANTIC] == 18
+    assert matcher.tier_counts[TIER_CACHE] == 36
+    assert all(len(days[0]) == 18 for days in weeks)
+    assert [exercise["exercise_id"] for exercise in weeks[0][0]] == [exercise["exercise_id"] for exercise in weeks[2][0]]
+    assert matcher._in_flight == {}
+
+
+def test_failed_search_drops_the_name_for_waiting_weeks(matcher, monkeypatch):
+    calls = []
+
+    def fail(input_names, top_n=5):
+        calls.append(input_names)
+        time.sleep(0.2)
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(matcher, "find_most_similar_batch", fail)
+    start = threading.Barrier(2)
+
+    def match_week(_):
+        start.wait()
+        return matcher.match_program(week(["zorbly lift"]))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        weeks = list(executor.map(match_week, range(2)))
+
+    assert weeks == [[[]], [[]]]
+    assert [names for names in calls if names] == [["zorbly lift"]]
+    assert matcher._in_flight == {}
+
+
+def test_failed_semantic_search_drops_only_that_exercise(matcher):
+    matcher.embedding_backend = BrokenNameEmbeddingBackend()
+    days = matcher.match_program(week(["zorbly lift", "broken lift", "quorple press"]))
+
+    assert [exercise["exercise_note"] for exercise in days[0]] == ["Orignal Name: zorbly lift", "Orignal Name: quorple press"]
+    assert matcher.tier_counts[TIER_SEMANTIC] == 2
+
+
+def test_alias_takes_precedence_over_a_database_name(matcher):
+    matcher.alias_index = AliasIndex({"pull up": "chest dip"})
+    days = matcher.match_program(week(["pull up", "seated row"]))
+
+    assert [(exercise["excercise_name"], exercise["match_tier"]) for exercise in days[0]] == [("chest dip", TIER_ALIAS), ("seated row", TIER_EXACT)]
@@ -0,0 +1,99 @@
+import time
+import shutil
+
+from app.services.document_extractor import DocumentExtractor
+from app.services.import_pipeline import ImportPipeline
+from app.services.llm_backends import ReplayBackend
+from app.services.llm_service import LLMService
+from app.services.upload_journal import UploadJournal
+
+from conftest import DAYS_PER_WEEK, WEEKS, account_totals
+
+
+def run_import(tmp_path, replay_dir, program_file, cookie, journal, matcher_future, resume):
+    llm_service = LLMService(document_extractor=DocumentExtractor(cache_dir=None), backend=ReplayBackend(str(replay_dir)))
+    pipeline = ImportPipeline(llm_service, journal=journal, resume=resume, matcher_future=matcher_future, upload_workers=2)
+    return pipeline.run(program_file, cookie)
+
+
+def test_same_file_into_two_accounts_keeps_separate_journals(tmp_path, replay_dir, program_file, matcher_future, lyfta):
+    journal = UploadJournal(str(tmp_path / "journal.sqlite3"))
+    # The first import into account A is interrupted after two of the three weeks
+    partial_dir = tmp_path / "partial"
+    partial_dir.mkdir()
+    for week_number in range(1, WEEKS):
+        shutil.copy(replay_dir / f"result-{week_number}.json", partial_dir)
+    assert run_import(tmp_path, partial_dir, program_file, "session=a", journal, matcher_future, resume=False) == []
+
+    # A fresh import of the same file into account B must not touch A's journal
+    assert run_import(tmp_path, replay_dir, program_file, "session=b", journal, matcher_future, resume=False) == []
+    assert run_import(tmp_path, replay_dir, program_file, "session=a", journal, matcher_future, resume=True) == []
+
+    for cookie in ("session=a", "session=b"):
+        assert account_totals(lyfta, cookie) == (WEEKS, WEEKS * DAYS_PER_WEEK)
+
+
+def test_program_key_depends_on_account():
+    assert UploadJournal.program_key("hash", "session=a") == UploadJournal.program_key("hash", " session=a ")
+    assert UploadJournal.program_key("hash", "session=a") != UploadJournal.program_key("hash", "session=b")
+
+
+def test_begin_refuses_a_second_import_of_the_same_program(tmp_path):
+    journal = UploadJournal(str(tmp_path / "journal.sqlite3"))
+    key = UploadJournal.program_key("hash", "session=a")
+    journal.begin(key, resume=False)
+    journal.record_collection(key, 1, 10, 1000)
+    try:
+        journal.begin(key, resume=False)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a second import of the same program was allowed to start")
+    assert journal.get_collection(key, 1) == (10, 1000)
+    journal.end(key)
+    journal.begin(key, resume=False)
+    assert journal.get_collection(key, 1) is None
+
+
+class LastWeekWaitsForFirstUpload(ReplayBackend):
+    """Replay backend that answers for the last week only once a workout has reached the Lyfta server."""
+
+    def __init__(self, replay_dir, server):
+        super().__init__(replay_dir)
+        self.server = server
+        self.overlapped = False
+
+    def generate(self, prompt, document_text, response_schema, max_output_tokens):
+        if f"Week {WEEKS}." in prompt:
+            deadline = time.monotonic() + 10
+            while not self.server.stats()["workouts"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.overlapped = self.server.stats()["workouts"] > 0
+        return super().generate(prompt, document_text, response_schema, max_output_tokens)
+
+
+class FailingWeekBackend(ReplayBackend):
+    def generate(self, prompt, document_text, response_schema, max_output_tokens):
+        if "Week 2." in prompt:
+            raise RuntimeError("model unavailable")
+        return super().generate(prompt, document_text, response_schema, max_output_tokens)
+
+
+def test_weeks_are_uploaded_while_later_weeks_are_still_extracted(replay_dir, program_file, matcher_future, lyfta):
+    backend = LastWeekWaitsForFirstUpload(str(replay_dir), lyfta)
+    llm_service = LLMService(document_extractor=DocumentExtractor(cache_dir=None), backend=backend)
+
+    pipeline = ImportPipeline(llm_service, matcher_future=matcher_future, llm_workers=WEEKS)
+    assert pipeline.run(program_file, "session=a") == []
+    assert backend.overlapped
+    assert account_totals(lyfta, "session=a") == (WEEKS, WEEKS * DAYS_PER_WEEK)
+
+
+def test_failed_week_does_not_hold_up_the_others(replay_dir, program_file, matcher_future, lyfta):
+    llm_service = LLMService(document_extractor=DocumentExtractor(cache_dir=None), backend=FailingWeekBackend(str(replay_dir)))
+    done = {}
+    pipeline = ImportPipeline(llm_service, matcher_future=matcher_future, on_week_done=done.__setitem__)
+
+    assert pipeline.run(program_file, "session=a") == [2]
+    assert done[2] is not None and done[1] is None and done[3] is None
+    assert account_totals(lyfta, "session=a") == (WEEKS - 1, (WEEKS - 1) * DAYS_PER_WEEK)
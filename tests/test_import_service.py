@@ -0,0 +1,93 @@
+import os
+import time
+import shutil
+import sqlite3
+
+import pytest
+
+from app.services.batch_importer import BatchImporter, STATUS_FAILED, STATUS_SUCCEEDED
+from app.services.document_extractor import DocumentExtractor
+from app.services.import_pipeline import ImportPipeline
+from app.services.import_service import ImportService
+from app.services.job_store import JobStore
+from app.services.llm_backends import ReplayBackend
+from app.services.llm_service import LLMService
+from app.services.upload_journal import UploadJournal
+
+from conftest import DAYS_PER_WEEK, WEEKS, account_totals
+
+
+def replay_service(replay_dir):
+    return LLMService(document_extractor=DocumentExtractor(cache_dir=None), backend=ReplayBackend(str(replay_dir)))
+
+
+def wait_for_jobs(store):
+    deadline = time.monotonic() + 60
+    while store.unfinished_jobs() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def stored_cookies(store):
+    with sqlite3.connect(store.db_path) as conn:
+        return [row[0] for row in conn.execute("SELECT cookie FROM jobs")]
+
+
+def test_interrupted_job_resumes_when_resubmitted_and_queued_job_is_requeued(tmp_path, replay_dir, program_file, matcher, matcher_future, lyfta, monkeypatch):
+    journal = UploadJournal(str(tmp_path / "journal.sqlite3"))
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    program_copy = str(upload_dir / os.path.basename(program_file))
+    shutil.copy(program_file, program_copy)
+
+    # A crashed process left user A's job running after two of the three weeks
+    partial_dir = tmp_path / "partial"
+    partial_dir.mkdir()
+    for week_number in range(1, WEEKS):
+        shutil.copy(replay_dir / f"result-{week_number}.json", partial_dir)
+    interrupted = store.create_job(program_copy, "session=a", "a")
+    store.start_job(interrupted["job_id"])
+    ImportPipeline(replay_service(partial_dir), journal=journal, matcher_future=matcher_future).run(program_copy, "session=a")
+    queued = store.create_job(program_copy, "session=b", "b")
+
+    monkeypatch.setattr(BatchImporter, "_load_matcher", staticmethod(lambda exercise_db_path: matcher))
+    service = ImportService(BatchImporter(replay_service(replay_dir), journal=journal), store, port=0, upload_dir=str(upload_dir))
+    service.start()
+    try:
+        wait_for_jobs(store)
+        # The running job's cookie was never stored, so it has to be resubmitted
+        assert store.get_job(interrupted["job_id"])["status"] == STATUS_FAILED
+        resubmitted = service.submit("session=a", file_path=program_copy, resume=True)
+        wait_for_jobs(store)
+    finally:
+        service.stop()
+
+    for job in (resubmitted, queued):
+        assert store.get_job(job["job_id"])["status"] == STATUS_SUCCEEDED
+    for cookie in ("session=a", "session=b"):
+        assert account_totals(lyfta, cookie) == (WEEKS, WEEKS * DAYS_PER_WEEK)
+
+
+def test_cookie_is_encrypted_while_queued_and_wiped_once_started(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job = store.create_job("program.txt", "session=secret", "a")
+
+    assert "session=secret" not in stored_cookies(store)[0]
+    assert JobStore(store.db_path).unfinished_jobs()[0]["cookie"] == "session=secret"
+    store.start_job(job["job_id"])
+    assert stored_cookies(store) == [None]
+
+
+def test_file_path_must_be_inside_the_upload_directory(tmp_path, program_file, matcher, monkeypatch):
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    monkeypatch.setattr(BatchImporter, "_load_matcher", staticmethod(lambda exercise_db_path: matcher))
+    service = ImportService(BatchImporter(replay_service(tmp_path)), JobStore(str(tmp_path / "jobs.sqlite3")), port=0, upload_dir=str(upload_dir))
+    try:
+        status, payload = service.handle("POST", "/jobs", {"lyfta_cookie": "session=a", "file_path": program_file})
+        assert status == 422
+        with pytest.raises(ValueError):
+            service.submit("session=a", file_path=str(upload_dir / ".." / os.path.basename(program_file)))
+    finally:
+        service._server.server_close()
+        service.importer.close()
@@ -0,0 +1,62 @@
+import itertools
+
+from app.services import llm_cache
+from app.services.document_extractor import DocumentExtractor
+from app.services.llm_backends import ReplayBackend
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_service import LLMService
+
+
+class CountingReplayBackend(ReplayBackend):
+    """Replay backend whose responses are cached, counting the calls that reach it."""
+
+    cacheable = True
+
+    def __init__(self, replay_dir):
+        super().__init__(replay_dir)
+        self.calls = 0
+
+    def generate(self, prompt, document_text, response_schema, max_output_tokens):
+        self.calls += 1
+        return super().generate(prompt, document_text, response_schema, max_output_tokens)
+
+
+def cached_service(tmp_path, replay_dir):
+    backend = CountingReplayBackend(str(replay_dir))
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.sqlite3"))
+    return LLMService(document_extractor=DocumentExtractor(cache_dir=None), response_cache=cache, backend=backend), backend
+
+
+def test_repeated_prompt_is_served_from_the_cache(tmp_path, replay_dir, program_file):
+    llm_service, backend = cached_service(tmp_path, replay_dir)
+    first = llm_service.make_llm_call(llm_service.generate_week_prompt(1), program_file)
+    assert llm_service.make_llm_call(llm_service.generate_week_prompt(1), program_file) == first
+    assert backend.calls == 1
+
+    # Another prompt, or a refresh, goes to the model
+    llm_service.make_llm_call(llm_service.generate_week_prompt(2), program_file)
+    llm_service.refresh_cache = True
+    llm_service.make_llm_call(llm_service.generate_week_prompt(1), program_file)
+    assert backend.calls == 3
+
+
+def test_key_depends_on_every_part_of_the_request():
+    key = LLMResponseCache.make_key("hash", "prompt", "model", "schema")
+    assert key == LLMResponseCache.make_key("hash", "prompt", "model", "schema")
+    for changed in (("other", "prompt", "model", "schema"), ("hash", "other", "model", "schema"),
+                    ("hash", "prompt", "other", "schema"), ("hash", "prompt", "model", "other")):
+        assert LLMResponseCache.make_key(*changed) != key
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(llm_cache.time, "time", lambda: next(clock))
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.sqlite3"), max_bytes=10)
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    assert cache.get("a") == "aaaa"
+    cache.set("c", "cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
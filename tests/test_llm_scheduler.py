@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from app.services.llm_backends import LLMResult
+from app.services.llm_scheduler import LLMScheduler
+
+
+class RateLimitError(Exception):
+    code = 429
+
+
+class ServerError(Exception):
+    code = 503
+
+
+def failing(*errors, result="ok"):
+    """Return a call raising the given errors on its first attempts, then returning result."""
+    attempts = []
+
+    def call():
+        attempts.append(time.monotonic())
+        if len(attempts) <= len(errors):
+            raise errors[len(attempts) - 1]
+        return result
+
+    call.attempts = attempts
+    return call
+
+
+def test_rate_limited_and_transient_errors_are_retried():
+    scheduler = LLMScheduler(base_delay=0)
+    call = failing(RateLimitError("quota"), ServerError("unavailable"))
+    assert scheduler.run(call) == "ok"
+    assert len(call.attempts) == 3
+
+
+def test_other_errors_are_not_retried():
+    scheduler = LLMScheduler(base_delay=0)
+    call = failing(ValueError("bad schema"))
+    with pytest.raises(ValueError):
+        scheduler.run(call)
+    assert len(call.attempts) == 1
+
+
+def test_retries_stop_after_max_retries():
+    scheduler = LLMScheduler(max_retries=2, base_delay=0)
+    call = failing(*[RateLimitError("quota")] * 3)
+    with pytest.raises(RateLimitError):
+        scheduler.run(call)
+    assert len(call.attempts) == 3
+
+
+def test_concurrency_grows_additively_and_halves_on_rate_limits():
+    scheduler = LLMScheduler(max_concurrency=4, base_delay=0)
+    concurrency = []
+    for _ in range(6):
+        scheduler.run(lambda: "ok")
+        concurrency.append(scheduler.concurrency)
+    # One more slot once as many calls as there are slots have succeeded, up to max_concurrency
+    assert concurrency == [2, 2, 3, 3, 3, 4]
+
+    scheduler.run(failing(RateLimitError("quota")))
+    assert scheduler.concurrency == 2
+    scheduler.max_retries = 1
+    with pytest.raises(RateLimitError):
+        scheduler.run(failing(RateLimitError("quota"), RateLimitError("quota")))
+    assert scheduler.concurrency == 1
+
+
+def test_budgets_hold_back_calls_beyond_the_rolling_minute():
+    scheduler = LLMScheduler(requests_per_minute=2)
+    scheduler.run(lambda: "ok")
+    assert scheduler._budget_wait(time.monotonic(), 0) == 0
+    scheduler.run(lambda: "ok")
+    assert scheduler._budget_wait(time.monotonic(), 0) > 50
+
+    scheduler = LLMScheduler(tokens_per_minute=100)
+    # The actual usage of a call replaces its estimate
+    scheduler.run(lambda: LLMResult(text="{}", truncated=False, prompt_tokens=60, output_tokens=20), estimated_tokens=10)
+    assert scheduler._budget_wait(time.monotonic(), 20) == 0
+    assert scheduler._budget_wait(time.monotonic(), 21) > 50
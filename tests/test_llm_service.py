@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from app.schema.workout_schema import WorkoutProgram
+from app.services.document_extractor import DocumentExtractor
+from app.services.llm_backends import GeminiBackend, ReplayBackend
+from app.services.llm_service import LLMService, LLMServiceError
+
+
+def replay_service(replay_dir, max_output_tokens=None):
+    llm_service = LLMService(document_extractor=DocumentExtractor(cache_dir=None), backend=ReplayBackend(str(replay_dir)))
+    if max_output_tokens is not None:
+        llm_service.max_output_tokens = max_output_tokens
+    return llm_service
+
+
+def week_tokens(replay_dir, week_number):
+    return len(json.dumps(json.loads((replay_dir / f"result-{week_number}.json").read_text()))) // 4
+
+
+def test_truncated_single_week_raises(replay_dir, program_file):
+    llm_service = replay_service(replay_dir, max_output_tokens=week_tokens(replay_dir, 1) // 2)
+    with pytest.raises(LLMServiceError):
+        llm_service.extract_weeks([1], program_file)
+
+
+def test_gemini_config_limits_output_tokens():
+    config = GeminiBackend._config(WorkoutProgram, 1234)
+    assert config["max_output_tokens"] == 1234
+
+
+def test_truncated_batch_is_split_until_each_part_fits(replay_dir, program_file, monkeypatch):
+    # Room for one week's response but not two
+    llm_service = replay_service(replay_dir, max_output_tokens=week_tokens(replay_dir, 1) * 3 // 2)
+    prompts = []
+    generate = llm_service.backend.generate
+    monkeypatch.setattr(llm_service.backend, "generate", lambda prompt, *args: prompts.append(prompt) or generate(prompt, *args))
+
+    weeks = llm_service.extract_weeks([1, 2, 3], program_file)
+
+    assert sorted(weeks) == [1, 2, 3]
+    for week_number, text in weeks.items():
+        assert json.loads(text) == json.loads((replay_dir / f"result-{week_number}.json").read_text())
+    # [1, 2, 3] -> [1] and [2, 3] -> [2] and [3]
+    assert len(prompts) == 5
+
+
+def test_weeks_are_batched_to_fit_the_output_limit(replay_dir, program_file):
+    llm_service = replay_service(replay_dir)
+    assert llm_service.plan_week_batches(program_file, 3) == [[1, 2, 3]]
+    llm_service.max_output_tokens = 1
+    assert llm_service.plan_week_batches(program_file, 3) == [[1], [2], [3]]
@@ -0,0 +1,68 @@
+import pytest
+import httpx
+import requests
+
+from app.services.async_upload_engine import AsyncUploadEngine
+from app.services.lyfta_api_service import APIClient
+
+COOKIE = "session=a"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(APIClient, "retry_delay", staticmethod(lambda attempt, retry_after=None: 0.0))
+
+
+def test_only_creates_are_not_idempotent():
+    assert not APIClient.is_idempotent(APIClient.COLLECTION_ENDPOINT, APIClient.build_collection_payload("Week 1", 1))
+    skeleton = APIClient.build_workout_skeleton_payload({"title": "Day 1"}, 7, "Week 1")
+    assert not APIClient.is_idempotent(APIClient.WORKOUT_ENDPOINT, skeleton)
+    assert APIClient.is_idempotent(APIClient.WORKOUT_ENDPOINT, {"workout": {"id": 8, "title": "Day 1"}})
+
+
+def test_timed_out_create_is_not_resent(lyfta):
+    client = APIClient(read_timeout=0.1, max_retries=2)
+    lyfta.latency = 0.3
+    with pytest.raises(requests.Timeout):
+        client.create_collection("Week 1", 1, COOKIE)
+    client.close()
+    # The server created the collection anyway; a retry would have created it again
+    assert lyfta.stats()["requests"] == 1
+
+
+def test_timed_out_save_of_an_existing_workout_is_resent(lyfta):
+    client = APIClient(read_timeout=0.1, max_retries=2)
+    collection_id, user_id = client.create_collection("Week 1", 1, COOKIE)
+    workout_id = client.create_workout_skeleton({"title": "Day 1"}, collection_id, "Week 1", COOKIE)
+    lyfta.latency = 0.3
+    with pytest.raises(requests.Timeout):
+        client.save_workout({"title": "Day 1", "exercises": []}, workout_id, user_id, COOKIE)
+    client.close()
+    assert lyfta.stats()["requests_by_endpoint"][APIClient.WORKOUT_ENDPOINT] == 4
+
+
+def test_throttled_create_is_resent(lyfta):
+    client = APIClient(max_retries=2)
+    lyfta.throttle_rate = 1.0
+    with pytest.raises(requests.HTTPError):
+        client.create_collection("Week 1", 1, COOKIE)
+    client.close()
+    assert lyfta.stats()["requests"] == 3
+
+
+def test_async_engine_does_not_resend_a_timed_out_create(lyfta):
+    engine = AsyncUploadEngine(read_timeout=0.1, max_retries=2)
+    lyfta.latency = 0.3
+    try:
+        with pytest.raises(httpx.ReadTimeout):
+            engine.submit_collection(1, COOKIE).result()
+    finally:
+        engine.close()
+    assert lyfta.stats()["requests"] == 1
+
+
+def test_refused_connection_is_retried_for_creates():
+    try:
+        requests.post("http://127.0.0.1:1/api/saveCollection", timeout=1)
+    except requests.ConnectionError as e:
+        assert APIClient.is_transient_error(e, idempotent=False)
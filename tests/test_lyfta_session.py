@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.lyfta_api_service import APIClient
+
+COOKIE = "session=a"
+
+
+def test_sequential_requests_reuse_one_connection(lyfta):
+    client = APIClient()
+    try:
+        for week_number in range(1, 6):
+            client.create_collection(f"Week {week_number}", week_number, COOKIE)
+        metrics = client.metrics()
+    finally:
+        client.close()
+    assert metrics["requests"] == 5
+    assert metrics["connections_opened"] == 1
+    assert metrics["connection_reuse_ratio"] == 0.8
+
+
+def test_threads_share_a_pool_sized_to_the_workers(lyfta):
+    client = APIClient(pool_size=8)
+    lyfta.latency = 0.02
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda week_number: client.create_collection(f"Week {week_number}", week_number, COOKIE), range(1, 49)))
+        metrics = client.metrics()
+    finally:
+        client.close()
+    assert metrics["requests"] == 48
+    assert metrics["connections_opened"] <= 8
+    assert lyfta.stats()["collections"] == 48
+
+
+def test_two_step_uploads_take_two_requests_per_workout(lyfta):
+    client = APIClient()
+    try:
+        collection_id, user_id = client.create_collection("Week 1", 1, COOKIE)
+        for day in range(1, 4):
+            client.create_workout({"title": f"Day {day}", "exercises": []}, collection_id, user_id, "Week 1", COOKIE)
+        metrics = client.metrics()
+    finally:
+        client.close()
+    assert metrics["workouts_created"] == 3
+    assert metrics["requests_per_workout"] == 2.0
@@ -0,0 +1,45 @@
+from app.services.exercise_matcher import TIER_CACHE, TIER_SEMANTIC
+from app.services.match_cache import MatchCache
+
+
+def test_hits_misses_and_least_recently_used_eviction():
+    cache = MatchCache("fingerprint", max_entries=2)
+    assert cache.get("squat") is None
+    cache.put("squat", 1)
+    cache.put("curl", 2)
+    assert cache.get("squat") == 1
+    cache.put("row", 3)
+
+    assert cache.get("curl") is None
+    assert cache.get("squat") == 1 and cache.get("row") == 3
+    assert cache.stats() == {"entries": 2, "hits": 3, "misses": 2, "hit_rate": 0.6, "total_hits": 3, "total_misses": 2}
+
+
+def test_entries_and_counters_persist_for_the_same_fingerprint(tmp_path):
+    path = str(tmp_path / "match_cache.json")
+    cache = MatchCache("fingerprint", path=path)
+    cache.put("squat", 1)
+    cache.get("squat")
+    cache.get("curl")
+    cache.save()
+
+    reloaded = MatchCache("fingerprint", path=path)
+    assert reloaded.get("squat") == 1
+    assert reloaded.stats()["total_hits"] == 2 and reloaded.stats()["total_misses"] == 1
+    # A changed alias table or database invalidates every match
+    assert MatchCache("other", path=path).get("squat") is None
+
+
+def test_unreadable_cache_starts_empty(tmp_path):
+    path = tmp_path / "match_cache.json"
+    path.write_text("{not json")
+    assert MatchCache("fingerprint", path=str(path)).stats()["entries"] == 0
+
+
+def test_matcher_serves_repeated_names_from_the_cache(matcher):
+    matcher.match_program([[{"Exercise Name": "zorbly lift", "Sets": [], "Notes": ""}]])
+    calls = matcher.embedding_backend.calls
+    matcher.match_program([[{"Exercise Name": " Zorbly Lift ", "Sets": [], "Notes": ""}]])
+
+    assert matcher.embedding_backend.calls == calls
+    assert matcher.tier_counts == {TIER_SEMANTIC: 1, TIER_CACHE: 1}
@@ -0,0 +1,28 @@
+from app.services.tracing import Tracer
+
+
+def test_limited_spans_keep_exact_stage_totals():
+    tracer = Tracer()
+    tracer.limit_spans(10)
+    for i in range(100):
+        tracer.record("upload", 1.0 if i < 99 else 5.0)
+    try:
+        with tracer.span("upload"):
+            raise RuntimeError("failed")
+    except RuntimeError:
+        pass
+
+    assert len(tracer.spans()) == 10
+    stats = tracer.summary()["upload"]
+    assert stats["count"] == 101
+    assert stats["errors"] == 1
+    assert stats["max_s"] == 5.0
+    assert 104.0 <= stats["total_s"] < 105.0
+
+
+def test_reset_forgets_stage_totals():
+    tracer = Tracer(max_spans=5)
+    tracer.record("llm_call", 2.0)
+    tracer.reset()
+    assert tracer.summary() == {}
+    assert tracer.spans() == []
@@ -0,0 +1,56 @@
+import pytest
+import httpx
+import requests
+
+from app.constants import UPLOAD_MODE_AUTO
+from app.services.async_upload_engine import AsyncUploadEngine
+from app.services.lyfta_api_service import APIClient
+
+COOKIE = "session=a"
+OTHER_COOKIE = "session=b"
+WORKOUT = {"title": "Day 1", "exercises": [{"exercise_id": 1, "sets": []}]}
+
+
+def test_auto_mode_falls_back_when_full_workouts_are_rejected(lyfta):
+    lyfta.echo_exercises = True
+    lyfta.reject_full_workouts = True
+    client = APIClient(upload_mode=UPLOAD_MODE_AUTO)
+    try:
+        collection_id, user_id = client.create_collection("Week 1", 1, COOKIE)
+        workout_id = client.create_workout(dict(WORKOUT), collection_id, user_id, "Week 1", COOKIE)
+    finally:
+        client.close()
+    assert client.single_request_supported is False
+    assert lyfta.workouts[int(workout_id)]["exercises"] == WORKOUT["exercises"]
+
+
+def test_auto_mode_does_not_fall_back_on_an_invalid_workout(lyfta):
+    lyfta.echo_exercises = True
+    client = APIClient(upload_mode=UPLOAD_MODE_AUTO)
+    try:
+        collection_id, user_id = client.create_collection("Week 1", 1, OTHER_COOKIE)
+        with pytest.raises(requests.HTTPError) as error:
+            client.create_workout(dict(WORKOUT), collection_id, user_id, "Week 1", COOKIE)
+    finally:
+        client.close()
+    assert error.value.response.status_code == 422
+    assert client.single_request_supported is None
+    assert lyfta.stats()["workouts"] == 0
+
+
+def test_async_auto_mode_falls_back_only_when_full_workouts_are_rejected(lyfta):
+    lyfta.echo_exercises = True
+    engine = AsyncUploadEngine(upload_mode=UPLOAD_MODE_AUTO)
+    try:
+        collection_id, user_id = engine.submit_collection(1, OTHER_COOKIE).result()
+        with pytest.raises(httpx.HTTPStatusError):
+            engine.submit_workout(1, 0, dict(WORKOUT), (collection_id, user_id), COOKIE).result()
+        assert engine.single_request_supported is None
+
+        lyfta.reject_full_workouts = True
+        collection = engine.submit_collection(1, COOKIE).result()
+        workout_id = engine.submit_workout(1, 0, dict(WORKOUT), collection, COOKIE).result()
+    finally:
+        engine.close()
+    assert engine.single_request_supported is False
+    assert lyfta.workouts[int(workout_id)]["exercises"] == WORKOUT["exercises"]
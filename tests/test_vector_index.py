@@ -0,0 +1,69 @@
+import faiss
+import numpy as np
+import pytest
+
+from app.constants import HNSW_EF_SEARCH, IVF_NPROBE
+from app.services.exercise_matcher import ExerciseMatcher
+from app.services.vector_index import (
+    INDEX_TYPES,
+    INDEX_TYPE_HNSW,
+    INDEX_TYPE_IVF,
+    build_vector_index,
+    configure_search,
+    ivf_list_count,
+    normalize_embeddings,
+)
+
+from conftest import EXERCISES, HashEmbeddingBackend
+
+
+def random_embeddings(count, dimension=32, seed=0):
+    return normalize_embeddings(np.random.default_rng(seed).standard_normal((count, dimension)))
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_every_index_type_finds_stored_vectors(index_type):
+    embeddings = random_embeddings(2000)
+    index = build_vector_index(embeddings, index_type)
+    _, indices = index.search(embeddings[:200], 1)
+
+    assert index.ntotal == len(embeddings)
+    assert np.mean(indices[:, 0] == np.arange(200)) >= 0.95
+
+
+def test_ivf_falls_back_to_flat_for_a_small_catalog():
+    assert ivf_list_count(50) == 1
+    assert type(build_vector_index(random_embeddings(50), INDEX_TYPE_IVF)) is faiss.IndexFlatIP
+    assert isinstance(build_vector_index(random_embeddings(2000), INDEX_TYPE_IVF), faiss.IndexIVFFlat)
+
+
+def test_search_parameters_are_restored_on_indexes_read_from_disk(tmp_path):
+    for index_type in (INDEX_TYPE_HNSW, INDEX_TYPE_IVF):
+        path = str(tmp_path / f"{index_type}.faiss")
+        faiss.write_index(build_vector_index(random_embeddings(2000), index_type), path)
+        index = faiss.read_index(path)
+        configure_search(index)
+        if index_type == INDEX_TYPE_HNSW:
+            assert index.hnsw.efSearch == HNSW_EF_SEARCH
+        else:
+            assert index.nprobe == min(IVF_NPROBE, index.nlist)
+
+
+def test_unknown_index_type_is_rejected():
+    with pytest.raises(ValueError):
+        build_vector_index(random_embeddings(10), "lsh")
+
+
+def test_normalize_embeddings_copies_to_unit_rows():
+    embeddings = np.array([[3.0, 4.0], [0.0, 2.0]])
+    normalized = normalize_embeddings(embeddings)
+    assert normalized.dtype == np.float32
+    assert np.allclose(np.linalg.norm(normalized, axis=1), 1.0)
+    assert embeddings[0, 0] == 3.0
+
+
+def test_matcher_searches_a_small_catalog_with_an_ivf_index(exercise_db, monkeypatch):
+    monkeypatch.setattr(ExerciseMatcher, "_faiss_indexes", {})
+    matcher = ExerciseMatcher(exercise_db, persist_index=False, match_cache_path=None, embedding_backend=HashEmbeddingBackend(), catalogs={}, index_type=INDEX_TYPE_IVF)
+    assert matcher.index.ntotal == len(EXERCISES)
+    assert matcher.find_most_similar("dumbbell incline bench press", top_n=1)[0]["name"] == "dumbbell incline bench press"
@@ -0,0 +1,67 @@
+import json
+import random
+
+from app.services.workout_stream_parser import WorkoutStreamParser
+
+
+def program(weeks=3, days=4):
+    return {
+        "weeks": [
+            {
+                # Days generated before the week label are held back until it arrives
+                "days": [
+                    {"day": f"Day {day}", "exercises": [{"Exercise Name": f'Squat \\"{week}.{day}\\" {{[,:]}}', "Sets": [], "Notes": "A1"}]}
+                    for day in range(1, days + 1)
+                ],
+                "week": f"Week {week}",
+            }
+            for week in range(1, weeks + 1)
+        ]
+    }
+
+
+def parse(text, chunk_sizes):
+    emitted = []
+    parser = WorkoutStreamParser(lambda label, day: emitted.append((label, day)))
+    largest_buffer = 0
+    position = 0
+    while position < len(text):
+        size = next(chunk_sizes)
+        parser.feed(text[position:position + size])
+        largest_buffer = max(largest_buffer, len(parser._buffer))
+        position += size
+    return emitted, largest_buffer
+
+
+def expected_days(response):
+    return [(week["week"], day) for week in response["weeks"] for day in week["days"]]
+
+
+def test_days_are_emitted_whatever_the_chunking():
+    response = program()
+    text = json.dumps(response, indent=1)
+    rng = random.Random(0)
+    for chunk_sizes in (iter(lambda: 1, None), iter(lambda: rng.randint(1, 40), None), iter(lambda: len(text), None)):
+        emitted, _ = parse(text, chunk_sizes)
+        assert emitted == expected_days(response)
+
+
+def test_buffer_holds_only_the_open_day():
+    response = program(weeks=20)
+    text = json.dumps(response)
+    emitted, largest_buffer = parse(text, iter(lambda: 16, None))
+    assert len(emitted) == 80
+    longest_day = max(len(json.dumps(day)) for week in response["weeks"] for day in week["days"])
+    assert largest_buffer <= longest_day + 16
+
+
+def test_reset_does_not_emit_days_again():
+    response = {"weeks": [{"week": week["week"], "days": week["days"]} for week in program(weeks=1)["weeks"]]}
+    text = json.dumps(response)
+    emitted = []
+    parser = WorkoutStreamParser(lambda label, day: emitted.append((label, day)))
+    parser.feed(text[:len(text) // 2])
+    assert 0 < len(emitted) < 4
+    parser.reset()
+    parser.feed(text)
+    assert emitted == expected_days(response)